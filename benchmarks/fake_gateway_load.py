@@ -0,0 +1,98 @@
+"""Drive the full backend against the simulated gateway and report latency
+
+Subscribes a watchlist at seeded prices, waits for the first quote of
+every symbol, then places orders (with local trailing stops) concurrently
+while quotes stream, and prints ack and risk-check latency, pacing and
+simulated gateway counters. Risk-rejected orders never reach the gateway
+and are reported separately from the orders sent.
+
+Usage: python -m benchmarks.fake_gateway_load [symbols] [orders] [tick_interval_ms]
+   or: python benchmarks/fake_gateway_load.py [symbols] [orders] [tick_interval_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Running the file directly puts benchmarks/ on the path instead of the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.config import load_config
+from modules.ibkr_connection import IBKRConnection
+
+
+async def first_quotes(connection, watchlist, timeout=10):
+    """Wait until every symbol has streamed a price, so orders are priced off live quotes"""
+    deadline = time.monotonic() + timeout
+    while True:
+        quotes, _ = await connection.get_quotes(watchlist)
+        missing = [symbol for symbol in watchlist if not quotes.get(symbol, {}).get("price")]
+        if not missing:
+            return quotes
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"No quotes after {timeout}s for {len(missing)} symbols, e.g. {missing[0]}")
+        await asyncio.sleep(0.05)
+
+
+async def run(symbols=50, orders=200, tick_interval_ms=20):
+    watchlist = [f"SIM{i}" for i in range(symbols)]
+
+    config = load_config()
+    config["fake_gateway"] = dict(
+        config.get("fake_gateway", {}), enabled=True, tick_interval_ms=tick_interval_ms, seed=0,
+        prices={symbol: round(20.0 + 5 * i, 2) for i, symbol in enumerate(watchlist)}
+    )
+
+    # Keep the benchmark's stops and contracts out of the real data directory
+    scratch = tempfile.mkdtemp()
+    config["trading"] = dict(config.get("trading", {}), stop_journal_file=f"{scratch}/stop_journal.jsonl")
+    config["contracts"] = {"cache_file": f"{scratch}/contracts.json"}
+
+    connection = IBKRConnection(config=config)
+    await connection.start()
+    while not connection.is_connected():
+        await asyncio.sleep(0.01)
+
+    await connection.get_quotes(watchlist)
+    quotes = await first_quotes(connection, watchlist)
+
+    def order(i):
+        symbol = watchlist[i % symbols]
+        price = quotes[symbol]["price"]
+        return {
+            "symbol": symbol,
+            "action": "buy",
+            "quantity": 10,
+            "limit_price": round(price * 1.01, 2),  # Marketable so it fills
+            "trailing_stop_enabled": True,
+            "trailing_stop_percentage": 1.0,
+            "trailing_stop_mode": "local"
+        }
+
+    start = time.perf_counter()
+    results = await connection.place_basket([order(i) for i in range(orders)])
+    elapsed = time.perf_counter() - start
+
+    # Let fills, stop arming and a few stop triggers play out
+    await asyncio.sleep(2)
+
+    # Risk rejections return before pacing and never reach the gateway, so they are not throughput
+    rejected = sum(1 for result in results if result.get("status") == "RiskRejected")
+    sent = orders - rejected
+    placed = sum(1 for result in results if result.get("success"))
+    print(f"{sent}/{orders} orders sent in {elapsed:.3f}s ({sent / elapsed:.0f} orders/s), {placed} acknowledged")
+    print(f"risk rejected:      {rejected} {connection.risk_gate.rejections}")
+    print(f"ack latency:        {connection.order_manager.ack_latency.summary()}")
+    print(f"risk check latency: {connection.risk_gate.check_latency.summary()}")
+    stops = await connection.get_trailing_stops()
+    print(f"trailing stops:     {len(stops['stops'])} active, trigger latency {stops['trigger_latency']}")
+    for client_id, stats in (await connection.get_pacing_stats()).items():
+        print(f"pacing client {client_id} {stats['roles']}: sent {stats['sent']}, max depth {stats['max_depth']}")
+    print(f"gateway:            {await connection.client.call(connection.fake_gateway.stats)}")
+
+    await connection.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(*(int(arg) for arg in sys.argv[1:])))
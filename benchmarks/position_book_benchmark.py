@@ -0,0 +1,62 @@
+"""Compare vectorized PositionBook stop checks against the per-symbol dict loop
+
+Usage: python -m benchmarks.position_book_benchmark [positions] [batches]
+"""
+import sys
+import time
+
+import numpy as np
+
+from modules.position_book import PositionBook
+
+
+def per_symbol_loop(stop_monitors, symbols, prices):
+    """The original rule from OrderManager._trailing_stop_monitor, one symbol at a time"""
+    triggered = []
+    for symbol, current_price in zip(symbols, prices):
+        monitor_data = stop_monitors[symbol]
+        if current_price > 0:
+            if current_price > monitor_data["highest_price"]:
+                monitor_data["highest_price"] = current_price
+            stop_price = monitor_data["highest_price"] * (1 - monitor_data["stop_percentage"] / 100)
+            if current_price <= stop_price and monitor_data["highest_price"] > 0:
+                triggered.append(symbol)
+    return triggered
+
+
+def main(positions=5000, batches=200):
+    rng = np.random.default_rng(0)
+    symbols = [f"SYM{i}" for i in range(positions)]
+    stop_percentages = rng.uniform(0.5, 10, positions)
+
+    # Random-walk price paths, one row per tick batch
+    steps = rng.normal(0, 0.002, (batches, positions))
+    paths = 100 * np.exp(np.cumsum(steps, axis=0))
+
+    stop_monitors = {
+        symbol: {"stop_percentage": pct, "highest_price": 0}
+        for symbol, pct in zip(symbols, stop_percentages)
+    }
+    loop_paths = paths.tolist()
+    start = time.perf_counter()
+    loop_triggered = 0
+    for row in loop_paths:
+        loop_triggered += len(per_symbol_loop(stop_monitors, symbols, row))
+    loop_seconds = time.perf_counter() - start
+
+    book = PositionBook(capacity=positions)
+    slots = np.array([book.add(symbol, pct, 100) for symbol, pct in zip(symbols, stop_percentages)])
+    start = time.perf_counter()
+    book_triggered = 0
+    for row in paths:
+        book_triggered += len(book.update(slots, row))
+    book_seconds = time.perf_counter() - start
+
+    print(f"{positions} positions x {batches} tick batches")
+    print(f"per-symbol loop: {loop_seconds * 1000 / batches:8.3f} ms/batch, {loop_triggered} triggers")
+    print(f"position book:   {book_seconds * 1000 / batches:8.3f} ms/batch, {book_triggered} triggers")
+    print(f"speedup: {loop_seconds / book_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -3,6 +3,7 @@ import dash_bootstrap_components as dbc
 from dash_app.utils.data import load_table_data
 from dash_app.components.layout import create_layout
 from dash_app.components.callbacks import register_callbacks
+from dash_app.components.stream import register_stream_routes
 
 def create_app():
     """Create and configure the Dash application"""
@@ -30,6 +31,9 @@ def create_app():
     
     # Register callbacks
     register_callbacks(app)
+
+    # Register the price stream relay
+    register_stream_routes(app)
     
     return app
 
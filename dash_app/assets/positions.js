@@ -0,0 +1,27 @@
+// Browser side of the fill ledger.
+// The server only refreshes a small store of shares held and average cost per
+// ticker; this merges it into the read-only Filled and Avg_Cost columns, so the
+// table never travels to the server and the user-editable Qty and Open columns
+// are left alone.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    positions: {
+        merge: function(positions, tableData) {
+            if (!positions || !tableData) {
+                return window.dash_clientside.no_update;
+            }
+
+            let updated = false;
+            const rows = tableData.map(function(row) {
+                const position = positions[row.Ticker];
+                if (!position || (position.quantity === row.Filled && position.avg_cost === row.Avg_Cost)) {
+                    return row;
+                }
+                updated = true;
+                return Object.assign({}, row, {Filled: position.quantity, Avg_Cost: position.avg_cost});
+            });
+
+            // Unchanged fills leave the table, and so the save callback, untouched
+            return updated ? rows : window.dash_clientside.no_update;
+        }
+    }
+});
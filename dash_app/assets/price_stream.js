@@ -0,0 +1,86 @@
+// Browser side of the price push channel.
+// One EventSource per page follows the tickers currently in the stock table and
+// buffers the latest price per ticker until the next clientside poll applies it
+// to the table together with the P&L columns derived from it.
+function roundCents(value) {
+    return Math.round(value * 100) / 100;
+}
+
+// Recompute unrealized P&L for the shares held and Shadow P&L for the original
+// position size, which keeps tracking potential P&L after the position is closed
+function markRow(row, price) {
+    const updated = Object.assign({}, row, {Price: price});
+    const openingPrice = parseFloat(row.Opening_Price);
+    if (isNaN(openingPrice)) {
+        return updated;
+    }
+
+    const shares = parseInt(row.Number, 10) || 0;
+    const hasOriginal = row.Original_Number !== undefined && row.Original_Number !== null && row.Original_Number !== "";
+    const originalShares = hasOriginal ? (parseInt(row.Original_Number, 10) || 0) : shares;
+
+    if (shares > 0) {
+        updated.PnL = roundCents((price - openingPrice) * shares);
+    }
+    if (originalShares > 0) {
+        updated.Shadow_PnL = roundCents((price - openingPrice) * originalShares);
+    }
+    return updated;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    price_stream: {
+        poll: function(n_intervals, tableData) {
+            const state = window.priceStreamState || (window.priceStreamState = {
+                key: null,
+                source: null,
+                pending: {}
+            });
+
+            const tickers = (tableData || [])
+                .map(function(row) { return row.Ticker; })
+                .filter(Boolean)
+                .sort();
+            const key = tickers.join(",");
+
+            // Re-open the stream only when the watchlist changes
+            if (state.key !== key) {
+                if (state.source) {
+                    state.source.close();
+                }
+                state.key = key;
+                state.pending = {};
+                state.source = null;
+
+                if (key) {
+                    state.source = new EventSource("/price-stream?symbols=" + encodeURIComponent(key));
+                    state.source.onmessage = function(event) {
+                        const message = JSON.parse(event.data);
+                        Object.assign(state.pending, message.prices || {});
+                    };
+                }
+            }
+
+            if (Object.keys(state.pending).length === 0) {
+                return window.dash_clientside.no_update;
+            }
+
+            const prices = state.pending;
+            state.pending = {};
+
+            // Apply the prices and their derived P&L here so a tick never waits on the server;
+            // the table-changes callback then sends the moved rows to the server to be saved
+            let updated = false;
+            const rows = (tableData || []).map(function(row) {
+                const price = prices[row.Ticker];
+                if (price === undefined || price === null || price === row.Price) {
+                    return row;
+                }
+                updated = true;
+                return markRow(row, price);
+            });
+
+            return updated ? rows : window.dash_clientside.no_update;
+        }
+    }
+});
@@ -0,0 +1,54 @@
+// Browser side of stock table persistence.
+// Keeps the last table the server was told about and turns every stock-table
+// update into a change set, so the save and order-amount callbacks receive the
+// rows that changed rather than the whole table.
+function tableSnapshot(rows) {
+    const serialized = {};
+    rows.forEach(function(row) {
+        serialized[row.Name] = JSON.stringify(row);
+    });
+    return {
+        rows: serialized,
+        names: rows.map(function(row) { return row.Name; })
+    };
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    table_changes: {
+        diff: function(tableData) {
+            const rows = tableData || [];
+            const state = window.tableChangesState;
+
+            // The first call sees the table the server rendered, which is already saved
+            if (!state) {
+                window.tableChangesState = tableSnapshot(rows);
+                return window.dash_clientside.no_update;
+            }
+
+            const current = tableSnapshot(rows);
+            const changed = {};
+            Object.keys(current.rows).forEach(function(name) {
+                if (state.rows[name] !== current.rows[name]) {
+                    changed[name] = JSON.parse(current.rows[name]);
+                }
+            });
+            const removed = state.names.filter(function(name) {
+                return !(name in current.rows);
+            });
+            const reordered = state.names.join("\n") !== current.names.join("\n");
+
+            window.tableChangesState = current;
+            if (Object.keys(changed).length === 0 && !reordered) {
+                return window.dash_clientside.no_update;
+            }
+
+            return {
+                changed: changed,
+                removed: removed,
+                // Names and tickers are only sent when rows were added, removed or moved
+                order: reordered ? current.names : null,
+                tickers: reordered ? rows.map(function(row) { return row.Ticker; }) : null
+            };
+        }
+    }
+});
@@ -1,14 +1,13 @@
-from dash import Input, Output, State, callback, ctx
+from dash import Input, Output, State, ClientsideFunction, Patch, ctx, no_update
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 from dash import html
-import plotly.graph_objects as go
-from datetime import datetime
 import math
 import time
 
-from ..utils.api import check_connection_status, place_order, get_stock_info, get_real_time_prices
-from ..utils.data import create_dataframe, save_table_data, load_table_data
+from ..utils.api import check_connection_status, place_order, place_orders, get_positions, get_stock_info
+from ..utils.data import save_table_changes
+from ..utils.position_record import PositionRecord
 
 def register_callbacks(app):
     """Register all callbacks for the application"""
@@ -25,33 +24,38 @@ def register_callbacks(app):
         Input("table-data-store", "data")
     )
 
-    # Callback to save data when stock table changes
+    # Apply prices pushed by the backend stream, and the P&L derived from them, without a server round trip
+    app.clientside_callback(
+        ClientsideFunction(namespace="price_stream", function_name="poll"),
+        Output("stock-table", "data", allow_duplicate=True),
+        Input("price-stream-interval", "n_intervals"),
+        State("stock-table", "data"),
+        prevent_initial_call=True
+    )
+
+    # Turn every stock table update into a change set in the browser
+    app.clientside_callback(
+        ClientsideFunction(namespace="table_changes", function_name="diff"),
+        Output("table-changes", "data"),
+        Input("stock-table", "data")
+    )
+
+    # Callback to save the rows that changed in the stock table
     @app.callback(
         Output("save-status", "data", allow_duplicate=True),  # Using data property of dcc.Store
-        Input("stock-table", "data"),
+        Input("table-changes", "data"),
         prevent_initial_call=True
     )
-    def save_data_from_table(table_data):
-        if not table_data:
+    def save_data_from_table(changes):
+        if not changes:
             raise PreventUpdate
 
-        # Convert table data to the format needed for storage
-        table_data_store = {}
-        for row in table_data:
-            table_data_store[row["Name"]] = {
-                "ticker": row["Ticker"],
-                "price": str(row["Price"]) if "Price" in row and row["Price"] else "",
-                "opening_price": str(row["Opening_Price"]) if "Opening_Price" in row and row["Opening_Price"] else "",
-                "closing_price": str(row["Closing_Price"]) if "Closing_Price" in row and row["Closing_Price"] else "",
-                "pnl": str(row["PnL"]) if "PnL" in row and row["PnL"] else "",
-                "number": str(row["Number"]) if "Number" in row and row["Number"] else "0",
-                "original_number": str(row.get("Original_Number", row.get("Number", "0"))),
-                "total_pnl": str(row.get("Total", "0")),
-                "shadow_pnl": str(row["Shadow_PnL"]) if "Shadow_PnL" in row and row["Shadow_PnL"] else ""
-            }
+        # Convert the changed rows to the format needed for storage
+        changed = {name: PositionRecord.from_row(row).to_storage() for name, row in changes["changed"].items()}
 
-        # Save the data to disk
-        success = save_table_data(table_data_store)
+        # Every callback that writes the stock table triggers this one, so this is the
+        # only save; the store skips unchanged data and coalesces writes
+        success = save_table_changes(changed, changes["removed"], changes["order"])
 
         # Return status
         return {"success": success, "timestamp": time.time()}
@@ -86,12 +90,14 @@ def register_callbacks(app):
         [State("stock-table", "selected_rows"),
          State("stock-table", "data"),
          State("order-amount-table", "data"),
-         State("trailing-stop", "value")],
+         State("trailing-stop", "value"),
+         State("native-trailing-stop", "value")],
         prevent_initial_call=True
     )
-    def handle_buy_sell_click(buy_clicks, sell_clicks, selected_rows, table_data, order_amount_data, trailing_stop):
+    def handle_buy_sell_click(buy_clicks, sell_clicks, selected_rows, table_data, order_amount_data, trailing_stop,
+                              native_trailing_stop):
         if not selected_rows or len(selected_rows) != 1:
-            return dbc.Alert("Please select exactly one stock from the table", color="warning", dismissable=True), table_data
+            return dbc.Alert("Please select exactly one stock from the table", color="warning", dismissable=True), no_update
 
         selected_row = table_data[selected_rows[0]]
         ticker = selected_row["Ticker"]
@@ -120,13 +126,13 @@ def register_callbacks(app):
         if action == "sell":
             available_shares = int(selected_row.get("Number", 0))
             if available_shares <= 0:
-                return dbc.Alert(f"No shares of {ticker} available to sell", color="warning", dismissable=True), table_data
+                return dbc.Alert(f"No shares of {ticker} available to sell", color="warning", dismissable=True), no_update
             # For sell orders, use available shares if quantity is too high
             quantity = min(quantity, available_shares)
 
         # For buy orders, check if quantity is valid
         if action == "buy" and quantity <= 0:
-            return dbc.Alert(f"Please set a valid dollar amount for {ticker} before placing an order", color="warning", dismissable=True), table_data
+            return dbc.Alert(f"Please set a valid dollar amount for {ticker} before placing an order", color="warning", dismissable=True), no_update
 
         # Prepare order details
         order_details = {
@@ -135,59 +141,30 @@ def register_callbacks(app):
             "quantity": quantity,
             "limit_price": price,
             "trailing_stop_enabled": action == "buy",
-            "trailing_stop_percentage": trailing_stop if action == "buy" else 0.0
+            "trailing_stop_percentage": trailing_stop if action == "buy" else 0.0,
+            "trailing_stop_mode": "native" if native_trailing_stop else "local"
         }
 
         # Place the order directly
         result = place_order(order_details)
 
         if result.get('success'):
-            # Update the table data directly
-            for i, row in enumerate(table_data):
-                if row["Ticker"] == ticker:
-                    if action == "buy":
-                        # For buy orders, update opening price and quantity
-                        table_data[i]["Opening_Price"] = price
-                        table_data[i]["Number"] = quantity
-                        # Store original position size for Shadow P&L calculation
-                        table_data[i]["Original_Number"] = quantity
-                        # Reset closing price and P&L if they exist
-                        if "Closing_Price" in table_data[i]:
-                            table_data[i]["Closing_Price"] = ""
-                        if "PnL" in table_data[i]:
-                            table_data[i]["PnL"] = ""
-                    else:  # sell action
-                        # For sell orders, record closing price and calculate P&L
-                        table_data[i]["Closing_Price"] = price
-
-                        # Calculate P&L if we have an opening price
-                        if "Opening_Price" in table_data[i] and table_data[i]["Opening_Price"]:
-                            opening_price = float(table_data[i]["Opening_Price"])
-                            pnl = (price - opening_price) * quantity
-                            table_data[i]["PnL"] = round(pnl, 2)
-
-                            # Update Total column with total P&L
-                            if "Total" not in table_data[i]:
-                                table_data[i]["Total"] = round(pnl, 2)
-                            else:
-                                current_total = float(table_data[i]["Total"]) if table_data[i]["Total"] else 0
-                                table_data[i]["Total"] = round(current_total + pnl, 2)
-
-                        # Update quantity after selling (subtract sold shares)
-                        current_quantity = int(table_data[i]["Number"]) if table_data[i]["Number"] else 0
-                        table_data[i]["Number"] = max(0, current_quantity - quantity)
+            # Send only the traded row back to the table
+            record = PositionRecord.from_row(selected_row)
+            if action == "buy":
+                # Store original position size for Shadow P&L calculation
+                record.buy(price, quantity)
+            else:  # sell action
+                record.sell(price, quantity)
+            patched_table = Patch()
+            patched_table[selected_rows[0]] = record.to_row()
 
             # Create success message based on action
             if action == "buy":
                 message = f"Order placed successfully: BUY {quantity} shares of {ticker} at ${price:.2f} (${order_amount:.2f})"
             else:
                 message = f"Order placed successfully: SELL {quantity} shares of {ticker} at ${price:.2f}"
-                pnl_value = 0
-                for row in table_data:
-                    if row["Ticker"] == ticker and "PnL" in row and row["PnL"]:
-                        pnl_value = row["PnL"]
-                        break
-
+                pnl_value = record.pnl or 0
                 if pnl_value != 0:
                     message += f" with P&L: ${pnl_value}"
 
@@ -195,13 +172,84 @@ def register_callbacks(app):
                 message,
                 color="success",
                 dismissable=True,
-            ), table_data
+            ), patched_table
         else:
             return dbc.Alert(
                 f"Error placing order: {result.get('message', 'Unknown error')}",
                 color="danger",
                 dismissable=True
-            ), table_data
+            ), no_update
+
+    # Callback to buy every stock with an order amount in one basket request
+    @app.callback(
+        [Output("notification-area", "children", allow_duplicate=True),
+         Output("stock-table", "data", allow_duplicate=True)],
+        Input("buy-basket-button", "n_clicks"),
+        [State("stock-table", "data"),
+         State("order-amount-table", "data"),
+         State("trailing-stop", "value"),
+         State("native-trailing-stop", "value")],
+        prevent_initial_call=True
+    )
+    def handle_basket_buy_click(n_clicks, table_data, order_amount_data, trailing_stop, native_trailing_stop):
+        if not n_clicks:
+            raise PreventUpdate
+
+        amounts = {}
+        for row in order_amount_data:
+            try:
+                amounts[row["Ticker"]] = float(row["Amount($)"])
+            except (ValueError, TypeError, KeyError):
+                continue
+
+        # One leg per row with a dollar amount that buys at least one share at the current price
+        legs = []
+        for index, row in enumerate(table_data):
+            record = PositionRecord.from_row(row)
+            amount = amounts.get(record.ticker, 0)
+            if not record.price or amount <= 0:
+                continue
+            quantity = math.floor(amount / record.price)
+            if quantity > 0:
+                legs.append((index, record, quantity))
+
+        if not legs:
+            return dbc.Alert("Set a dollar amount on at least one priced stock to buy a basket", color="warning", dismissable=True), no_update
+
+        result = place_orders([
+            {
+                "symbol": record.ticker,
+                "action": "buy",
+                "quantity": quantity,
+                "limit_price": record.price,
+                "trailing_stop_enabled": True,
+                "trailing_stop_percentage": trailing_stop,
+                "trailing_stop_mode": "native" if native_trailing_stop else "local"
+            }
+            for _, record, quantity in legs
+        ])
+
+        # Results come back in leg order; only the legs that were placed update the table
+        patched_table = Patch()
+        placed = []
+        failed = []
+        for (index, record, quantity), leg_result in zip(legs, result.get("results", [])):
+            # A rejected basket reports valid legs as successful but never submits them
+            if leg_result.get("success") and leg_result.get("order_id") is not None:
+                record.buy(record.price, quantity)
+                patched_table[index] = record.to_row()
+                placed.append(f"{quantity} {record.ticker}")
+            else:
+                failed.append(f"{record.ticker} ({leg_result.get('message', 'Unknown error')})")
+
+        if not placed:
+            reason = result.get("message") or result.get("detail") or "Unknown error"
+            return dbc.Alert(f"Error placing basket: {reason}", color="danger", dismissable=True), no_update
+
+        message = f"Basket placed: BUY {', '.join(placed)}"
+        if failed:
+            return dbc.Alert(f"{message}. Failed: {', '.join(failed)}", color="warning", dismissable=True), patched_table
+        return dbc.Alert(message, color="success", dismissable=True), patched_table
 
     # Callback to add new stock to table - work directly with the tables
     @app.callback(
@@ -236,18 +284,7 @@ def register_callbacks(app):
                 return dbc.Alert(f"Could not find information for {ticker}", color="danger"), table_data, order_amount_data
 
             # Create new row for stock table
-            new_row = {
-                "Name": stock_info['name'],
-                "Ticker": ticker,
-                "Price": "",
-                "Opening_Price": "",
-                "Closing_Price": "",
-                "PnL": "",
-                "Number": 0,
-                "Original_Number": 0,
-                "Total": 0,
-                "Shadow_PnL": 0
-            }
+            new_row = PositionRecord(stock_info['name'], ticker, shadow_pnl=0.0).to_row()
 
             # Add to stock table
             updated_table_data = table_data.copy()
@@ -260,24 +297,6 @@ def register_callbacks(app):
                 "Amount($)": 0
             })
 
-            # Format the data correctly for saving
-            table_data_store = {}
-            for row in updated_table_data:
-                table_data_store[row["Name"]] = {
-                    "ticker": row["Ticker"],
-                    "price": str(row["Price"]) if "Price" in row and row["Price"] else "",
-                    "opening_price": str(row["Opening_Price"]) if "Opening_Price" in row and row["Opening_Price"] else "",
-                    "closing_price": str(row["Closing_Price"]) if "Closing_Price" in row and row["Closing_Price"] else "",
-                    "pnl": str(row["PnL"]) if "PnL" in row and row["PnL"] else "",
-                    "shadow_pnl": str(row["Shadow_PnL"]) if "Shadow_PnL" in row and row["Shadow_PnL"] else "",
-                    "number": str(row["Number"]) if "Number" in row and row["Number"] else "0",
-                    "original_number": str(row.get("Original_Number", row.get("Number", "0"))),
-                    "total_pnl": str(row.get("Total", "0"))
-                }
-
-            # Save the data to disk
-            save_table_data(table_data_store)
-
             return dbc.Alert(f"Added {ticker} to the table", color="success"), updated_table_data, updated_order_amount_data
 
         except Exception as e:
@@ -307,24 +326,6 @@ def register_callbacks(app):
         # Remove corresponding rows from order amount table
         updated_order_amount_data = [row for row in order_amount_data if row["Ticker"] not in tickers_to_remove]
 
-        # Format the data correctly for saving
-        table_data_store = {}
-        for row in updated_table_data:
-            table_data_store[row["Name"]] = {
-                "ticker": row["Ticker"],
-                "price": str(row["Price"]) if "Price" in row and row["Price"] else "",
-                "opening_price": str(row["Opening_Price"]) if "Opening_Price" in row and row["Opening_Price"] else "",
-                "closing_price": str(row["Closing_Price"]) if "Closing_Price" in row and row["Closing_Price"] else "",
-                "pnl": str(row["PnL"]) if "PnL" in row and row["PnL"] else "",
-                "shadow_pnl": str(row["Shadow_PnL"]) if "Shadow_PnL" in row and row["Shadow_PnL"] else "",
-                "number": str(row["Number"]) if "Number" in row and row["Number"] else "0",
-                "original_number": str(row.get("Original_Number", row.get("Number", "0"))),
-                "total_pnl": str(row.get("Total", "0"))
-            }
-
-        # Save the data to disk
-        save_table_data(table_data_store)
-
         return html.P(f"Removed stocks: {', '.join(tickers_to_remove)}"), updated_table_data, updated_order_amount_data
 
     # Callback to update selected for removal text
@@ -341,122 +342,49 @@ def register_callbacks(app):
         selected_tickers = [table_data[i]["Ticker"] for i in selected_rows]
         return html.P(f"Selected for removal: {', '.join(selected_tickers)}")
 
-    # Callback to update the stock table with real-time prices
+    # Callback to refresh shares held and average cost from actual fills; only this small
+    # store goes over the wire, the browser merges it into the table
     @app.callback(
-        Output("stock-table", "data", allow_duplicate=True),
-        Input("interval-component", "n_intervals"),
-        State("stock-table", "data"),
+        Output("positions-store", "data"),
+        Input("positions-interval", "n_intervals"),
+        State("positions-store", "data"),
         prevent_initial_call=True
     )
-    def update_stock_table_prices(n, stock_table_data):
-        if not stock_table_data:
-            raise PreventUpdate
-
-        # Get all tickers from the table
-        tickers = [row["Ticker"] for row in stock_table_data if "Ticker" in row]
-
-        if not tickers:
+    def update_positions_from_fills(n, current_positions):
+        positions = get_positions()
+        if not positions:
             raise PreventUpdate
 
-        # Fetch real-time prices from the backend
-        prices = get_real_time_prices(tickers)
-
-        # TODO: for testing: If no prices are returned, generate random prices for testing
-        if prices is None or not prices or all(price is None for price in prices.values()):
-            import random
-            prices = {}
-            for ticker in tickers:
-                # Generate a random price between 10 and 1000
-                prices[ticker] = round(random.uniform(10, 1000), 2)
-
-            # Log that we're using random prices
-            print("Using random prices for testing:", prices)
-
-        if prices is None or not prices or all(price is None for price in prices.values()):
-            # If we couldn't get prices, don't update
-            raise PreventUpdate
-
-        # Update prices in the stock table data
-        updated = False
-        for i, row in enumerate(stock_table_data):
-            ticker = row.get("Ticker")
-            if ticker in prices and prices[ticker] is not None:
-                new_price = prices[ticker]
-                current_price = row.get("Price", "")
-
-                # Convert current_price to float for comparison if it's not empty
-                if current_price and isinstance(current_price, str):
-                    try:
-                        current_price = float(current_price)
-                    except ValueError:
-                        current_price = 0
-
-                # Compare and update if different
-                if new_price != current_price:
-                    stock_table_data[i]["Price"] = new_price
-                    updated = True
-
-                    # Calculate P&L if we have opening price and shares
-                    if "Opening_Price" in row and row["Opening_Price"] and "Number" in row and row["Number"]:
-                        try:
-                            opening_price = float(row["Opening_Price"])
-                            shares = int(row["Number"])
-                            if shares > 0:
-                                # Calculate unrealized P&L
-                                pnl = (new_price - opening_price) * shares
-                                stock_table_data[i]["PnL"] = round(pnl, 2)
-                        except (ValueError, TypeError):
-                            pass
-                
-                # Calculate Shadow P&L based on opening price and current price
-                # This will show potential P&L even if position is closed
-                if "Opening_Price" in row and row["Opening_Price"]:
-                    try:
-                        opening_price = float(row["Opening_Price"])
-                        # Use original position size if available, otherwise use current number
-                        original_shares = int(row.get("Original_Number", row.get("Number", 0)))
-                        if original_shares > 0:
-                            shadow_pnl = (new_price - opening_price) * original_shares
-                            stock_table_data[i]["Shadow_PnL"] = round(shadow_pnl, 2)
-                    except (ValueError, TypeError):
-                        pass
-
-        if not updated:
-            # If no prices were updated, don't update the table
+        fills = {
+            symbol: {"quantity": int(position["quantity"]), "avg_cost": position["avg_cost"]}
+            for symbol, position in positions.items()
+        }
+        if fills == current_positions:
             raise PreventUpdate
 
-        # Save the updated table data to disk
-        table_data_store = {}
-        for row in stock_table_data:
-            table_data_store[row["Name"]] = {
-                "ticker": row["Ticker"],
-                "price": str(row["Price"]) if "Price" in row and row["Price"] else "",
-                "opening_price": str(row["Opening_Price"]) if "Opening_Price" in row and row["Opening_Price"] else "",
-                "closing_price": str(row["Closing_Price"]) if "Closing_Price" in row and row["Closing_Price"] else "",
-                "pnl": str(row["PnL"]) if "PnL" in row and row["PnL"] else "",
-                "shadow_pnl": str(row["Shadow_PnL"]) if "Shadow_PnL" in row and row["Shadow_PnL"] else "",
-                "number": str(row["Number"]) if "Number" in row and row["Number"] else "0",
-                "original_number": str(row.get("Original_Number", row.get("Number", "0"))),
-                "total_pnl": str(row.get("Total", "0"))
-            }
-
-        # Save the data to disk
-        save_table_data(table_data_store)
+        return fills
 
-        # Return the updated table data
-        return stock_table_data
+    # Merge the ledger's shares and average cost into their own read-only columns
+    app.clientside_callback(
+        ClientsideFunction(namespace="positions", function_name="merge"),
+        Output("stock-table", "data", allow_duplicate=True),
+        Input("positions-store", "data"),
+        State("stock-table", "data"),
+        prevent_initial_call=True
+    )
 
     # Add this callback to ensure order amount table stays in sync with stock table
     @app.callback(
         Output("order-amount-table", "data"),
-        Input("stock-table", "data"),
+        Input("table-changes", "data"),
         State("order-amount-table", "data"),
         prevent_initial_call=True
     )
-    def sync_order_amount_table(stock_table_data, order_amount_data):
+    def sync_order_amount_table(changes, order_amount_data):
         """Ensure order amount table has exactly one row for each stock in the main table"""
-        if not stock_table_data:
-            return []
+        # Tickers are only in the change set when rows were added, removed or moved
+        if not changes or changes.get("tickers") is None:
+            raise PreventUpdate
 
         # Create a dictionary of existing order amounts by ticker
         existing_amounts = {}
@@ -466,8 +394,7 @@ def register_callbacks(app):
 
         # Create new order amount data with one row per stock
         new_order_amount_data = []
-        for stock_row in stock_table_data:
-            ticker = stock_row.get("Ticker")
+        for ticker in changes["tickers"]:
             if ticker:
                 # Use existing amount if available, otherwise default to 0
                 amount = existing_amounts.get(ticker, 0)
@@ -476,4 +403,4 @@ def register_callbacks(app):
                     "Amount($)": amount
                 })
 
-        return new_order_amount_data
\ No newline at end of file
+        return new_order_amount_data
@@ -1,7 +1,7 @@
 import dash
 from dash import dcc, html, dash_table
 import dash_bootstrap_components as dbc
-from dash_app.utils.data import create_dataframe
+from dash_app.utils.position_record import decode_table
 
 def create_layout(initial_data=None):
     """Create the main layout of the application optimized for mobile"""
@@ -10,7 +10,7 @@ def create_layout(initial_data=None):
         initial_data = {}
     
     # Create initial table data
-    initial_table_data = create_dataframe(initial_data).to_dict('records') if initial_data else []
+    initial_table_data = decode_table(initial_data)
     
     # Create initial order amount data matching the structure of the stock table
     initial_order_data = []
@@ -65,6 +65,8 @@ def create_layout(initial_data=None):
                                                     {"name": "P&L", "id": "PnL", "type": "numeric", "format": {"specifier": "$.2f"}},
                                                     {"name": "Shadow", "id": "Shadow_PnL", "type": "numeric", "format": {"specifier": "$.2f"}},
                                                     {"name": "Qty", "id": "Number", "editable": True},
+                                                    {"name": "Filled", "id": "Filled", "editable": False},
+                                                    {"name": "Avg", "id": "Avg_Cost", "type": "numeric", "format": {"specifier": "$.2f"}, "editable": False},
                                                 ],
                                                 data=initial_table_data,
                                                 row_selectable="multi",
@@ -192,6 +194,17 @@ def create_layout(initial_data=None):
                                         className="w-100 mb-2"
                                     ),
                                     width=6
+                                ),
+                                # Buys every row with an order amount in one basket request
+                                dbc.Col(
+                                    dbc.Button(
+                                        [html.I(className="fas fa-layer-group me-2"), "Buy All With Amounts"],
+                                        id="buy-basket-button",
+                                        color="success",
+                                        outline=True,
+                                        className="w-100 mb-2"
+                                    ),
+                                    width=12
                                 )
                             ]),
                         ], width=12),
@@ -209,7 +222,14 @@ def create_layout(initial_data=None):
                                             dbc.InputGroup([
                                                 dbc.InputGroupText(html.I(className="fas fa-percentage")),
                                                 dbc.Input(id="trailing-stop", type="number", value=2.0, min=0.1, step=0.1)
-                                            ])
+                                            ]),
+                                            # Broker-side TRAIL order instead of the backend monitor
+                                            dbc.Switch(
+                                                id="native-trailing-stop",
+                                                label="Broker-side trailing stop",
+                                                value=False,
+                                                className="mt-2"
+                                            )
                                         ], width=12),
                                     ]),
                                     # Notification area
@@ -268,6 +288,20 @@ def create_layout(initial_data=None):
             interval=20 * 1000,
             n_intervals=0
         ),
+
+        # Refreshes shares held and average cost from the backend's fill ledger
+        dcc.Interval(
+            id='positions-interval',
+            interval=5 * 1000,
+            n_intervals=0
+        ),
+
+        # Drains prices pushed by the backend stream; runs in the browser only
+        dcc.Interval(
+            id='price-stream-interval',
+            interval=500,
+            n_intervals=0
+        ),
         
         # Footer - simplified for mobile
         html.Footer(
@@ -281,6 +315,8 @@ def create_layout(initial_data=None):
         # Hidden divs for data management
         dcc.Store(id="data-change-timestamp"),
         dcc.Store(id="save-status"),
+        dcc.Store(id="table-changes"),  # Rows changed by the last stock-table update, filled in the browser
+        dcc.Store(id="positions-store"),  # Shares held and average cost per ticker from the fill ledger
     ])
     
     return layout
\ No newline at end of file
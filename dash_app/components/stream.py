@@ -0,0 +1,29 @@
+from flask import Response, jsonify, request, stream_with_context
+
+from ..utils.api import get_client_stats, stream_prices
+
+def register_stream_routes(app):
+    """Register same-origin streaming and diagnostics routes on the Dash Flask server"""
+
+    # The browser cannot always reach the backend directly (e.g. on mobile),
+    # so the backend Server-Sent Events stream is relayed through the Dash server
+    @app.server.route("/price-stream")
+    def price_stream():
+        tickers = [ticker for ticker in request.args.get("symbols", "").split(",") if ticker]
+        if not tickers:
+            return Response(status=204)
+
+        # EventSource sends the id of the last event it received when it reconnects
+        last_event_id = request.headers.get("Last-Event-ID", "")
+        since_version = int(last_event_id) if last_event_id.isdigit() else None
+
+        return Response(
+            stream_with_context(stream_prices(tickers, since_version=since_version)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    # Latency, error counts and circuit-breaker state of this server's calls to the backend
+    @app.server.route("/client-stats")
+    def client_stats():
+        return jsonify(get_client_stats())
@@ -1,18 +1,227 @@
 import requests
+from requests.adapters import HTTPAdapter
 import os
 import logging
+import random
+import threading
+import time
+
+from modules.latency import LatencyStats
 
 # API endpoint - use environment variable or default
 BACKEND_URL = os.environ.get("BACKEND_URL", "http://127.0.0.1:8000")
 
+# Minimum gap between price pushes requested from the backend stream
+PRICE_STREAM_THROTTLE_MS = int(os.environ.get("PRICE_STREAM_THROTTLE_MS", "500"))
+
+# Keep-alive connections kept per backend host; Dash serves callbacks from several threads
+BACKEND_POOL_SIZE = int(os.environ.get("BACKEND_POOL_SIZE", "20"))
+
+# (connect, read) timeouts in seconds per endpoint; orders wait for the gateway acknowledgement
+TIMEOUTS = {
+    "status": (2, 3),
+    "order": (2, 15),
+    "orders": (2, 30),
+    "company_name": (2, 5),
+    "positions": (2, 5),
+    # The backend sends a keepalive every 15s, so a read this long means the stream is stuck
+    "prices_stream": (5, 45)
+}
+
+# Extra attempts for idempotent calls only; orders are never resent
+RETRIES = {
+    "status": 1,
+    "company_name": 1,
+    "positions": 1
+}
+RETRY_BACKOFF_SECONDS = 0.1
+
+# Statuses that mean the backend itself is unavailable rather than the request being wrong
+UNAVAILABLE_STATUSES = {502, 503, 504}
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("dash_api")
 
+
+class BackendUnavailable(Exception):
+    """Raised without a network call while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated backend failures, then let one probe through to test recovery"""
+
+    def __init__(self, failure_threshold=5, reset_seconds=10):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Return whether a call may go out now"""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self.probing = False
+            if self.state == "half_open" and not self.probing:
+                # Exactly one call tests the backend; the rest keep failing fast until it returns
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        """Close the breaker after any call the backend answered"""
+        with self.lock:
+            if self.state != "closed":
+                logger.info("Backend recovered, closing circuit breaker")
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        """Count a failure and open the breaker at the threshold or when a probe fails"""
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                if self.state == "closed":
+                    logger.warning(f"Backend failed {self.failures} times in a row, opening circuit breaker")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed"""
+        with self.lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def status(self):
+        """Report breaker state for the stats endpoint"""
+        return {"state": self.state, "failures": self.failures, "retry_in_seconds": round(self.retry_in(), 1)}
+
+
+class RetryBudget:
+    """Cap retries at a fraction of recent calls so retries never multiply load on a struggling backend"""
+
+    def __init__(self, ratio=0.1, reserve=10):
+        self.ratio = ratio  # Retry tokens earned per call
+        self.reserve = reserve  # Most tokens held, so a quiet period cannot bank a retry storm
+        self.tokens = float(reserve)
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        """Earn a fraction of a retry for one call"""
+        with self.lock:
+            self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Spend one retry if the budget allows"""
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# One pooled session so calls reuse keep-alive connections instead of opening a socket each time
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=BACKEND_POOL_SIZE, max_retries=0))
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=BACKEND_POOL_SIZE, max_retries=0))
+
+breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get("BACKEND_BREAKER_FAILURES", "5")),
+    reset_seconds=float(os.environ.get("BACKEND_BREAKER_RESET_SECONDS", "10"))
+)
+retry_budget = RetryBudget(ratio=float(os.environ.get("BACKEND_RETRY_BUDGET", "0.1")))
+
+stats_lock = threading.Lock()
+endpoint_stats = {
+    endpoint: {"latency": LatencyStats(), "calls": 0, "errors": 0, "retries": 0, "short_circuited": 0}
+    for endpoint in TIMEOUTS
+}
+
+def _count(endpoint, counter):
+    """Increment one per-endpoint counter"""
+    with stats_lock:
+        endpoint_stats[endpoint][counter] += 1
+
+def _request(endpoint, method, path, **kwargs):
+    """Send one backend call with the endpoint's timeout, retries and the circuit breaker
+
+    Returns the response, raises BackendUnavailable while the breaker is open and
+    re-raises request errors once retries are exhausted. Every attempt is recorded
+    as a success or failure, so a half-open breaker never waits on a lost probe.
+    """
+    retries = RETRIES.get(endpoint, 0)
+    retry_budget.deposit()
+    attempt = 0
+
+    while True:
+        if not breaker.allow():
+            _count(endpoint, "short_circuited")
+            raise BackendUnavailable(f"Backend unavailable, retrying in {breaker.retry_in():.0f}s")
+
+        _count(endpoint, "calls")
+        error = None
+        response = None
+        start = time.perf_counter()
+        try:
+            response = session.request(method, f"{BACKEND_URL}{path}", timeout=TIMEOUTS[endpoint], **kwargs)
+        except requests.RequestException as e:
+            # Includes bodies cut off mid-read, so a half-open probe always resolves
+            error = e
+        except Exception:
+            breaker.record_failure()
+            raise
+        endpoint_stats[endpoint]["latency"].record((time.perf_counter() - start) * 1000)
+
+        if response is not None and response.status_code not in UNAVAILABLE_STATUSES:
+            breaker.record_success()
+            return response
+
+        _count(endpoint, "errors")
+        breaker.record_failure()
+        if attempt >= retries or not retry_budget.withdraw():
+            if response is not None:
+                return response
+            raise error
+
+        attempt += 1
+        _count(endpoint, "retries")
+        if response is not None:
+            response.close()
+        time.sleep(RETRY_BACKOFF_SECONDS * attempt * random.uniform(0.5, 1.5))
+
+def get_client_stats():
+    """Report per-endpoint latency and error counts, the circuit breaker and the retry budget"""
+    with stats_lock:
+        endpoints = {
+            endpoint: {
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "short_circuited": stats["short_circuited"],
+                "latency": stats["latency"].summary()
+            }
+            for endpoint, stats in endpoint_stats.items()
+        }
+    return {
+        "backend_url": BACKEND_URL,
+        "circuit_breaker": breaker.status(),
+        "retry_tokens": round(retry_budget.tokens, 2),
+        "endpoints": endpoints
+    }
+
 def check_connection_status():
     """Check if the backend is connected to Interactive Brokers"""
     try:
-        response = requests.get(f"{BACKEND_URL}/status", timeout=5)
+        response = _request("status", "GET", "/status")
         if response.status_code == 200:
             return response.json().get("connected", False)
         return False
@@ -23,11 +232,19 @@ def check_connection_status():
 def place_order(order_details):
     """Place an order with the backend API"""
     try:
-        response = requests.post(f"{BACKEND_URL}/order", json=order_details)
+        response = _request("order", "POST", "/order", json=order_details)
         return response.json()
     except Exception as e:
         return {"success": False, "message": f"Error communicating with backend: {str(e)}"}
 
+def place_orders(orders):
+    """Place a basket of orders with one backend call"""
+    try:
+        response = _request("orders", "POST", "/orders", json={"orders": orders})
+        return response.json()
+    except Exception as e:
+        return {"success": False, "message": f"Error communicating with backend: {str(e)}", "results": []}
+
 def get_stock_info(ticker):
     """Get stock information from the backend API"""
     try:
@@ -46,7 +263,7 @@ def get_stock_info(ticker):
 def get_company_name(ticker):
     """Get company name for a ticker using the backend API"""
     try:
-        response = requests.get(f"{BACKEND_URL}/company_name/{ticker}", timeout=5)
+        response = _request("company_name", "GET", f"/company_name/{ticker}")
         if response.status_code == 200:
             data = response.json()
             return data.get("company_name", ticker)
@@ -57,25 +274,39 @@ def get_company_name(ticker):
         logger.error(f"Error fetching company name for {ticker}: {str(e)}")
         return ''
 
-def get_real_time_prices(tickers):
-    """Get real-time prices for multiple tickers"""
+def get_positions():
+    """Get positions built from fills, with average cost, keyed by symbol; None if unavailable"""
     try:
-        if not tickers:
-            return {}
-            
-        response = requests.post(f"{BACKEND_URL}/prices", json={"symbols": tickers})
-        
+        response = _request("positions", "GET", "/positions")
         if response.status_code != 200:
-            logger.error(f"Error fetching prices: {response.text}")
-            return {}
-        
-        data = response.json()
-        
-        if "error" in data:
-            logger.error(f"API error: {data['error']}")
-            return {}
-        
-        return data.get("prices", {})
+            logger.error(f"Error fetching positions: {response.text}")
+            return None
+        return response.json().get("positions", {})
+    except Exception as e:
+        logger.error(f"Error getting positions: {str(e)}")
+        return None
+
+def stream_prices(tickers, since_version=None, throttle_ms=PRICE_STREAM_THROTTLE_MS):
+    """Relay the backend price stream as raw Server-Sent Events lines"""
+    params = {"symbols": ",".join(tickers), "throttle_ms": throttle_ms}
+    if since_version is not None:
+        # Resume after the last version the browser saw instead of resending every price
+        params["since_version"] = since_version
+
+    try:
+        with _request("prices_stream", "GET", "/prices/stream", params=params, stream=True) as response:
+            if response.status_code != 200:
+                logger.error(f"Error opening price stream: {response.text}")
+                return
+
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    yield f"{line}\n"
+            except requests.RequestException as e:
+                # A stream silent past its read timeout counts against the breaker; ending the
+                # relay makes the browser's EventSource reconnect through it
+                _count("prices_stream", "errors")
+                breaker.record_failure()
+                logger.warning(f"Price stream stalled, closing it: {str(e)}")
     except Exception as e:
-        logger.error(f"Error getting real-time prices: {str(e)}")
-        return {}
+        logger.error(f"Error streaming real-time prices: {str(e)}")
@@ -1,10 +1,9 @@
-import pandas as pd
-import random
-from datetime import datetime
-import json
 import os
 import logging
 
+from .position_record import PositionRecord
+from .table_store import JsonBackend, SqliteBackend, WriteBehindStore
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("data_utils")
@@ -12,77 +11,34 @@ logger = logging.getLogger("data_utils")
 # Define the path for the data file
 DATA_DIR = os.environ.get("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data"))
 DATA_FILE = os.path.join(DATA_DIR, "stock_data.json")
+DATABASE_FILE = os.path.join(DATA_DIR, "stock_data.db")
 
-def create_dataframe(data_dict):
-    """Create a DataFrame from the table data dictionary"""
-    rows = []
-    for name, details in data_dict.items():
-        row = {
-            "Name": name,
-            "Ticker": details["ticker"],
-            "Price": float(details["price"]) if details["price"] else 0,
-            "Number": int(details["number"]) if details["number"] else 0,
-        }
-        
-        # Calculate the Total as the total P&L
-        if "total_pnl" in details and details["total_pnl"]:
-            row["Total"] = float(details["total_pnl"])
-        else:
-            row["Total"] = 0
-            
-        # Add additional fields if they exist
-        if "opening_price" in details and details["opening_price"]:
-            row["Opening_Price"] = details["opening_price"]
-            
-        if "closing_price" in details and details["closing_price"]:
-            row["Closing_Price"] = details["closing_price"]
-            
-        if "pnl" in details and details["pnl"]:
-            row["PnL"] = float(details["pnl"])
-            
-        rows.append(row)
-        
-    return pd.DataFrame(rows)
+# "json" rewrites stock_data.json atomically; "sqlite" writes only changed rows to a WAL database
+TABLE_STORE_BACKEND = os.environ.get("TABLE_STORE_BACKEND", "json")
 
-def get_real_time_price(ticker, current_price=None):
-    """Get real-time price for a ticker - this is a placeholder"""
-    # In a real app, this would call an API to get the current price
-    # For now, we'll just simulate price changes
-    if current_price is None:
-        return 0
-    else:
-        return current_price
+# Saves within this window are coalesced into one write
+TABLE_STORE_FLUSH_MS = int(os.environ.get("TABLE_STORE_FLUSH_MS", "1000"))
 
+if TABLE_STORE_BACKEND == "sqlite":
+    table_store = WriteBehindStore(SqliteBackend(DATABASE_FILE, import_from=DATA_FILE), flush_ms=TABLE_STORE_FLUSH_MS)
+else:
+    table_store = WriteBehindStore(JsonBackend(DATA_FILE), flush_ms=TABLE_STORE_FLUSH_MS)
 
-def save_table_data(data_dict):
-    """Save the table data to a JSON file"""
+def save_table_changes(changed, removed=(), order=None):
+    """Queue a change set of saved rows by name, removed names and the new row order if it changed"""
     try:
-        # Ensure the data directory exists
-        os.makedirs(DATA_DIR, exist_ok=True)
-
-        # Save the data to a JSON file
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data_dict, f)
-
-        logger.info(f"Table data saved to {DATA_FILE}")
+        table_store.update(changed, removed, order)
         return True
     except Exception as e:
-        logger.error(f"Error saving table data: {str(e)}")
+        logger.error(f"Error saving table changes: {str(e)}")
         return False
 
 def load_table_data():
-    """Load the table data from a JSON file"""
+    """Load the table data, including changes not yet flushed to disk"""
     try:
-        # Check if the file exists
-        if not os.path.exists(DATA_FILE):
-            logger.info(f"No saved data found at {DATA_FILE}")
-            return {}
-
-        # Load the data from the JSON file
-        with open(DATA_FILE, 'r') as f:
-            data_dict = json.load(f)
-
-        logger.info(f"Table data loaded from {DATA_FILE}")
+        # Files saved before numbers were stored as numbers are converted here
+        data_dict = {name: PositionRecord.from_storage(name, values).to_storage() for name, values in table_store.load().items()}
+        logger.info(f"Table data loaded ({TABLE_STORE_BACKEND} backend)")
         return data_dict
     except Exception as e:
         logger.error(f"Error loading table data: {str(e)}")
@@ -0,0 +1,104 @@
+def _parse(value, kind, default):
+    """Parse a stored or edited table value, treating blanks and junk as missing"""
+    if value is None or value == "":
+        return default
+    try:
+        return int(float(value)) if kind is int else kind(value)
+    except (ValueError, TypeError):
+        return default
+
+
+class PositionRecord:
+    """One stock table row, with numbers kept as numbers and None for empty cells
+
+    This is the only place that converts between the DataTable row format
+    (capitalized columns, "" for empty cells) and the saved format (lowercase
+    keys, JSON numbers and null).
+    """
+
+    # (attribute and storage key, table column, type, default)
+    FIELDS = (
+        ("ticker", "Ticker", str, ""),
+        ("price", "Price", float, None),
+        ("opening_price", "Opening_Price", float, None),
+        ("closing_price", "Closing_Price", float, None),
+        ("pnl", "PnL", float, None),
+        ("shadow_pnl", "Shadow_PnL", float, None),
+        ("number", "Number", int, 0),
+        ("original_number", "Original_Number", int, None),  # Falls back to number
+        ("total_pnl", "Total", float, 0.0),
+        # Read-only, from the backend's fill ledger; Number and Opening_Price stay user-editable
+        ("filled", "Filled", int, None),
+        ("avg_cost", "Avg_Cost", float, None)
+    )
+
+    __slots__ = ("name",) + tuple(field[0] for field in FIELDS)
+
+    def __init__(self, name, ticker, **values):
+        self.name = name
+        self.ticker = ticker
+        for attribute, _, _, default in self.FIELDS[1:]:
+            setattr(self, attribute, values.get(attribute, default))
+        if self.original_number is None:
+            self.original_number = self.number
+
+    @classmethod
+    def _decode(cls, name, values, key):
+        """Build a record from a dict using the attribute (0) or column (1) names"""
+        record = cls.__new__(cls)
+        record.name = name
+        for field in cls.FIELDS:
+            setattr(record, field[0], _parse(values.get(field[key]), field[2], field[3]))
+        if record.original_number is None:
+            record.original_number = record.number
+        return record
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a record from a DataTable row"""
+        return cls._decode(row["Name"], row, 1)
+
+    def to_row(self):
+        """Return the DataTable row for this record"""
+        row = {"Name": self.name}
+        for attribute, column, _, _ in self.FIELDS:
+            value = getattr(self, attribute)
+            row[column] = "" if value is None else value
+        return row
+
+    @classmethod
+    def from_storage(cls, name, data):
+        """Build a record from its saved form, including files written with every value as a string"""
+        return cls._decode(name, data, 0)
+
+    def to_storage(self):
+        """Return the saved form of this record"""
+        return {attribute: getattr(self, attribute) for attribute, _, _, _ in self.FIELDS}
+
+    def buy(self, price, quantity):
+        """Open or add to a position at the order's limit price; fills report the real average cost separately"""
+        if self.number > 0 and self.opening_price is not None:
+            # Adding to an open position averages the cost instead of replacing it
+            self.opening_price = round((self.opening_price * self.number + price * quantity) / (self.number + quantity), 4)
+            self.number += quantity
+            self.original_number = max(self.original_number, self.number)
+        else:
+            self.opening_price = price
+            self.number = quantity
+            self.original_number = quantity
+            self.closing_price = None
+            self.pnl = None
+            self.shadow_pnl = None
+
+    def sell(self, price, quantity):
+        """Close part or all of the position, realizing P&L against the opening price"""
+        self.closing_price = price
+        if self.opening_price is not None:
+            self.pnl = round((price - self.opening_price) * quantity, 2)
+            self.total_pnl = round(self.total_pnl + self.pnl, 2)
+        self.number = max(0, self.number - quantity)
+
+
+def decode_table(data):
+    """Convert a saved table to DataTable rows"""
+    return [PositionRecord.from_storage(name, values).to_row() for name, values in data.items()]
@@ -0,0 +1,187 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+
+logger = logging.getLogger("table_store")
+
+
+class JsonBackend:
+    """Whole-table JSON file, replaced atomically on every flush"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the saved table, or an empty one if nothing was saved yet"""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def write(self, table, changed, removed, order_changed):
+        """Write the full table to a temporary file and rename it over the old one"""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+
+        # A crash mid-write leaves the previous file intact instead of a truncated one
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".stock_data.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(table, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def close(self):
+        pass
+
+
+class SqliteBackend:
+    """One SQLite row per stock in WAL mode, so a flush only writes the rows that changed"""
+
+    def __init__(self, path, import_from=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints, never corrupt
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS stocks (name TEXT PRIMARY KEY, position INTEGER NOT NULL, data TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+        # Carry over the table saved by the JSON backend the first time SQLite is used
+        if import_from and os.path.exists(import_from) and not self.load():
+            table = JsonBackend(import_from).load()
+            self.write(table, table.keys(), (), True)
+            logger.info(f"Imported {len(table)} rows from {import_from}")
+
+    def load(self):
+        """Return the saved table in display order"""
+        rows = self.connection.execute("SELECT name, data FROM stocks ORDER BY position").fetchall()
+        return {name: json.loads(data) for name, data in rows}
+
+    def write(self, table, changed, removed, order_changed):
+        """Upsert changed rows and delete removed ones in one transaction"""
+        # Positions are rewritten for every row when rows were added, removed or reordered
+        names = list(table)
+        upserts = names if order_changed else [name for name in names if name in changed]
+        positions = {name: index for index, name in enumerate(names)}
+
+        with self.connection:
+            self.connection.executemany("DELETE FROM stocks WHERE name = ?", [(name,) for name in removed])
+            self.connection.executemany(
+                "INSERT INTO stocks (name, position, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET position = excluded.position, data = excluded.data",
+                [(name, positions[name], json.dumps(table[name])) for name in upserts]
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class WriteBehindStore:
+    """Coalesce table saves in memory and flush them to a backend at most once per interval
+
+    update() drops rows that match the last saved version, so saving unchanged
+    data never touches the disk.
+    Changes made within one interval are written together by a timer thread.
+    """
+
+    def __init__(self, backend, flush_ms=1000):
+        self.backend = backend
+        self.flush_seconds = flush_ms / 1000
+        self.table = None  # Latest saved table, loaded lazily
+        self.changed = set()
+        self.removed = set()
+        self.order_changed = False
+        self.timer = None
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.skipped = 0
+
+        atexit.register(self.close)
+
+    def load(self):
+        """Return the latest table, including changes not yet flushed"""
+        with self.lock:
+            self._ensure_loaded()
+            return {name: dict(row) for name, row in self.table.items()}
+
+    def update(self, changed, removed=(), order=None):
+        """Apply a change set of rows by name, removed names and optionally the new row order"""
+        with self.lock:
+            self._ensure_loaded()
+            previous = self.table
+            changed = {name: row for name, row in changed.items() if previous.get(name) != row}
+            removed = [name for name in removed if name in previous]
+            if order is not None and list(order) == list(previous):
+                order = None
+            self._apply(changed, removed, order)
+
+    def _apply(self, changed, removed, order):
+        """Merge a change set into the table and schedule a flush; the lock must be held"""
+        if not changed and not removed and order is None:
+            self.skipped += 1
+            return
+
+        # Added or removed rows shift positions, which the SQLite backend rewrites for every row
+        reordered = order is not None or bool(removed) or any(name not in self.table for name in changed)
+
+        table = {name: row for name, row in self.table.items() if name not in removed}
+        for name, row in changed.items():
+            table[name] = dict(row)
+        if order is not None:
+            table = {name: table[name] for name in order if name in table}
+        self.table = table
+
+        self.changed.update(changed)
+        self.changed.difference_update(removed)
+        self.removed.update(removed)
+        self.removed.difference_update(table)
+        self.order_changed = self.order_changed or reordered
+
+        if self.timer is None:
+            self.timer = threading.Timer(self.flush_seconds, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """Write pending changes now"""
+        with self.lock:
+            self.timer = None
+            if not self.changed and not self.removed and not self.order_changed:
+                return
+            try:
+                self.backend.write(self.table, self.changed, self.removed, self.order_changed)
+            except Exception as e:
+                # Changes stay pending and are retried with the next save
+                logger.error(f"Error saving table data: {str(e)}")
+                return
+            self.writes += 1
+            logger.debug(f"Flushed {len(self.changed)} changed and {len(self.removed)} removed rows")
+            self.changed = set()
+            self.removed = set()
+            self.order_changed = False
+
+    def close(self):
+        """Flush pending changes and release the backend"""
+        if self.timer is not None:
+            self.timer.cancel()
+        self.flush()
+        self.backend.close()
+
+    def _ensure_loaded(self):
+        """Load the saved table the first time it is needed"""
+        if self.table is None:
+            try:
+                self.table = self.backend.load()
+            except Exception as e:
+                logger.error(f"Error loading table data: {str(e)}")
+                self.table = {}
@@ -0,0 +1,242 @@
+"""Trailing-stop percentage sweeps over cached historical bars
+
+Bars are cached per symbol as CSV under data/bars/ by the fetch command, which
+connects to TWS or the Gateway from config.yaml with its own client ID. The
+sweep replays the live trigger rule (raise the high-water mark, then exit when
+price <= high * (1 - stop% / 100)) over every session of every symbol and
+returns one results row per (symbol, percentage).
+
+Usage: python -m modules.backtest fetch AAPL MSFT --duration "1 Y"
+       python -m modules.backtest AAPL MSFT --percentages 0.5:10:0.5
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from ib_insync import IB, Stock
+import numpy as np
+import pandas as pd
+
+from modules.config import load_config
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_BARS_DIR = PROJECT_ROOT / "data" / "bars"
+
+# Separate from the backend's client IDs so bars can be fetched while it runs
+FETCH_CLIENT_ID = 9
+
+logger = logging.getLogger(__name__)
+
+
+def bars_path(symbol, bars_dir=None):
+    """Path of the cached bar file for a symbol"""
+    return Path(bars_dir or DEFAULT_BARS_DIR) / f"{symbol}.csv"
+
+
+async def fetch_bars(ib, contract, bars_dir=None, duration="1 Y", bar_size="1 min", chunk="1 W"):
+    """Download historical bars for a contract in chunks and cache them to CSV (runs on the IB loop)"""
+    symbol = contract.symbol
+    chunks = []
+    end = ""
+    total_days = _duration_days(duration)
+    chunk_days = _duration_days(chunk)
+
+    # IB limits minute bars per request, so walk backwards one chunk at a time
+    for _ in range(max(1, -(-total_days // chunk_days))):
+        bars = await ib.reqHistoricalDataAsync(
+            contract,
+            endDateTime=end,
+            durationStr=chunk,
+            barSizeSetting=bar_size,
+            whatToShow="TRADES",
+            useRTH=True
+        )
+        if not bars:
+            break
+        chunks.append(pd.DataFrame([{"date": bar.date, "close": bar.close} for bar in bars]))
+        end = bars[0].date
+
+    if not chunks:
+        logger.warning(f"No historical bars returned for {symbol}")
+        return None
+
+    frame = pd.concat(reversed(chunks)).drop_duplicates("date").sort_values("date")
+    path = bars_path(symbol, bars_dir)
+    os.makedirs(path.parent, exist_ok=True)
+    frame.to_csv(path, index=False)
+    logger.info(f"Cached {len(frame)} bars for {symbol} to {path}")
+    return path
+
+
+async def fetch(symbols, bars_dir=None, duration="1 Y", bar_size="1 min", client_id=FETCH_CLIENT_ID, config=None):
+    """Connect to the configured gateway, qualify the symbols and cache bars for each"""
+    ibkr_config = (config or load_config()).get("ibkr", {})
+    ib = IB()
+    await ib.connectAsync(ibkr_config.get("host", "127.0.0.1"), ibkr_config.get("port", 7497), clientId=client_id)
+    try:
+        contracts = await ib.qualifyContractsAsync(*(Stock(symbol, "SMART", "USD") for symbol in symbols))
+        qualified = {contract.symbol for contract in contracts if contract.conId}
+        for symbol in symbols:
+            if symbol not in qualified:
+                logger.error(f"Could not qualify contract for {symbol}, no bars fetched")
+
+        paths = []
+        for contract in contracts:
+            if contract.conId:
+                paths.append(await fetch_bars(ib, contract, bars_dir, duration, bar_size))
+        return paths
+    finally:
+        ib.disconnect()
+
+
+def load_bars(symbol, bars_dir=None):
+    """Load cached bars as (close prices, session ids), one session per calendar day"""
+    frame = pd.read_csv(bars_path(symbol, bars_dir), parse_dates=["date"])
+    frame = frame[frame["close"] > 0]
+    sessions = frame["date"].dt.normalize().factorize()[0]
+    return frame["close"].to_numpy(dtype=float), sessions
+
+
+def simulate(prices, sessions, percentages):
+    """Simulate one trade per session for every stop percentage
+
+    Each session is entered at its first price and exited at the first price
+    that crosses the trailing stop (the limit price the live engine would
+    send), or at the session's last price if the stop never triggers.
+    Returns a dict of per-percentage arrays.
+    """
+    prices = np.asarray(prices, dtype=float)
+    sessions = np.asarray(sessions)
+
+    # Session boundaries and the running high-water mark within each session
+    starts = np.flatnonzero(np.r_[True, sessions[1:] != sessions[:-1]])
+    ends = np.r_[starts[1:], len(prices)] - 1
+    highest = pd.Series(prices).groupby(sessions).cummax().to_numpy()
+
+    session_of_bar = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    entry = prices[starts]
+
+    results = {key: [] for key in ("trades", "triggered", "mean_return_pct", "total_return_pct",
+                                   "win_rate", "mean_bars_held")}
+    for percentage in percentages:
+        crossed = np.flatnonzero(prices <= highest * (1 - percentage / 100))
+
+        # First crossing per session, else hold to the session's last bar
+        exit_index = ends.copy()
+        triggered = np.zeros(len(starts), dtype=bool)
+        if crossed.size:
+            first_sessions, first = np.unique(session_of_bar[crossed], return_index=True)
+            exit_index[first_sessions] = crossed[first]
+            triggered[first_sessions] = True
+
+        returns = (prices[exit_index] / entry - 1) * 100
+        results["trades"].append(len(starts))
+        results["triggered"].append(int(triggered.sum()))
+        results["mean_return_pct"].append(float(returns.mean()))
+        results["total_return_pct"].append(float(returns.sum()))
+        results["win_rate"].append(float((returns > 0).mean()))
+        results["mean_bars_held"].append(float((exit_index - starts + 1).mean()))
+
+    return results
+
+
+def sweep_symbol(symbol, percentages, bars_dir=None):
+    """Run the percentage grid for one symbol and return its results rows"""
+    try:
+        prices, sessions = load_bars(symbol, bars_dir)
+    except Exception as e:
+        logger.error(f"Error loading bars for {symbol}: {str(e)}")
+        return pd.DataFrame()
+
+    if not len(prices):
+        return pd.DataFrame()
+
+    frame = pd.DataFrame(simulate(prices, sessions, percentages))
+    frame.insert(0, "stop_percentage", list(percentages))
+    frame.insert(0, "symbol", symbol)
+    return frame
+
+
+def sweep(symbols, percentages, bars_dir=None, max_workers=None):
+    """Sweep stop percentages across symbols in parallel and return one results table
+
+    Each worker process loads its own bars from disk, so only the symbol name
+    and the grid cross the process boundary.
+    """
+    percentages = [float(percentage) for percentage in percentages]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        frames = list(pool.map(
+            sweep_symbol,
+            symbols,
+            [percentages] * len(symbols),
+            [bars_dir] * len(symbols),
+            chunksize=max(1, len(symbols) // (4 * (max_workers or os.cpu_count() or 1)))
+        ))
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def best_percentages(results, metric="mean_return_pct"):
+    """Return the best stop percentage per symbol by the given metric"""
+    if results.empty:
+        return results
+    best = results.loc[results.groupby("symbol")[metric].idxmax()]
+    return best.set_index("symbol")
+
+
+def _duration_days(duration):
+    """Convert an IB duration string such as '1 Y' or '2 W' to days"""
+    value, unit = duration.split()
+    return int(value) * {"S": 1, "D": 1, "W": 7, "M": 30, "Y": 365}[unit.upper()]
+
+
+def _parse_percentages(spec):
+    """Parse 'start:stop:step' (inclusive) or a comma-separated list"""
+    if ":" in spec:
+        start, stop, step = (float(part) for part in spec.split(":"))
+        return np.round(np.arange(start, stop + step / 2, step), 6).tolist()
+    return [float(part) for part in spec.split(",")]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Fetch historical bars and sweep trailing-stop percentages over them")
+    commands = parser.add_subparsers(dest="command")
+
+    fetch_parser = commands.add_parser("fetch", help="Download bars from the gateway into the bars directory")
+    fetch_parser.add_argument("symbols", nargs="+")
+    fetch_parser.add_argument("--duration", default="1 Y", help="IB duration string, e.g. '6 M'")
+    fetch_parser.add_argument("--bar-size", default="1 min", help="IB bar size, e.g. '5 mins'")
+    fetch_parser.add_argument("--client-id", type=int, default=FETCH_CLIENT_ID)
+    fetch_parser.add_argument("--bars-dir", default=None)
+
+    sweep_parser = commands.add_parser("sweep", help="Sweep stop percentages over cached bars (the default)")
+    sweep_parser.add_argument("symbols", nargs="*", help="Symbols to sweep (default: every cached symbol)")
+    sweep_parser.add_argument("--percentages", default="0.5:10:0.5", help="start:stop:step or comma list")
+    sweep_parser.add_argument("--bars-dir", default=None)
+    sweep_parser.add_argument("--workers", type=int, default=None)
+    sweep_parser.add_argument("--output", default=None, help="Write the results table to this CSV file")
+
+    # Without a command the arguments are a sweep, as before fetch existed
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in ("fetch", "sweep", "-h", "--help"):
+        argv = ["sweep"] + argv
+    args = parser.parse_args(argv)
+
+    if args.command == "fetch":
+        asyncio.run(fetch(args.symbols, args.bars_dir, args.duration, args.bar_size, args.client_id))
+    else:
+        symbols = args.symbols or sorted(path.stem for path in Path(args.bars_dir or DEFAULT_BARS_DIR).glob("*.csv"))
+        results = sweep(symbols, _parse_percentages(args.percentages), args.bars_dir, args.workers)
+
+        if args.output:
+            results.to_csv(args.output, index=False)
+        print(best_percentages(results).to_string())
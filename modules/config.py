@@ -16,10 +16,71 @@ def load_config(config_path=None):
             "ibkr": {
                 "host": "127.0.0.1",
                 "port": 7497,  # 7497 for TWS paper trading, 7496 for TWS live, 4002 for Gateway
-                "client_id": 1
+                "client_id": 1,
+                "roles": {  # Separate client IDs keep quote traffic off the order socket
+                    "orders": 1,
+                    "market_data": 2,
+                    "reference": 3
+                }
+            },
+            "fake_gateway": {
+                "enabled": False,  # Run against an in-process simulated gateway instead of TWS/Gateway
+                "latency_ms": 1.0,
+                "tick_interval_ms": 100,
+                "volatility_bps": 5,
+                "fill_latency_ms": 5,
+                "partial_fills": 1,
+                "commission": 1.0,
+                "default_price": 100.0,
+                "prices": {},
+                "unknown_symbols": [],
+                "seed": None
+            },
+            "connection": {
+                "connect_timeout_seconds": 4,
+                "reconnect_initial_delay_seconds": 1,  # Doubles on every failed attempt
+                "reconnect_max_delay_seconds": 60,
+                "reconnect_jitter": 0.2  # Spread each delay by +/- 20%
             },
             "trading": {
                 "default_trailing_stop_percentage": 2.0,
-                "check_interval_seconds": 5
+                "check_interval_seconds": 5,
+                "order_ack_timeout_seconds": 5,  # Max wait for the gateway to acknowledge an order
+                "stop_journal_file": "data/stop_journal.jsonl",  # Trailing stops survive restarts
+                "stop_journal_flush_ms": 500,
+                "stop_journal_compact_records": 10000
+            },
+            "risk": {
+                "enabled": True,
+                "max_order_quantity": 10000,
+                "max_order_notional": 100000,  # Per order, quantity * limit price
+                "max_position_notional": 250000,  # Per symbol, open lot cost plus unfilled buys
+                "max_account_notional": 1000000,
+                "price_band_percentage": 5.0,  # Reject limits this far from the live quote
+                "max_quote_age_seconds": 30,  # Older quotes are not used for the price band
+                "require_quote": False,  # Reject orders with no fresh quote
+                "symbols": {}  # Per-symbol overrides
+            },
+            "pacing": {
+                "messages_per_second": 40,  # All outbound API messages, below IBKR's 50 msg/s limit
+                "burst": 10
+            },
+            "market_data": {
+                "quote_idle_timeout_seconds": 300,  # Drop streaming quotes nobody has asked for
+                "max_lines": 100  # Concurrent market-data lines allowed by the IBKR account
+            },
+            "contracts": {
+                "cache_file": "data/contracts.json",  # Qualified contracts persisted across restarts
+                "unknown_symbol_ttl_seconds": 60  # Symbols that fail qualification are not retried sooner
+            },
+            "reference_data": {
+                "company_name_cache_size": 1024,
+                "company_name_ttl_seconds": 86400,
+                "unknown_symbol_ttl_seconds": 300  # Negative cache for symbols IB does not know
+            },
+            "streaming": {
+                "default_throttle_ms": 250,  # Minimum gap between pushes to one client
+                "min_throttle_ms": 100,
+                "keepalive_seconds": 15
             }
         }
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import random
+import time
+
+
+class ConnectionSupervisor:
+    """Own the IB connection: reconnect with exponential backoff and jitter
+
+    Runs as a task on the IB loop. Request handlers never connect themselves;
+    they read the cached state, which is replaced (never mutated) on every
+    transition so other threads can read it without locking. Listeners are
+    woken on every state change.
+    """
+
+    def __init__(self, ib, connect, initial_delay=1, max_delay=60, jitter=0.2, name="IBKR"):
+        self.ib = ib
+        self.name = name  # Used in log messages
+        self.connect = connect  # Coroutine function that connects and rebuilds session state, raising on failure
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+        self.state = {"state": "disconnected", "since": time.time(), "attempt": 0,
+                      "last_error": None, "next_retry": None, "version": 0}
+        self.listeners = set()
+        self.disconnected = asyncio.Event()
+        self.task = None
+        self.logger = logging.getLogger(__name__)
+
+        self.ib.disconnectedEvent += self.disconnected.set
+
+    def start(self):
+        """Start supervising; the first connection attempt is made immediately"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stop supervising without touching the socket"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self._publish("stopped")
+
+    def is_connected(self):
+        """Answer from cached state without touching the socket"""
+        return self.state["state"] == "connected"
+
+    async def _run(self):
+        """Connect, wait for a disconnect, back off and retry, forever"""
+        attempt = 0
+        while True:
+            attempt += 1
+            self._publish("connecting", attempt=attempt)
+            self.disconnected.clear()
+            try:
+                await self.connect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = self._backoff(attempt)
+                self.logger.error(f"{self.name} connection attempt {attempt} failed: {str(e)}, retrying in {delay:.1f}s")
+                self._publish("backoff", attempt=attempt, last_error=str(e), next_retry=time.time() + delay)
+                await asyncio.sleep(delay)
+                continue
+
+            attempt = 0
+            self._publish("connected")
+            await self.disconnected.wait()
+            self.logger.warning(f"Lost connection to {self.name}")
+            self._publish("disconnected")
+
+    def _backoff(self, attempt):
+        """Exponential delay for an attempt, capped and spread by +/- jitter"""
+        delay = min(self.max_delay, self.initial_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _publish(self, state, **fields):
+        """Replace the cached state and wake every listener"""
+        previous = self.state
+        self.state = {
+            "state": state,
+            "since": time.time() if state != previous["state"] else previous["since"],
+            "attempt": fields.get("attempt", 0),
+            "last_error": fields.get("last_error", previous["last_error"]),
+            "next_retry": fields.get("next_retry"),
+            "version": previous["version"] + 1
+        }
+        if state != previous["state"]:
+            self.logger.info(f"{self.name} connection state {previous['state']} -> {state}")
+        for loop, listener in tuple(self.listeners):
+            loop.call_soon_threadsafe(listener.set)
+
+    def add_listener(self, listener=None):
+        """Register an event that is set on every state change
+
+        The event belongs to the caller's loop and is set thread-safely from the IB loop.
+        An existing event can be passed to share one listener across supervisors.
+        """
+        listener = listener or asyncio.Event()
+        self.listeners.add((asyncio.get_running_loop(), listener))
+        return listener
+
+    def remove_listener(self, listener):
+        """Unregister a listener returned by add_listener"""
+        for entry in tuple(self.listeners):
+            if entry[1] is listener:
+                self.listeners.discard(entry)
@@ -0,0 +1,133 @@
+from ib_insync import Contract, Stock, util
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from modules.message_pacer import PRIORITY_REFERENCE
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_CACHE_FILE = PROJECT_ROOT / "data" / "contracts.json"
+
+
+class ContractRegistry:
+    """Qualify stock contracts in concurrent batches and remember them across restarts"""
+
+    def __init__(self, ib, pacer, cache_file=None, unknown_symbol_ttl=60):
+        self.ib = ib
+        self.pacer = pacer
+        self.cache_file = PROJECT_ROOT / cache_file if cache_file else DEFAULT_CACHE_FILE
+        self.contracts = {}
+        self.unknown_symbol_ttl = unknown_symbol_ttl
+        self.unknown = {}  # symbol -> monotonic time until which it is not retried
+        self.inflight = {}  # symbol -> task qualifying the batch it is in
+        self.save_lock = threading.Lock()
+        self.save_version = 0
+        self.saved_version = 0
+        self.logger = logging.getLogger(__name__)
+        self.load()
+
+    def load(self):
+        """Load previously qualified contracts from disk"""
+        try:
+            if not os.path.exists(self.cache_file):
+                return
+
+            with open(self.cache_file, 'r') as f:
+                stored = json.load(f)
+
+            for symbol, fields in stored.items():
+                self.contracts[symbol] = Contract.create(**fields)
+
+            self.logger.info(f"Loaded {len(self.contracts)} qualified contracts from {self.cache_file}")
+        except Exception as e:
+            self.logger.error(f"Error loading contract cache: {str(e)}")
+
+    def save(self):
+        """Persist qualified contracts to disk atomically without blocking the IB loop"""
+        # Snapshot on the loop; the JSON write runs on the default executor
+        self.save_version += 1
+        stored = {symbol: util.dataclassNonDefaults(contract) for symbol, contract in self.contracts.items()}
+        return asyncio.get_event_loop().run_in_executor(None, self._write, self.save_version, stored)
+
+    def _write(self, version, stored):
+        """Write one snapshot unless a newer one is already on disk (runs in an executor thread)"""
+        with self.save_lock:
+            if version <= self.saved_version:
+                return
+            try:
+                os.makedirs(self.cache_file.parent, exist_ok=True)
+                tmp_file = f"{self.cache_file}.tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump(stored, f)
+                os.replace(tmp_file, self.cache_file)
+                self.saved_version = version
+            except Exception as e:
+                self.logger.error(f"Error saving contract cache: {str(e)}")
+
+    def get(self, symbol):
+        """Return the cached qualified contract for a symbol, if any"""
+        return self.contracts.get(symbol)
+
+    async def qualify(self, symbols):
+        """Qualify every unknown symbol in one concurrent batch and return contracts by symbol"""
+        # Symbols that just failed qualification (e.g. delisted) are not retried until their entry expires
+        now = time.monotonic()
+        missing = [
+            symbol for symbol in dict.fromkeys(symbols)
+            if symbol not in self.contracts and self.unknown.get(symbol, 0) <= now
+        ]
+
+        # Symbols another caller is already qualifying share its request instead of sending their own
+        tasks = [self.inflight[symbol] for symbol in missing if symbol in self.inflight]
+        new = [symbol for symbol in missing if symbol not in self.inflight]
+        if new:
+            task = asyncio.ensure_future(self._qualify_batch(new))
+            for symbol in new:
+                self.inflight[symbol] = task
+            tasks.append(task)
+
+        if tasks:
+            await asyncio.gather(*(asyncio.shield(task) for task in dict.fromkeys(tasks)))
+
+        return {symbol: self.contracts.get(symbol) for symbol in symbols}
+
+    async def _qualify_batch(self, symbols):
+        """Send one batch of qualification requests and remember the results"""
+        try:
+            contracts = [Stock(symbol, "SMART", "USD") for symbol in symbols]
+            # qualifyContractsAsync gathers all contract detail requests concurrently;
+            # lookups rank below every other message class
+            await self.pacer.acquire(PRIORITY_REFERENCE, messages=len(contracts))
+            await self.ib.qualifyContractsAsync(*contracts)
+            self._remember(symbols, contracts)
+        finally:
+            for symbol in symbols:
+                self.inflight.pop(symbol, None)
+
+    async def get_contract(self, symbol):
+        """Return a qualified contract for one symbol, or None if the gateway does not know it"""
+        contract = self.contracts.get(symbol)
+        if contract is not None:
+            return contract
+
+        contracts = await self.qualify([symbol])
+        return contracts[symbol]
+
+    def _remember(self, symbols, contracts):
+        """Store freshly qualified contracts and persist them"""
+        qualified = 0
+        for symbol, contract in zip(symbols, contracts):
+            if contract.conId:
+                self.contracts[symbol] = contract
+                self.unknown.pop(symbol, None)
+                qualified += 1
+            else:
+                self.unknown[symbol] = time.monotonic() + self.unknown_symbol_ttl
+                self.logger.warning(f"Could not qualify contract for {symbol}, not retrying for {self.unknown_symbol_ttl}s")
+
+        if qualified:
+            self.save()
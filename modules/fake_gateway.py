@@ -0,0 +1,452 @@
+"""In-process stand-in for TWS/IB Gateway for offline load and latency testing
+
+FakeClient replaces the socket client inside a real ib_insync IB instance and
+answers requests by calling the same Wrapper callbacks the socket decoder
+would, so Trades, Tickers and every IB event behave as they do live. One
+FakeGateway is shared by all clients of a process and simulates a random-walk
+market plus an order book that fills marketable LMT, MKT and TRAIL orders.
+
+Enable it with fake_gateway.enabled in config.yaml.
+"""
+from datetime import datetime, timezone
+import asyncio
+import logging
+import math
+import random
+
+from ib_insync import CommissionReport, Contract, ContractDetails, Execution, OrderState
+from ib_insync.client import Client
+
+FAKE_ACCOUNT = "DU0000000"
+TICK_BID, TICK_ASK, TICK_LAST = 1, 2, 4
+
+
+class FakeGateway:
+    """Simulated market and order book shared by every FakeClient
+
+    Must be used from the IB loop thread.
+    """
+
+    def __init__(self, latency_ms=1.0, tick_interval_ms=100, volatility_bps=5, fill_latency_ms=5,
+                 partial_fills=1, commission=1.0, default_price=100.0, prices=None, unknown_symbols=None,
+                 seed=None):
+        self.latency = latency_ms / 1000
+        self.tick_interval = tick_interval_ms / 1000
+        self.volatility = volatility_bps / 10000
+        self.fill_latency = fill_latency_ms / 1000
+        self.partial_fills = max(1, int(partial_fills))
+        self.commission = commission
+        self.default_price = default_price
+        self.prices = dict(prices or {})
+        self.unknown_symbols = set(unknown_symbols or [])
+        self.random = random.Random(seed)
+        self.logger = logging.getLogger(__name__)
+
+        self.clients = {}  # clientId -> connected FakeClient
+        self.next_order_ids = {}  # clientId -> next valid orderId, kept across reconnects
+        self.con_ids = {}  # symbol -> conId
+        self.subscriptions = {}  # symbol -> {(client, reqId)}
+        self.orders = {}  # (clientId, orderId) -> working order
+        self.executions = []  # (clientId, contract, execution)
+        self.next_perm_id = 1000000
+        self.tick_task = None
+        self.counts = {"orders": 0, "fills": 0, "cancels": 0, "ticks": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a gateway from the fake_gateway config section"""
+        return cls(
+            latency_ms=config.get("latency_ms", 1.0),
+            tick_interval_ms=config.get("tick_interval_ms", 100),
+            volatility_bps=config.get("volatility_bps", 5),
+            fill_latency_ms=config.get("fill_latency_ms", 5),
+            partial_fills=config.get("partial_fills", 1),
+            commission=config.get("commission", 1.0),
+            default_price=config.get("default_price", 100.0),
+            prices=config.get("prices"),
+            unknown_symbols=config.get("unknown_symbols"),
+            seed=config.get("seed")
+        )
+
+    def attach(self, ib):
+        """Swap the socket client of a fresh IB instance for a simulated one"""
+        ib.client = FakeClient(ib.wrapper, self)
+        ib.client.apiEnd += ib.disconnectedEvent
+        return ib.client
+
+    def connect(self, client):
+        """Register a client; like TWS, a client ID can only be connected once"""
+        if client.clientId in self.clients:
+            raise ConnectionError(f"clientId {client.clientId} already in use")
+        self.clients[client.clientId] = client
+        return self.next_order_ids.setdefault(client.clientId, 1)
+
+    def disconnect(self, client):
+        """Forget a client and its market-data subscriptions; its orders keep working"""
+        if self.clients.get(client.clientId) is client:
+            del self.clients[client.clientId]
+        for subscribers in self.subscriptions.values():
+            for entry in [entry for entry in subscribers if entry[0] is client]:
+                subscribers.discard(entry)
+
+    def drop_all(self):
+        """Simulate the gateway closing every connection, e.g. a nightly restart"""
+        for client in list(self.clients.values()):
+            client.drop()
+
+    def price(self, symbol):
+        """Current simulated price, seeded from config or the default"""
+        if symbol not in self.prices:
+            self.prices[symbol] = round(self.default_price * self.random.uniform(0.5, 2), 2)
+        return self.prices[symbol]
+
+    def contract_details(self, contract):
+        """Details for a stock symbol, or None for symbols configured as unknown"""
+        symbol = contract.symbol
+        if not symbol or symbol in self.unknown_symbols:
+            return None
+
+        con_id = self.con_ids.setdefault(symbol, 100000 + len(self.con_ids))
+        qualified = Contract(
+            secType="STK", conId=con_id, symbol=symbol, exchange="SMART", primaryExchange="NASDAQ",
+            currency="USD", localSymbol=symbol, tradingClass=symbol
+        )
+        return ContractDetails(contract=qualified, marketName=symbol, minTick=0.01, longName=f"{symbol} Simulated Inc")
+
+    def subscribe(self, client, req_id, symbol):
+        """Start streaming a symbol to a client and send the current quote at once"""
+        self.subscriptions.setdefault(symbol, set()).add((client, req_id))
+        client.respond(*self._quote_calls(client, req_id, self.price(symbol)))
+        self._ensure_ticking()
+
+    def unsubscribe(self, client, req_id):
+        """Stop streaming one subscription"""
+        for subscribers in self.subscriptions.values():
+            subscribers.discard((client, req_id))
+
+    def _ensure_ticking(self):
+        """Start the price loop if it is not running"""
+        if self.tick_task is None or self.tick_task.done():
+            self.tick_task = asyncio.ensure_future(self._tick_loop())
+
+    async def _tick_loop(self):
+        """Move every subscribed price one random-walk step per tick interval"""
+        while any(self.subscriptions.values()) or self.orders:
+            await asyncio.sleep(self.tick_interval)
+            self.step()
+
+    def step(self):
+        """Advance all subscribed and traded symbols by one tick"""
+        batches = {}  # client -> calls, so each client gets one batch per step
+        symbols = set(symbol for symbol, subscribers in self.subscriptions.items() if subscribers)
+        symbols.update(order["contract"].symbol for order in self.orders.values())
+
+        for symbol in symbols:
+            price = max(0.01, round(self.price(symbol) * math.exp(self.random.gauss(0, self.volatility)), 2))
+            self.prices[symbol] = price
+            for client, req_id in self.subscriptions.get(symbol, ()):
+                batches.setdefault(client, []).extend(self._quote_calls(client, req_id, price))
+                self.counts["ticks"] += 1
+
+        for client, calls in batches.items():
+            client.respond(*calls)
+
+        for order in list(self.orders.values()):
+            self._match(order)
+
+    @staticmethod
+    def _quote_calls(client, req_id, price):
+        """Bid, ask and last ticks around a price"""
+        wrapper = client.wrapper
+        return [
+            lambda: wrapper.priceSizeTick(req_id, TICK_BID, round(price - 0.01, 2), 100),
+            lambda: wrapper.priceSizeTick(req_id, TICK_ASK, round(price + 0.01, 2), 100),
+            lambda: wrapper.priceSizeTick(req_id, TICK_LAST, price, 100)
+        ]
+
+    def place_order(self, client, order_id, contract, order):
+        """Accept an order, acknowledge it and fill it when marketable"""
+        key = (client.clientId, order_id)
+        self.next_order_ids[client.clientId] = max(self.next_order_ids.get(client.clientId, 1), order_id + 1)
+        if key in self.orders:
+            # Modification: take the new terms, keep fill state
+            self.orders[key]["order"] = order
+            self._match(self.orders[key])
+            return
+
+        # Assign the permId as the gateway's openOrder message would
+        self.next_perm_id += 1
+        order.permId = self.next_perm_id
+        record = {
+            "key": key, "client_id": client.clientId, "contract": contract, "order": order,
+            "filled": 0.0, "avg_price": 0.0, "high": None, "filling": False,
+            # Held until transmitted (parent without transmit) or until the parent fills (child)
+            "held": not order.transmit or bool(order.parentId)
+        }
+        self.orders[key] = record
+        self.counts["orders"] += 1
+
+        # A transmitting child also releases its parent
+        parent = self.orders.get((client.clientId, order.parentId)) if order.parentId else None
+        if parent is not None and order.transmit:
+            parent["held"] = False
+
+        self._send_status(record, "PreSubmitted" if record["held"] else "Submitted", open_order=True)
+        if parent is not None and order.transmit:
+            self._send_status(parent, "Submitted")
+            self._match(parent)
+        self._match(record)
+        self._ensure_ticking()
+
+    def cancel_order(self, client, order_id):
+        """Cancel a working order and any children waiting on it"""
+        record = self.orders.pop((client.clientId, order_id), None)
+        if record is None:
+            client.respond(lambda: client.wrapper.error(order_id, 10147, f"OrderId {order_id} that needs to be cancelled is not found.", ""))
+            return
+
+        self.counts["cancels"] += 1
+        self._send_status(record, "Cancelled")
+        for child in [o for o in self.orders.values() if o["order"].parentId == order_id and o["client_id"] == client.clientId]:
+            self.cancel_order(client, child["order"].orderId)
+
+    def _match(self, record):
+        """Fill an order whose price condition is met at the current price"""
+        if record["held"] or record["filling"] or record["key"] not in self.orders:
+            return
+
+        order = record["order"]
+        price = self.price(record["contract"].symbol)
+        buy = order.action == "BUY"
+
+        if order.orderType == "MKT":
+            marketable = True
+        elif order.orderType == "LMT":
+            marketable = price <= order.lmtPrice if buy else price >= order.lmtPrice
+        elif order.orderType in ("TRAIL", "TRAIL LIMIT"):
+            record["high"] = max(record["high"] or price, price)
+            marketable = price <= record["high"] * (1 - order.trailingPercent / 100)
+        else:
+            marketable = False
+
+        if marketable:
+            record["filling"] = True
+            asyncio.get_event_loop().call_later(self.fill_latency, self._fill, record, price)
+
+    def _fill(self, record, price):
+        """Execute an order in partial_fills executions and release its children"""
+        if record["key"] not in self.orders:
+            return  # Cancelled while the fill was in flight
+
+        order = record["order"]
+        remaining = order.totalQuantity - record["filled"]
+        chunks = [remaining // self.partial_fills] * self.partial_fills
+        chunks[-1] += remaining - sum(chunks)
+
+        for shares in (chunk for chunk in chunks if chunk > 0):
+            cost = record["avg_price"] * record["filled"] + price * shares
+            record["filled"] += shares
+            record["avg_price"] = cost / record["filled"]
+            self._send_execution(record, shares, price)
+
+        del self.orders[record["key"]]
+        client_id, order_id = record["key"]
+        for child in [o for o in self.orders.values() if o["order"].parentId == order_id and o["client_id"] == client_id]:
+            child["held"] = False
+            self._send_status(child, "Submitted")
+            self._match(child)
+
+    def _send_execution(self, record, shares, price):
+        """Report one execution, the order status after it and its commission"""
+        order = record["order"]
+        self.counts["fills"] += 1
+        execution = Execution(
+            execId=f"SIM.{order.permId}.{self.counts['fills']:06d}",
+            time=datetime.now(timezone.utc),
+            acctNumber=FAKE_ACCOUNT,
+            exchange="SIM",
+            side="BOT" if order.action == "BUY" else "SLD",
+            shares=shares,
+            price=price,
+            permId=order.permId,
+            clientId=record["client_id"],
+            orderId=order.orderId,
+            cumQty=record["filled"],
+            avgPrice=record["avg_price"]
+        )
+        self.executions.append((record["client_id"], record["contract"], execution))
+
+        client = self.clients.get(record["client_id"])
+        if client is None:
+            return  # Reported through reqExecutions when the client reconnects
+
+        status = "Filled" if record["filled"] >= order.totalQuantity else "Submitted"
+        report = CommissionReport(execId=execution.execId, commission=self.commission, currency="USD")
+        client.respond(
+            lambda: client.wrapper.execDetails(-1, record["contract"], execution),
+            self._status_call(client, record, status, price),
+            lambda: client.wrapper.commissionReport(report)
+        )
+
+    def _send_status(self, record, status, open_order=False):
+        """Report an order's status, preceded by openOrder for new orders"""
+        client = self.clients.get(record["client_id"])
+        if client is None:
+            return
+
+        calls = []
+        if open_order:
+            order = record["order"]
+            calls.append(lambda: client.wrapper.openOrder(order.orderId, record["contract"], order, OrderState(status=status)))
+        calls.append(self._status_call(client, record, status))
+        client.respond(*calls)
+
+    @staticmethod
+    def _status_call(client, record, status, last_price=0.0):
+        """An orderStatus callback for the current fill state"""
+        order = record["order"]
+        filled = record["filled"]
+        avg_price = record["avg_price"]
+        return lambda: client.wrapper.orderStatus(
+            order.orderId, status, filled, order.totalQuantity - filled, avg_price,
+            order.permId, order.parentId, last_price, record["client_id"], "", 0.0
+        )
+
+    def open_order_calls(self, client):
+        """openOrder and orderStatus for every working order of a reconnecting client"""
+        calls = []
+        for record in self.orders.values():
+            if record["client_id"] == client.clientId:
+                order = record["order"]
+                status = "PreSubmitted" if record["held"] else "Submitted"
+                calls.append(lambda r=record, o=order, s=status: client.wrapper.openOrder(o.orderId, r["contract"], o, OrderState(status=s)))
+                calls.append(self._status_call(client, record, status))
+        return calls
+
+    def stats(self):
+        """Report simulated activity"""
+        return {
+            "clients": sorted(self.clients),
+            "subscriptions": sum(len(subscribers) for subscribers in self.subscriptions.values()),
+            "working_orders": len(self.orders),
+            **self.counts
+        }
+
+
+class FakeClient(Client):
+    """ib_insync Client that talks to a FakeGateway instead of a socket
+
+    Requests the gateway does not simulate are logged and dropped.
+    """
+
+    def __init__(self, wrapper, gateway):
+        super().__init__(wrapper)
+        self.gateway = gateway
+
+    async def connectAsync(self, host, port, clientId, timeout=2.0):
+        self._logger.info(f"Connecting to simulated gateway with clientId {clientId}...")
+        self.host = host
+        self.port = int(port)
+        self.clientId = int(clientId)
+        self.connState = Client.CONNECTING
+        await asyncio.sleep(self.gateway.latency)
+
+        try:
+            self._reqIdSeq = self.gateway.connect(self)
+        except ConnectionError as e:
+            self.connState = Client.DISCONNECTED
+            self.apiError.emit(str(e))
+            raise
+
+        self.connState = Client.CONNECTED
+        self._serverVersion = self.MaxClientVersion
+        self._accounts = [FAKE_ACCOUNT]
+        self._apiReady = True
+        self.wrapper.managedAccounts(FAKE_ACCOUNT)
+        self._logger.info("API connection ready")
+        self.apiStart.emit()
+
+    def disconnect(self):
+        self._logger.info("Disconnecting from simulated gateway")
+        self.gateway.disconnect(self)
+        self.connState = Client.DISCONNECTED
+        self.reset()
+
+    def drop(self):
+        """Simulate the gateway closing this connection"""
+        self.gateway.disconnect(self)
+        self._onSocketDisconnected("Simulated gateway dropped the connection")
+
+    def respond(self, *calls):
+        """Deliver wrapper callbacks after the simulated latency as one batch"""
+        asyncio.get_event_loop().call_later(self.gateway.latency, self._deliver, calls)
+
+    def _deliver(self, calls):
+        """Run one batch of callbacks the way the socket decoder would"""
+        if not self.isConnected():
+            return
+        for call in calls:
+            call()
+        self._numMsgRecv += len(calls)
+        self.wrapper.tcpDataProcessed()
+
+    def _check_connected(self):
+        """Fail like Client.send does when the socket is closed"""
+        if not self.isConnected():
+            raise ConnectionError("Not connected")
+
+    def send(self, *fields, makeEmpty=True):
+        self._check_connected()
+        self._logger.warning(f"Simulated gateway ignores message type {fields[0] if fields else None}")
+
+    def reqMarketDataType(self, marketDataType):
+        pass
+
+    def reqAutoOpenOrders(self, bAutoBind):
+        pass
+
+    def reqPositions(self):
+        self.respond(self.wrapper.positionEnd)
+
+    def reqOpenOrders(self):
+        self.respond(*self.gateway.open_order_calls(self), self.wrapper.openOrderEnd)
+
+    def reqCompletedOrders(self, apiOnly):
+        self.respond(self.wrapper.completedOrdersEnd)
+
+    def reqAccountUpdates(self, subscribe, acctCode):
+        self.respond(lambda: self.wrapper.accountDownloadEnd(acctCode))
+
+    def reqAccountUpdatesMulti(self, reqId, account, modelCode, ledgerAndNLV):
+        self.respond(lambda: self.wrapper.accountUpdateMultiEnd(reqId))
+
+    def reqExecutions(self, reqId, execFilter):
+        calls = [
+            lambda c=contract, e=execution: self.wrapper.execDetails(reqId, c, e)
+            for client_id, contract, execution in self.gateway.executions
+            if client_id == self.clientId
+        ]
+        self.respond(*calls, lambda: self.wrapper.execDetailsEnd(reqId))
+
+    def reqContractDetails(self, reqId, contract):
+        self._check_connected()
+        details = self.gateway.contract_details(contract)
+        if details is None:
+            self.respond(lambda: self.wrapper.error(reqId, 200, "No security definition has been found for the request", ""))
+        else:
+            self.respond(lambda: self.wrapper.contractDetails(reqId, details), lambda: self.wrapper.contractDetailsEnd(reqId))
+
+    def reqMktData(self, reqId, contract, genericTickList, snapshot, regulatorySnapshot, mktDataOptions):
+        self._check_connected()
+        self.gateway.subscribe(self, reqId, contract.symbol)
+
+    def cancelMktData(self, reqId):
+        self.gateway.unsubscribe(self, reqId)
+
+    def placeOrder(self, orderId, contract, order):
+        self._check_connected()
+        self.gateway.place_order(self, orderId, contract, order)
+
+    def cancelOrder(self, orderId, manualCancelOrderTime=""):
+        self._check_connected()
+        self.gateway.cancel_order(self, orderId)
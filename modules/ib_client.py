@@ -0,0 +1,81 @@
+from ib_insync import IB, Contract, ContractDetails
+from typing import Any, Awaitable, Callable, List, Optional, TypeVar
+import asyncio
+import logging
+import inspect
+import threading
+
+from modules.message_pacer import MessagePacer, PRIORITY_REFERENCE
+
+T = TypeVar("T")
+
+
+class IBClient:
+    """Own an ib_insync IB instance and its event loop on a dedicated thread
+
+    All IB state lives on the loop thread. Callers on other event loops submit
+    coroutines or calls to it, and plain threads use call_sync, so a slow gateway
+    call never blocks the caller's loop. Orders and subscriptions go through
+    OrderManager and MarketDataManager, which pace them, check risk and keep the
+    ledger and line counts; there are deliberately no raw order or market-data
+    commands here.
+    """
+
+    def __init__(self, name="ib-loop", messages_per_second=40, burst=10, loop_owner=None, fake_gateway=None):
+        self.logger = logging.getLogger(__name__)
+        if loop_owner is None:
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run_loop, name=name, daemon=True)
+            self.thread.start()
+        else:
+            # Share another client's loop thread; this client still gets its own socket and pacer
+            self.loop = loop_owner.loop
+            self.thread = loop_owner.thread
+
+        # Create the IB instance on its own loop so ib_insync binds to it
+        self.ib = self.call_sync(IB)
+        if fake_gateway is not None:
+            # Offline mode: the simulated gateway answers in place of TWS
+            self.call_sync(fake_gateway.attach, self.ib)
+        self.pacer = self.call_sync(MessagePacer, messages_per_second, burst)
+
+    def _run_loop(self):
+        """Run the IB event loop forever"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable[T]) -> Awaitable[T]:
+        """Schedule a coroutine on the IB loop and return an awaitable for the caller's loop"""
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def call(self, func: Callable[..., T], *args: Any) -> Awaitable[T]:
+        """Run a plain function on the IB loop and return an awaitable result"""
+        async def run():
+            return func(*args)
+        return self.submit(run())
+
+    def call_sync(self, func: Callable[..., T], *args: Any, timeout: Optional[float] = None) -> T:
+        """Run a plain function on the IB loop from a plain thread and wait for its result"""
+        async def run():
+            return func(*args)
+        return asyncio.run_coroutine_threadsafe(run(), self.loop).result(timeout)
+
+    async def _paced(self, priority: int, func: Callable[..., Any], *args: Any, messages: int = 1) -> Any:
+        """Wait for the pacer, then call func on the IB loop and await its result if needed"""
+        await self.pacer.acquire(priority, messages)
+        result = func(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def is_connected(self) -> bool:
+        """Check if the IB socket is connected"""
+        return self.ib.isConnected()
+
+    async def disconnect(self) -> None:
+        """Disconnect from TWS/Gateway"""
+        await self.call(self.ib.disconnect)
+
+    async def req_contract_details(self, contract: Contract) -> List[ContractDetails]:
+        """Request contract details for a contract"""
+        return await self.submit(self._paced(PRIORITY_REFERENCE, self.ib.reqContractDetailsAsync, contract))
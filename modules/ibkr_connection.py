@@ -1,76 +1,267 @@
-from ib_insync import IB, util
-import logging
+from functools import partial
 import asyncio
-import nest_asyncio
-import streamlit as st
-import time
+import logging
 
+from modules.ib_client import IBClient
 from modules.order_manager import OrderManager
+from modules.contract_registry import ContractRegistry
+from modules.quote_cache import QuoteCache
+from modules.market_data_manager import MarketDataManager
+from modules.trailing_stop import TrailingStopEngine
+from modules.stop_journal import StopJournal
+from modules.position_ledger import PositionLedger
+from modules.risk_gate import RiskGate
+from modules.message_pacer import PRIORITY_MARKET_DATA
+from modules.connection_supervisor import ConnectionSupervisor
+from modules.fake_gateway import FakeGateway
 
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
+# Connection roles; each role can get its own client ID and socket
+ROLE_ORDERS = "orders"
+ROLE_MARKET_DATA = "market_data"
+ROLE_REFERENCE = "reference"
+ROLES = (ROLE_ORDERS, ROLE_MARKET_DATA, ROLE_REFERENCE)
 
 class IBKRConnection:
-    def __init__(self, host="127.0.0.1", port=7497, client_id=1):
+    def __init__(self, host="127.0.0.1", port=7497, client_id=1, config=None):
         self.host = host
         self.port = port
         self.client_id = client_id
-        self.ib = IB()
-        self.order_manager = None
+        self.config = config or {}
         self.logger = logging.getLogger(__name__)
+
+        # One IB client per distinct client ID. They share one event loop thread but
+        # each has its own socket and pacer, so a saturated market-data connection
+        # never delays order traffic. Roles without their own ID use client_id.
+        role_ids = self.config.get("ibkr", {}).get("roles") or {}
+        self.client_ids = {role: role_ids.get(role, client_id) for role in ROLES}
+
+        # Every client talks to the same simulated gateway when it is enabled
+        fake_config = self.config.get("fake_gateway", {})
+        self.fake_gateway = FakeGateway.from_config(fake_config) if fake_config.get("enabled") else None
+        if self.fake_gateway:
+            self.logger.warning("Using the simulated IB gateway; no orders reach Interactive Brokers")
+
+        pacing_config = self.config.get("pacing", {})
+        self.clients_by_id = {}
+        for cid in dict.fromkeys(self.client_ids.values()):
+            loop_owner = next(iter(self.clients_by_id.values()), None)
+            self.clients_by_id[cid] = IBClient(
+                messages_per_second=pacing_config.get("messages_per_second", 40),
+                burst=pacing_config.get("burst", 10),
+                loop_owner=loop_owner,
+                fake_gateway=self.fake_gateway
+            )
+        self.clients = {role: self.clients_by_id[cid] for role, cid in self.client_ids.items()}
+
+        # Handlers run their IB-loop work through the order client; every client shares its loop
+        self.client = self.clients[ROLE_ORDERS]
+        self.ib = self.client.ib
+        market_data_client = self.clients[ROLE_MARKET_DATA]
+        reference_client = self.clients[ROLE_REFERENCE]
+
+        self.contract_registry = ContractRegistry(
+            reference_client.ib,
+            reference_client.pacer,
+            cache_file=self.config.get("contracts", {}).get("cache_file"),
+            unknown_symbol_ttl=self.config.get("contracts", {}).get("unknown_symbol_ttl_seconds", 60)
+        )
+        market_data_config = self.config.get("market_data", {})
+        self.market_data = MarketDataManager(
+            market_data_client.ib,
+            market_data_client.pacer,
+            max_lines=market_data_config.get("max_lines", 100)
+        )
+        self.quote_cache = self.client.call_sync(
+            QuoteCache,
+            market_data_client.ib,
+            self.contract_registry,
+            self.market_data,
+            market_data_config.get("quote_idle_timeout_seconds", 300)
+        )
+
+        # Stops live with the connection so they survive reconnects, and are
+        # journaled so they survive process restarts
+        trading_config = self.config.get("trading", {})
+        self.stop_journal = StopJournal(
+            path=trading_config.get("stop_journal_file"),
+            flush_interval=trading_config.get("stop_journal_flush_ms", 500) / 1000,
+            compact_after=trading_config.get("stop_journal_compact_records", 10000)
+        )
+        self.trailing_stops = self.client.call_sync(
+            TrailingStopEngine, self.ib, self.client.pacer, self.market_data, self.stop_journal
+        )
+
+        # Fills drive position tracking and stop sizing
+        self.ledger = self.client.call_sync(PositionLedger, self.ib)
+        self.ledger.fill_listeners.append(self.on_fill)
+
+        self.risk_gate = RiskGate(self.quote_cache, self.ledger, self.config.get("risk", {}))
+        self.order_manager = OrderManager(
+            self.client,
+            self.contract_registry,
+            self.trailing_stops,
+            self.ledger,
+            risk_gate=self.risk_gate,
+            ack_timeout=trading_config.get("order_ack_timeout_seconds", 5)
+        )
+
+        # One supervisor per socket owns (re)connection; handlers only read cached state
+        connection_config = self.config.get("connection", {})
+        self.supervisors = {
+            cid: self.client.call_sync(
+                ConnectionSupervisor,
+                client.ib,
+                partial(self._connect, cid),
+                connection_config.get("reconnect_initial_delay_seconds", 1),
+                connection_config.get("reconnect_max_delay_seconds", 60),
+                connection_config.get("reconnect_jitter", 0.2),
+                f"IBKR client {cid} ({', '.join(self.roles_for(cid))})"
+            )
+            for cid, client in self.clients_by_id.items()
+        }
+        self.connect_timeout = connection_config.get("connect_timeout_seconds", 4)
         logging.basicConfig(level=logging.INFO, 
                             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-    def on_order_filled(self, trade):
-        if trade.orderStatus.status == 'Filled' and trade.order.action == 'BUY':
-            self.order_manager.start_trailing_stop_monitor(
-                trade.contract.symbol
-            )
-            self.logger.info(
-                f"Buy order filled at {trade.fills[-1].execution.price if trade.fills else 'unknown'} price. Trailing stop activated.")
-
-    def connect(self):
-        """Connect to Interactive Brokers"""
-        try:
-            if not self.ib.isConnected():
-                self.ib.connect(self.host, self.port, clientId=self.client_id)
-                
-                # Wait for connection to establish
-                time.sleep(1)
-                
-                if self.ib.isConnected():
-                    self.logger.info(f"Connected to IBKR at {self.host}:{self.port}")
-                    
-                    # Import here to avoid circular imports
-                    from modules.order_manager import OrderManager
-                    self.order_manager = OrderManager(self.ib)
-                    
-                    # Set up callbacks
-                    self.ib.orderStatusEvent += self.on_order_filled
-                    
-                    return True
-                else:
-                    self.logger.error("Failed to connect to IBKR")
-                    return False
-            else:
-                self.logger.info("Already connected to IBKR")
-                return True
-        except Exception as e:
-            self.logger.error(f"Error connecting to IBKR: {str(e)}")
-            return False
-
-    def disconnect(self):
-        """Disconnect from Interactive Brokers"""
-        if self.ib.isConnected():
-            self.ib.disconnect()
-            self.logger.info("Disconnected from IBKR")
-
-    def is_connected(self):
-        """Check if connected to Interactive Brokers"""
-        if not self.ib.isConnected():
-            return self.connect()
-        return self.ib.isConnected()
+    def on_fill(self, trade, order, side, quantity, price):
+        """Forward ledger fills to the order manager"""
+        self.order_manager.on_fill(trade, order, side, quantity, price)
+
+    def roles_for(self, client_id):
+        """Roles served by one client ID"""
+        return [role for role, cid in self.client_ids.items() if cid == client_id]
+
+    async def start(self):
+        """Start every connection supervisor without waiting for the gateway"""
+        for supervisor in self.supervisors.values():
+            await self.client.call(supervisor.start)
+
+    async def _connect(self, client_id):
+        """Connect one client and restore its session state (runs on the IB loop, called by its supervisor)"""
+        ib = self.clients_by_id[client_id].ib
+
+        # connectAsync returns once the API handshake and initial sync are done
+        await ib.connectAsync(self.host, self.port, clientId=client_id, timeout=self.connect_timeout)
+        if not ib.isConnected():
+            raise ConnectionError(f"Could not connect to {self.host}:{self.port} as client {client_id}")
+
+        roles = self.roles_for(client_id)
+        self.logger.info(f"Connected to IBKR at {self.host}:{self.port} as client {client_id} ({', '.join(roles)})")
+        self._on_connected(roles)
+
+    def _on_connected(self, roles):
+        """Restore the subscriptions and stops that belong to the roles of a fresh connection"""
+        if ROLE_MARKET_DATA in roles:
+            # Live data type is a per-connection setting, sent once rather than per subscription
+            market_data_client = self.clients[ROLE_MARKET_DATA]
+            market_data_client.pacer.send(PRIORITY_MARKET_DATA, market_data_client.ib.reqMarketDataType, 1)
+
+            # The gateway forgets subscriptions on disconnect; reopen every line with its existing ticker
+            self.market_data.resubscribe()
+
+        if ROLE_ORDERS in roles:
+            # Apply fills that happened while disconnected (already-seen execIds are skipped)
+            self.ledger.reconcile(self.ib.trades())
+
+            # Follow native stops through their new Trade objects and re-arm journaled stops
+            self.trailing_stops.relink_native(self.ib.trades())
+            self.trailing_stops.restore()
+            self.trailing_stops.send_parked()
+
+    async def disconnect(self):
+        """Stop reconnecting and disconnect every client from Interactive Brokers"""
+        self.stop_journal.flush()
+        for client_id, supervisor in self.supervisors.items():
+            await self.client.submit(supervisor.stop())
+            client = self.clients_by_id[client_id]
+            if client.is_connected():
+                await client.disconnect()
+                self.logger.info(f"Disconnected client {client_id} from IBKR")
+
+    def is_connected(self, role=None):
+        """Check cached connection state for one role, or for all of them; never blocks"""
+        roles = [role] if role else ROLES
+        return all(self.supervisors[self.client_ids[r]].is_connected() for r in roles)
+
+    def status(self):
+        """Return cached connection state overall and per role"""
+        roles = {
+            role: dict(self.supervisors[cid].state, client_id=cid)
+            for role, cid in self.client_ids.items()
+        }
+        states = {state["state"] for state in roles.values()}
+        if states == {"connected"}:
+            overall = "connected"
+        elif "connected" in states:
+            overall = "degraded"
+        else:
+            overall = roles[ROLE_ORDERS]["state"]
+
+        return {
+            "state": overall,
+            "version": sum(supervisor.state["version"] for supervisor in self.supervisors.values()),
+            "roles": roles
+        }
+
+    def add_status_listener(self):
+        """Register one event that is set when any connection changes state"""
+        listener = asyncio.Event()
+        for supervisor in self.supervisors.values():
+            supervisor.add_listener(listener)
+        return listener
+
+    def remove_status_listener(self, listener):
+        """Unregister a listener returned by add_status_listener"""
+        for supervisor in self.supervisors.values():
+            supervisor.remove_listener(listener)
 
     def get_ib(self):
         """Get the IB instance"""
         return self.ib
+
+    async def get_quotes(self, symbols, since_version=None):
+        """Get cached quotes and the version high-water mark from the IB loop"""
+        return await self.client.submit(self.quote_cache.get_quotes(symbols, since_version=since_version))
+
+    async def place_order(self, order_details):
+        """Place an order through the order manager on the IB loop"""
+        return await self.client.submit(self.order_manager.place_order(order_details))
+
+    async def place_basket(self, orders):
+        """Place a basket of orders concurrently on the IB loop"""
+        return await self.client.submit(self.order_manager.place_basket(orders))
+
+    async def get_market_data_usage(self):
+        """Report market-data line usage against the budget"""
+        return await self.client.call(self.market_data.usage)
+
+    async def get_trailing_stops(self):
+        """Report active trailing stops"""
+        return await self.client.call(self.trailing_stops.status)
+
+    async def get_positions(self):
+        """Get fill-based positions with incremental average cost"""
+        return await self.client.call(self.ledger.snapshot)
+
+    async def get_order(self, order_id=None, perm_id=None):
+        """Look up a ledger order by orderId or permId"""
+        if perm_id is not None:
+            return await self.client.call(self.ledger.get_by_perm_id, perm_id)
+        return await self.client.call(self.ledger.get, order_id)
+
+    async def get_risk_status(self):
+        """Report risk limits, exposure and check latency"""
+        return await self.client.call(self.risk_gate.status)
+
+    async def get_pacing_stats(self):
+        """Report outbound queue depth and wait times per priority class for each client"""
+        def stats():
+            return {
+                client_id: {"roles": self.roles_for(client_id), **client.pacer.stats()}
+                for client_id, client in self.clients_by_id.items()
+            }
+        return await self.client.call(stats)
+
+    async def get_contract_details(self, contract):
+        """Get contract details for a contract on the reference-data connection"""
+        return await self.clients[ROLE_REFERENCE].req_contract_details(contract)
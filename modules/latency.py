@@ -0,0 +1,39 @@
+from collections import deque
+import threading
+
+
+class LatencyStats:
+    """Rolling window of latency samples with percentile summaries"""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency_ms):
+        """Record one latency sample in milliseconds"""
+        with self.lock:
+            self.samples.append(latency_ms)
+            self.count += 1
+
+    def summary(self):
+        """Return count, mean and p50/p90/p99/max over the current window"""
+        with self.lock:
+            samples = sorted(self.samples)
+            count = self.count
+
+        if not samples:
+            return {"count": count, "window": 0}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))], 4)
+
+        return {
+            "count": count,
+            "window": len(samples),
+            "mean_ms": round(sum(samples) / len(samples), 4),
+            "p50_ms": percentile(50),
+            "p90_ms": percentile(90),
+            "p99_ms": percentile(99),
+            "max_ms": round(samples[-1], 4)
+        }
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+import asyncio
+import logging
+import time
+
+
+class LookupCache:
+    """Bounded TTL/LRU cache with negative caching and single-flight loads"""
+
+    def __init__(self, max_entries=1024, ttl=86400, negative_ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()  # key -> (value, expires_at)
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.logger = logging.getLogger(__name__)
+
+    async def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader(key) at most once per miss
+
+        A loader result of None is cached as a negative entry for negative_ttl seconds.
+        Concurrent callers for the same missing key share one in-flight load.
+        """
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return value
+
+            # Stale entry, reload it below
+            del self.entries[key]
+            self.expirations += 1
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.ensure_future(loader(key))
+        self.inflight[key] = task
+        try:
+            value = await asyncio.shield(task)
+        finally:
+            self.inflight.pop(key, None)
+
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Insert a value, evicting the least recently used entries beyond max_entries"""
+        ttl = self.negative_ttl if value is None else self.ttl
+        self.entries[key] = (value, time.monotonic() + ttl)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a single key from the cache"""
+        self.entries.pop(key, None)
+
+    def stats(self):
+        """Return hit, miss and eviction counters"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
@@ -0,0 +1,128 @@
+import logging
+
+from modules.message_pacer import PRIORITY_EXIT, PRIORITY_MARKET_DATA
+
+# Higher priority lines survive budget pressure; stops outrank plain watchlist quotes
+PRIORITY_WATCHLIST = 0
+PRIORITY_TRAILING_STOP = 10
+
+
+class MarketDataManager:
+    """Reference-count market-data lines per symbol within a global line budget
+
+    Every reqMktData in the backend goes through acquire/release so that all
+    consumers of a symbol share one line. When the budget is full, the line
+    whose most important owner has the lowest priority is evicted in favour of
+    a higher-priority request. Subscriptions are sent through the pacer; the
+    ticker is handed out at once and fills in when the request goes out.
+    Must be used from the IB loop thread.
+    """
+
+    def __init__(self, ib, pacer, max_lines=100):
+        self.ib = ib
+        self.pacer = pacer
+        self.max_lines = max_lines
+        self.lines = {}  # symbol -> {"contract", "ticker", "owners": {owner: (priority, on_evict)}}
+        self.evictions = 0
+        self.refused = 0
+        self.logger = logging.getLogger(__name__)
+
+    def acquire(self, symbol, contract, owner, priority=PRIORITY_WATCHLIST, on_evict=None):
+        """Share or open a market-data line for symbol and return its ticker, or None if over budget"""
+        line = self.lines.get(symbol)
+        if line is None:
+            if len(self.lines) >= self.max_lines and not self._evict_below(priority):
+                self.refused += 1
+                self.logger.warning(f"Market data budget of {self.max_lines} lines exhausted, refused {symbol} for {owner}")
+                return None
+
+            line = {"contract": contract, "ticker": None, "request": None, "owners": {}}
+            self._request(line)
+            self.lines[symbol] = line
+
+        line["owners"][owner] = (priority, on_evict)
+        return line["ticker"]
+
+    def _request(self, line):
+        """Send a line's subscription through the pacer, keeping the line's ticker if it has one"""
+        if line["ticker"] is not None:
+            # After a reconnect the wrapper has forgotten the ticker; hand it back so owners keep theirs
+            self.ib.wrapper.tickers[id(line["contract"])] = line["ticker"]
+
+        # Same steps as IB.reqMktData, with the wire request queued behind the pacer
+        req_id = self.ib.client.getReqId()
+        line["ticker"] = self.ib.wrapper.startTicker(req_id, line["contract"], 'mktData')
+        line["request"] = self.pacer.send(
+            PRIORITY_MARKET_DATA, self.ib.client.reqMktData, req_id, line["contract"], '', False, False, []
+        )
+
+    def resubscribe(self):
+        """Reopen every line after a reconnect"""
+        for line in self.lines.values():
+            if line["request"] is not None and not line["request"].done():
+                line["request"].cancel()
+            self._request(line)
+
+        if self.lines:
+            self.logger.info(f"Resubscribed {len(self.lines)} market data lines")
+
+    def release(self, symbol, owner):
+        """Drop one owner's reference and cancel the line when nobody holds it"""
+        line = self.lines.get(symbol)
+        if line is None:
+            return
+
+        line["owners"].pop(owner, None)
+        if not line["owners"]:
+            self._cancel(symbol)
+
+    def _evict_below(self, priority):
+        """Cancel the least important line whose owners all rank below priority"""
+        candidates = [
+            (max(p for p, _ in line["owners"].values()), symbol)
+            for symbol, line in self.lines.items()
+        ]
+        candidates = [candidate for candidate in candidates if candidate[0] < priority]
+        if not candidates:
+            return False
+
+        _, symbol = min(candidates)
+        owners = self.lines[symbol]["owners"]
+        self._cancel(symbol)
+        self.evictions += 1
+        self.logger.info(f"Evicted market data line for {symbol} to make room for priority {priority}")
+
+        # Let owners forget the ticker they were holding
+        for owner, (_, on_evict) in owners.items():
+            if on_evict is not None:
+                on_evict(symbol)
+        return True
+
+    def _cancel(self, symbol):
+        """Cancel the market-data subscription behind a line"""
+        line = self.lines.pop(symbol)
+        try:
+            req_id = self.ib.wrapper.endTicker(line["ticker"], 'mktData')
+            if not line["request"].done():
+                # Never sent, so there is nothing to cancel at the gateway
+                line["request"].cancel()
+            elif req_id:
+                self.pacer.send(PRIORITY_EXIT, self.ib.client.cancelMktData, req_id)
+        except Exception as e:
+            self.logger.error(f"Error cancelling market data for {symbol}: {str(e)}")
+
+    def usage(self):
+        """Report line usage against the budget"""
+        by_priority = {}
+        for line in self.lines.values():
+            priority = max(p for p, _ in line["owners"].values())
+            by_priority[priority] = by_priority.get(priority, 0) + 1
+
+        return {
+            "used": len(self.lines),
+            "budget": self.max_lines,
+            "by_priority": by_priority,
+            "symbols": {symbol: sorted(line["owners"]) for symbol, line in self.lines.items()},
+            "evictions": self.evictions,
+            "refused": self.refused
+        }
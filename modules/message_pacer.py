@@ -0,0 +1,143 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from modules.latency import LatencyStats
+
+# Lower numbers are sent first when the bucket is empty
+PRIORITY_EXIT = 0  # Trailing-stop exits and cancels
+PRIORITY_ORDER = 1  # New orders
+PRIORITY_MARKET_DATA = 2  # Market-data subscriptions
+PRIORITY_REFERENCE = 3  # Contract qualification and details
+
+PRIORITY_NAMES = {
+    PRIORITY_EXIT: "exit",
+    PRIORITY_ORDER: "order",
+    PRIORITY_MARKET_DATA: "market_data",
+    PRIORITY_REFERENCE: "reference"
+}
+
+
+class MessagePacer:
+    """Token-bucket pacer with priority classes for every outbound IB API message
+
+    Messages are sent immediately while the bucket has tokens. Under pressure they
+    wait in a priority queue, so a stop exit never queues behind a burst of
+    subscriptions or lookups. The rate should stay below ib_insync's own
+    throttle so its FIFO queue never builds up. Must be used from the IB loop thread.
+    """
+
+    def __init__(self, messages_per_second=40, burst=10):
+        self.rate = messages_per_second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.queue = []  # (priority, seq, messages, enqueued, future, func, args)
+        self.sequence = itertools.count()
+        self.drain_handle = None
+
+        self.wait_times = {priority: LatencyStats() for priority in PRIORITY_NAMES}
+        self.sent = {priority: 0 for priority in PRIORITY_NAMES}
+        self.max_depth = 0
+        self.logger = logging.getLogger(__name__)
+
+    def send(self, priority, func, *args, messages=1):
+        """Call func once the bucket allows and return a future for its result
+
+        Runs inline when a token is available, so callers in event handlers pay
+        nothing unless the connection is at its pacing limit.
+        """
+        future = asyncio.get_event_loop().create_future()
+        # Fire-and-forget callers may never look at the result; errors are already logged in _drain
+        future.add_done_callback(self._retrieve)
+        self._enqueue(priority, messages, future, func, args)
+        return future
+
+    @staticmethod
+    def _retrieve(future):
+        """Mark a send future's exception as retrieved"""
+        if not future.cancelled():
+            future.exception()
+
+    async def acquire(self, priority, messages=1):
+        """Wait until messages may be sent at this priority; returns whether it had to wait"""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(priority, messages, future, None, ())
+        waited = not future.done()
+        await future
+        return waited
+
+    def release(self, priority, messages=1):
+        """Give back tokens taken by acquire for messages that were never sent"""
+        self.tokens = min(self.burst, self.tokens + messages)
+        self.sent[priority] -= messages
+        if self.queue:
+            self._drain()
+
+    def _enqueue(self, priority, messages, future, func, args):
+        """Queue one request and send whatever the bucket allows"""
+        heapq.heappush(self.queue, (priority, next(self.sequence), messages, time.perf_counter(), future, func, args))
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self._drain()
+
+    def _refill(self):
+        """Add the tokens earned since the last refill"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def _drain(self):
+        """Send queued requests in priority order while tokens last"""
+        # Called inline on every enqueue too; keep at most one pending wakeup
+        if self.drain_handle is not None:
+            self.drain_handle.cancel()
+            self.drain_handle = None
+        self._refill()
+
+        while self.queue:
+            priority, _, messages, enqueued, future, func, args = self.queue[0]
+            if future.done():
+                # Cancelled while waiting, e.g. a subscription released before it was sent
+                heapq.heappop(self.queue)
+                continue
+
+            # Requests larger than the burst go out once the bucket is full and run it into debt
+            if self.tokens < min(messages, self.burst):
+                break
+
+            heapq.heappop(self.queue)
+            self.tokens -= messages
+            self.sent[priority] += messages
+            self.wait_times[priority].record((time.perf_counter() - enqueued) * 1000)
+
+            if func is None:
+                future.set_result(True)
+                continue
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                self.logger.error(f"Error sending {PRIORITY_NAMES[priority]} message: {str(e)}")
+                future.set_exception(e)
+
+        if self.queue and self.drain_handle is None:
+            needed = min(self.queue[0][2], self.burst) - self.tokens
+            self.drain_handle = asyncio.get_event_loop().call_later(max(needed, 0) / self.rate, self._drain)
+
+    def stats(self):
+        """Report queue depth, tokens and wait-time percentiles per priority class"""
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for entry in self.queue:
+            if not entry[4].done():
+                depth[PRIORITY_NAMES[entry[0]]] += 1
+
+        return {
+            "messages_per_second": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "queue_depth": depth,
+            "max_depth": self.max_depth,
+            "sent": {PRIORITY_NAMES[priority]: count for priority, count in self.sent.items()},
+            "wait_ms": {PRIORITY_NAMES[priority]: stats.summary() for priority, stats in self.wait_times.items()}
+        }
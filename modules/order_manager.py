@@ -1,21 +1,40 @@
-from ib_insync import Stock, LimitOrder, OrderStatus
-import threading
+from ib_insync import LimitOrder, Order, OrderStatus, Stock
+import asyncio
 import time
 import logging
 
+from modules.latency import LatencyStats
+from modules.message_pacer import PRIORITY_ORDER
+
+# Any status past PendingSubmit/ApiPending means the gateway has seen the order
+ACK_STATES = {'PreSubmitted', 'Submitted', 'Inactive'} | OrderStatus.DoneStates
+REJECTED_STATES = {'Inactive', 'Cancelled', 'ApiCancelled'}
+
 class OrderManager:
-    def __init__(self, ib):
-        self.ib = ib
-        self.stop_monitors = {}
+    def __init__(self, client, contract_registry, trailing_stops, ledger, risk_gate=None, ack_timeout=5):
+        self.client = client
+        self.ib = client.ib
+        self.pacer = client.pacer
+        self.contract_registry = contract_registry
+        self.trailing_stops = trailing_stops
+        self.ledger = ledger
+        self.risk_gate = risk_gate
+        self.ack_timeout = ack_timeout
         self.logger = logging.getLogger(__name__)
-        self.symbol_data = {}
+        self.ack_latency = LatencyStats()
     
-    def place_order(self, order_details):
-        """Place a limit order"""
+    async def place_order(self, order_details):
+        """Place a limit order (runs on the IB loop)"""
         try:
-            self.symbol_data[order_details["symbol"]] = order_details
-            # Create contract
-            contract = Stock(order_details["symbol"], "SMART", "USD")
+            # Reuse the qualified contract from the registry
+            contract = await self.contract_registry.get_contract(order_details["symbol"])
+            if contract is None:
+                # Never send an unqualified contract for the gateway to guess at
+                return {
+                    "success": False,
+                    "message": f"Unknown symbol: {order_details['symbol']}",
+                    "status": "UnknownSymbol"
+                }
 
             # Create order
             action = "BUY" if order_details["action"] == "buy" else "SELL"
@@ -25,16 +44,80 @@ class OrderManager:
                 lmtPrice=order_details["limit_price"],
                 outsideRth=True  # Allow trading outside regular trading hours
             )
-            
-            # Submit order
+
+            # In native mode the trailing exit is a broker-side child of the buy
+            native_stop = (
+                action == "BUY"
+                and order_details.get("trailing_stop_enabled")
+                and order_details.get("trailing_stop_mode") == "native"
+            )
+            if native_stop:
+                limit_order.transmit = False  # Sent together with the child below
+
+            # Pre-trade risk check before pacing, so a rejected order neither takes a token nor waits
+            rejection = self._risk_rejection(order_details)
+            if rejection:
+                return rejection
+
+            messages = 2 if native_stop else 1
+            if await self.pacer.acquire(PRIORITY_ORDER, messages=messages):
+                # Orders sent while this one waited changed the exposure; check again as of the
+                # actual send (nothing awaits between here and placeOrder) and return the token
+                rejection = self._risk_rejection(order_details)
+                if rejection:
+                    self.pacer.release(PRIORITY_ORDER, messages=messages)
+                    return rejection
+
+            # Take the parent's ID only now: an exit sent while this order waited for pacing
+            # used the next ID, and the gateway rejects IDs lower than one already used
+            if native_stop:
+                limit_order.orderId = self.ib.client.getReqId()
+
+            # Submit order and return as soon as the gateway acknowledges it
+            submitted = time.perf_counter()
             trade = self.ib.placeOrder(contract, limit_order)
-            self.ib.sleep(1)  # Give time for order to be processed
+            self.ledger.register_order(trade, order_details)
+            stop_trade = None
+            if native_stop:
+                stop_trade = self.ib.placeOrder(contract, self._native_trailing_order(limit_order, order_details))
+                self.trailing_stops.track_native(order_details["symbol"], stop_trade)
+            acknowledged = await self.wait_for_status(trade, ACK_STATES, self.ack_timeout)
 
-            return {
-                "success": True,
+            ack_latency_ms = None
+            if acknowledged:
+                ack_latency_ms = round((time.perf_counter() - submitted) * 1000, 3)
+                self.ack_latency.record(ack_latency_ms)
+
+            # Optionally keep waiting until the order reaches the requested status
+            wait_for_status = order_details.get("wait_for_status")
+            if wait_for_status and trade.orderStatus.status not in OrderStatus.DoneStates:
+                await self.wait_for_status(
+                    trade,
+                    {wait_for_status} | OrderStatus.DoneStates | REJECTED_STATES,
+                    order_details.get("wait_timeout") or self.ack_timeout
+                )
+
+            status = trade.orderStatus.status
+            response = {
+                "success": status not in REJECTED_STATES,
                 "message": f"Order placed: {order_details['symbol']} {action} {order_details['quantity']} shares at ${order_details['limit_price']}",
+                "order_id": trade.order.orderId,
+                "perm_id": trade.order.permId or None,
+                "status": status,
+                "ack_latency_ms": ack_latency_ms,
+                "stop_order_id": stop_trade.order.orderId if stop_trade else None,
                 "trade": trade
             }
+
+            if status in REJECTED_STATES:
+                # The last log entry carries the gateway's reason for rejecting the order
+                reason = trade.log[-1].message if trade.log and trade.log[-1].message else status
+                response["message"] = f"Order rejected: {reason}"
+            elif not acknowledged:
+                response["message"] += " (not yet acknowledged by the gateway)"
+
+            self.logger.info(f"Order {trade.order.orderId} {status}, ack latency {ack_latency_ms} ms")
+            return response
         except Exception as e:
             self.logger.error(f"Error placing order: {str(e)}")
             return {
@@ -42,79 +125,102 @@ class OrderManager:
                 "message": f"Error: {str(e)}"
             }
     
-    def start_trailing_stop_monitor(self, symbol):
-        """Start monitoring for trailing stop"""
-        if symbol in self.stop_monitors:
-            # Stop existing monitor if any
-            self.stop_monitors[symbol]["running"] = False
+    def _risk_rejection(self, order_details):
+        """Return the place_order response for an order the risk gate rejects, else None"""
+        if not self.risk_gate:
+            return None
+        rejection = self.risk_gate.check(order_details)
+        if not rejection:
+            return None
+        return {
+            "success": False,
+            "message": f"Risk rejected: {rejection['message']}",
+            "status": "RiskRejected",
+            "rejection": rejection
+        }
+
+    @staticmethod
+    def _native_trailing_order(parent, order_details):
+        """Build a broker-side TRAIL (or TRAIL LIMIT) exit attached to a parent buy"""
+        stop_order = Order(
+            action="SELL",
+            orderType="TRAIL",
+            totalQuantity=parent.totalQuantity,
+            trailingPercent=order_details["trailing_stop_percentage"],
+            parentId=parent.orderId,
+            tif="GTC",
+            outsideRth=True,
+            transmit=True  # Transmits the parent and this child together
+        )
+
+        limit_offset = order_details.get("trailing_limit_offset")
+        if limit_offset is not None:
+            stop_order.orderType = "TRAIL LIMIT"
+            stop_order.lmtPriceOffset = limit_offset
+        return stop_order
+
+    async def place_basket(self, orders):
+        """Place a list of orders concurrently and return one result per leg (runs on the IB loop)"""
+        # Qualify every symbol in the basket in one concurrent batch up front
+        await self.contract_registry.qualify([order["symbol"] for order in orders])
+
+        # The pacer sends legs in order within the message rate limit;
+        # acknowledgements are still awaited concurrently
+        return await asyncio.gather(*(self.place_order(order) for order in orders))
+
+    async def wait_for_status(self, trade, statuses, timeout):
+        """Wait until orderStatusEvent reports one of statuses for trade, or timeout"""
+        if trade.orderStatus.status in statuses:
+            return True
+
+        reached = asyncio.get_running_loop().create_future()
+
+        def on_status(updated_trade):
+            if updated_trade is trade and updated_trade.orderStatus.status in statuses and not reached.done():
+                reached.set_result(True)
+
+        self.ib.orderStatusEvent += on_status
+        try:
+            return await asyncio.wait_for(reached, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.ib.orderStatusEvent -= on_status
+
+    def on_fill(self, trade, order, side, quantity, price):
+        """Size trailing stops from what actually filled"""
+        symbol = trade.contract.symbol
+
+        if side == "BOT":
+            if order is not None:
+                self.start_trailing_stop_monitor(order["order_id"], quantity)
+        elif symbol in self.trailing_stops.stops:
+            # Shares sold elsewhere are no longer protected by the stop
+            self.trailing_stops.resize(symbol, -quantity)
+
+    def start_trailing_stop_monitor(self, order_id, filled_quantity):
+        """Start or grow the trailing stop for the filled part of a buy order"""
+        order = self.ledger.get(order_id)
+        order_details = order["details"] if order else None
+        if not order_details:
+            # e.g. an order placed before a restart; its stop is restored from the journal
+            self.logger.warning(f"No order details for order {order_id}, trailing stop not started")
+            return
+
+        # Native stops are held by the broker and need no local monitor or market-data line
+        if not order_details.get("trailing_stop_enabled") or order_details.get("trailing_stop_mode") == "native":
+            return
+
+        symbol = order["symbol"]
+        if symbol in self.trailing_stops.stops:
+            # Partial fills and repeat buys add to the protected quantity and keep the high-water mark
+            self.trailing_stops.resize(symbol, filled_quantity)
+            return
 
-        order_details = self.symbol_data.get(symbol)
         trail_stop_percentage = order_details.get("trailing_stop_percentage", 0)
 
-        # Create new monitor thread
-        monitor_thread = threading.Thread(
-            target=self._trailing_stop_monitor,
-            args=(symbol, trail_stop_percentage),
-            daemon=True
-        )
-        
-        self.stop_monitors[symbol] = {
-            "thread": monitor_thread,
-            "running": True,
-            "stop_percentage": trail_stop_percentage,
-            "highest_price": 0
-        }
-        
-        monitor_thread.start()
-        self.logger.info(f"Started trailing stop monitor for {symbol} with {trail_stop_percentage}% stop")
-    
-    def _trailing_stop_monitor(self, symbol, stop_percentage):
-        """Monitor price and execute trailing stop"""
-        contract = Stock(symbol, "SMART", "USD")
-        monitor_data = self.stop_monitors[symbol]
-        order_details = self.symbol_data.get(symbol)
-
-        while monitor_data["running"]:
-            try:
-                # Get current market price
-                self.ib.reqMarketDataType(1)  # 1 = Live data
-                ticker = self.ib.reqMktData(contract)
-                self.ib.sleep(2)  # Wait for data
-                
-                current_price = ticker.marketPrice()
-                
-                if current_price > 0:
-                    # Update highest price if current price is higher
-                    if current_price > monitor_data["highest_price"]:
-                        monitor_data["highest_price"] = current_price
-                        self.logger.info(f"Updated highest price for ts order of {symbol} to {monitor_data['highest_price']}")
-                    
-                    # Calculate stop price
-                    stop_price = monitor_data["highest_price"] * (1 - stop_percentage / 100)
-                    
-                    # Check if stop is triggered
-                    if current_price <= stop_price and monitor_data["highest_price"] > 0:
-                        self.logger.info(f"Trailing stop triggered for {symbol} at {current_price}")
-                        
-                        # Place sell order
-                        sell_order = LimitOrder(
-                            action="SELL",
-                            totalQuantity=order_details['quantity'],
-                            lmtPrice=current_price,
-                            outsideRth=True
-                        )
-                        
-                        trade = self.ib.placeOrder(contract, sell_order)
-                        self.logger.info(f"Placed sell order for {symbol} at {current_price}")
-                        
-                        # Stop monitoring
-                        monitor_data["running"] = False
-                        break
-                
-                time.sleep(10)  # Check every 5 seconds
-                
-            except Exception as e:
-                self.logger.error(f"Error in trailing stop monitor: {str(e)}")
-                time.sleep(30)  # Wait before retrying
-        
-        self.logger.info(f"Stopped trailing stop monitor for {symbol}")
+        # The order was placed with the registry contract, so this is normally a cache hit
+        contract = self.contract_registry.get(symbol) or Stock(symbol, "SMART", "USD")
+
+        self.trailing_stops.arm(symbol, contract, trail_stop_percentage, filled_quantity)
+        self.logger.info(f"Buy order {order_id} filled {filled_quantity} shares. Trailing stop activated.")
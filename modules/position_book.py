@@ -0,0 +1,93 @@
+import numpy as np
+
+
+class PositionBook:
+    """Trailing-stop positions held in parallel NumPy arrays
+
+    Each position owns a slot; last price, high-water mark, stop percentage and
+    quantity live in one array each so a whole tick batch is updated and
+    checked in a single vectorized pass.
+    """
+
+    def __init__(self, capacity=64):
+        self.last_price = np.zeros(capacity)
+        self.highest_price = np.zeros(capacity)
+        self.stop_percentage = np.zeros(capacity)
+        self.quantity = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.symbols = [None] * capacity
+        self.slots = {}  # symbol -> slot
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def add(self, symbol, stop_percentage, quantity, highest_price=0.0):
+        """Add or replace a position and return its slot"""
+        if symbol in self.slots:
+            self.remove(symbol)
+        if not self.free:
+            self._grow()
+
+        slot = self.free.pop()
+        self.last_price[slot] = 0.0
+        self.highest_price[slot] = highest_price
+        self.stop_percentage[slot] = stop_percentage
+        self.quantity[slot] = quantity
+        self.active[slot] = True
+        self.symbols[slot] = symbol
+        self.slots[symbol] = slot
+        return slot
+
+    def remove(self, symbol):
+        """Free the slot held by symbol"""
+        slot = self.slots.pop(symbol, None)
+        if slot is None:
+            return None
+
+        self.active[slot] = False
+        self.symbols[slot] = None
+        self.free.append(slot)
+        return slot
+
+    def update(self, slots, prices):
+        """Apply one tick batch and return the slots whose stop was crossed
+
+        Non-positive prices and inactive slots are ignored. The rule matches the
+        original per-symbol monitor: raise the high-water mark first, then
+        trigger when price <= high * (1 - stop% / 100).
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        prices = np.asarray(prices, dtype=float)
+
+        valid = (prices > 0) & self.active[slots]
+        slots = slots[valid]
+        prices = prices[valid]
+        if not slots.size:
+            return slots
+
+        self.last_price[slots] = prices
+        highest = np.maximum(self.highest_price[slots], prices)
+        self.highest_price[slots] = highest
+
+        stop_price = highest * (1 - self.stop_percentage[slots] / 100)
+        return slots[(prices <= stop_price) & (highest > 0)]
+
+    def stop_price(self, slot):
+        """Current stop level for a slot"""
+        return self.highest_price[slot] * (1 - self.stop_percentage[slot] / 100)
+
+    def _grow(self):
+        """Double the capacity of every array"""
+        capacity = len(self.active)
+        for name in ("last_price", "highest_price", "stop_percentage", "quantity", "active"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity * 2, dtype=array.dtype)
+            grown[:capacity] = array
+            setattr(self, name, grown)
+
+        self.symbols.extend([None] * capacity)
+        self.free.extend(range(capacity * 2 - 1, capacity - 1, -1))
@@ -0,0 +1,178 @@
+from collections import deque
+import logging
+
+
+class PositionLedger:
+    """Orders, fills and open lots indexed by orderId, permId and symbol
+
+    Updated incrementally from execDetailsEvent so positions and average cost
+    always reflect what actually filled. Must be used from the IB loop thread.
+    """
+
+    def __init__(self, ib):
+        self.ib = ib
+        self.orders = {}  # orderId -> order record
+        self.by_perm_id = {}  # permId -> orderId
+        self.by_symbol = {}  # symbol -> [orderId, ...]
+        self.exec_ids = set()  # execIds already applied; the gateway can resend fills
+        self.positions = {}  # symbol -> position with FIFO lots and running cost
+        self.working = {}  # symbol -> notional of unfilled buy orders
+        self.exposure = {}  # symbol -> open lot cost plus unfilled buy notional
+        self.total_exposure = 0.0
+        self.fill_listeners = []
+        self.logger = logging.getLogger(__name__)
+
+        self.ib.execDetailsEvent += self.on_exec_details
+        self.ib.orderStatusEvent += self.on_order_status
+
+    def register_order(self, trade, order_details):
+        """Record a newly placed order with the request that created it"""
+        order_id = trade.order.orderId
+        self.orders[order_id] = {
+            "order_id": order_id,
+            "perm_id": trade.order.permId or None,
+            "symbol": trade.contract.symbol,
+            "action": trade.order.action,
+            "quantity": trade.order.totalQuantity,
+            "filled": 0.0,
+            "avg_fill_price": 0.0,
+            "status": trade.orderStatus.status,
+            "limit_price": trade.order.lmtPrice,
+            "working_notional": 0.0,
+            "details": order_details
+        }
+        self.by_symbol.setdefault(trade.contract.symbol, []).append(order_id)
+        self._index_perm_id(trade)
+
+        # Unfilled buys count toward exposure until they fill or die
+        if trade.order.action == "BUY":
+            self._set_working(self.orders[order_id], trade.order.totalQuantity * trade.order.lmtPrice)
+
+    def get(self, order_id):
+        """Look up an order by orderId"""
+        return self.orders.get(order_id)
+
+    def get_by_perm_id(self, perm_id):
+        """Look up an order by permId"""
+        order_id = self.by_perm_id.get(perm_id)
+        return self.orders.get(order_id) if order_id is not None else None
+
+    def orders_for_symbol(self, symbol):
+        """All known orders for a symbol, oldest first"""
+        return [self.orders[order_id] for order_id in self.by_symbol.get(symbol, [])]
+
+    def position(self, symbol):
+        """Current position for a symbol"""
+        position = self.positions.get(symbol)
+        if position is None:
+            return {"symbol": symbol, "quantity": 0.0, "avg_cost": 0.0, "realized_pnl": 0.0}
+        return self._position_view(symbol, position)
+
+    def on_order_status(self, trade):
+        """Keep order status and permId current"""
+        order = self.orders.get(trade.order.orderId)
+        if order is not None:
+            order["status"] = trade.orderStatus.status
+            self._index_perm_id(trade)
+            if order["working_notional"] and not trade.isActive():
+                self._set_working(order, 0.0)
+
+    def on_exec_details(self, trade, fill):
+        """Apply one execution to its order and the symbol's position"""
+        execution = fill.execution
+        if execution.execId in self.exec_ids:
+            return
+        self.exec_ids.add(execution.execId)
+
+        symbol = trade.contract.symbol
+        quantity = float(execution.shares)
+        price = float(execution.price)
+
+        order = self.orders.get(trade.order.orderId)
+        if order is not None:
+            # Running average fill price for the order
+            filled = order["filled"] + quantity
+            order["avg_fill_price"] = (order["avg_fill_price"] * order["filled"] + price * quantity) / filled
+            order["filled"] = filled
+            self._index_perm_id(trade)
+            if order["working_notional"]:
+                remaining = max(0.0, order["quantity"] - filled)
+                self._set_working(order, remaining * order["limit_price"])
+
+        position = self.positions.setdefault(
+            symbol, {"quantity": 0.0, "cost": 0.0, "realized_pnl": 0.0, "lots": deque()}
+        )
+        if execution.side == "BOT":
+            position["lots"].append([trade.order.orderId, quantity, price])
+            position["quantity"] += quantity
+            position["cost"] += quantity * price
+        else:
+            self._close_lots(position, quantity, price)
+        self._update_exposure(symbol)
+
+        self.logger.info(f"Fill {execution.side} {quantity} {symbol} @ {price} for order {trade.order.orderId}")
+        for listener in self.fill_listeners:
+            listener(trade, order, execution.side, quantity, price)
+
+    def reconcile(self, trades):
+        """Apply every fill the gateway reports, e.g. after a reconnect; known execIds are skipped"""
+        for trade in trades:
+            for fill in trade.fills:
+                self.on_exec_details(trade, fill)
+
+    def _close_lots(self, position, quantity, price):
+        """Consume open lots first-in first-out and book realized P&L"""
+        lots = position["lots"]
+        remaining = quantity
+        while remaining > 0 and lots:
+            lot = lots[0]
+            closed = min(remaining, lot[1])
+            position["realized_pnl"] += (price - lot[2]) * closed
+            position["cost"] -= closed * lot[2]
+            position["quantity"] -= closed
+            lot[1] -= closed
+            remaining -= closed
+            if lot[1] <= 0:
+                lots.popleft()
+
+        if remaining > 0:
+            # Selling more than the ledger has seen bought (e.g. a position opened before a restart)
+            self.logger.warning(f"Sell of {quantity} exceeds known lots by {remaining}")
+
+    def _set_working(self, order, notional):
+        """Set the unfilled notional an order adds to its symbol's exposure"""
+        symbol = order["symbol"]
+        self.working[symbol] = self.working.get(symbol, 0.0) + notional - order["working_notional"]
+        order["working_notional"] = notional
+        self._update_exposure(symbol)
+
+    def _update_exposure(self, symbol):
+        """Recompute one symbol's exposure and adjust the account total by the difference"""
+        position = self.positions.get(symbol)
+        exposure = max(0.0, position["cost"] if position else 0.0) + self.working.get(symbol, 0.0)
+        self.total_exposure += exposure - self.exposure.get(symbol, 0.0)
+        self.exposure[symbol] = exposure
+
+    def _index_perm_id(self, trade):
+        """Map the order's permId once the gateway has assigned it"""
+        perm_id = trade.order.permId
+        order = self.orders.get(trade.order.orderId)
+        if perm_id and order is not None:
+            order["perm_id"] = perm_id
+            self.by_perm_id[perm_id] = trade.order.orderId
+
+    @staticmethod
+    def _position_view(symbol, position):
+        """Serializable view of a position"""
+        quantity = position["quantity"]
+        return {
+            "symbol": symbol,
+            "quantity": quantity,
+            "avg_cost": round(position["cost"] / quantity, 4) if quantity > 0 else 0.0,
+            "realized_pnl": round(position["realized_pnl"], 2),
+            "lots": [{"order_id": lot[0], "quantity": lot[1], "price": lot[2]} for lot in position["lots"]]
+        }
+
+    def snapshot(self):
+        """Serializable view of every position"""
+        return {symbol: self._position_view(symbol, position) for symbol, position in self.positions.items()}
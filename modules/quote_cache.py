@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+
+from modules.market_data_manager import PRIORITY_WATCHLIST
+
+WATCHLIST_OWNER = "watchlist"
+
+class QuoteCache:
+    """Keep one streaming market-data subscription per watched symbol"""
+
+    def __init__(self, ib, contract_registry, market_data, idle_timeout=300, first_tick_timeout=0.5):
+        self.ib = ib
+        self.contract_registry = contract_registry
+        self.market_data = market_data
+        self.idle_timeout = idle_timeout
+        self.first_tick_timeout = first_tick_timeout
+        self.quotes = {}
+        self.listeners = set()
+        self.version = 0  # High-water mark, bumped on every price change
+        self.last_sweep = 0
+        self.logger = logging.getLogger(__name__)
+
+        # Update quotes in place whenever the gateway pushes new ticks
+        self.ib.pendingTickersEvent += self.on_pending_tickers
+
+    def on_pending_tickers(self, tickers):
+        """Update cached quotes from ib_insync ticker events"""
+        now = time.time()
+        changed = False
+        for ticker in tickers:
+            entry = self.quotes.get(ticker.contract.symbol)
+            if entry is None or entry["ticker"] is not ticker:
+                continue
+
+            price = self._ticker_price(ticker)
+            if price is not None:
+                if price != entry["price"]:
+                    changed = True
+                    self.version += 1
+                    entry["version"] = self.version
+                entry["price"] = price
+                entry["updated"] = now
+
+        # Wake up streaming clients; each one coalesces updates at its own pace
+        if changed:
+            for loop, listener in tuple(self.listeners):
+                loop.call_soon_threadsafe(listener.set)
+
+        # Drop idle symbols at most once per second
+        if now - self.last_sweep >= 1:
+            self.expire_idle(now)
+
+    async def get_quotes(self, symbols, since_version=None):
+        """Return cached quotes for symbols, subscribing to any not yet watched
+
+        When since_version is given only quotes that changed after that version are returned.
+        Returns the quotes together with the high-water mark to pass as the next since_version.
+        """
+        new_symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.quotes]
+        if new_symbols:
+            await self._subscribe(new_symbols)
+
+        # A version from before a backend restart cannot be trusted, send a full snapshot
+        if since_version is not None and since_version > self.version:
+            since_version = None
+
+        # Read the high-water mark first so a change racing this snapshot is resent, not lost
+        version = self.version
+        now = time.time()
+        quotes = {}
+        for symbol in symbols:
+            entry = self.quotes.get(symbol)
+            if entry is None:
+                if since_version is None:
+                    quotes[symbol] = {"price": None, "age": None, "version": 0}
+                continue
+
+            entry["last_access"] = now
+            if since_version is not None and entry["version"] <= since_version:
+                continue
+
+            quotes[symbol] = {
+                "price": entry["price"],
+                "age": round(now - entry["updated"], 3) if entry["updated"] else None,
+                "version": entry["version"]
+            }
+
+        self.expire_idle(now)
+        return quotes, version
+
+    def add_listener(self):
+        """Register an event that is set whenever any cached price changes
+
+        The event belongs to the caller's loop and is set thread-safely from the IB loop.
+        """
+        listener = asyncio.Event()
+        self.listeners.add((asyncio.get_running_loop(), listener))
+        return listener
+
+    def remove_listener(self, listener):
+        """Unregister a listener returned by add_listener"""
+        for entry in tuple(self.listeners):
+            if entry[1] is listener:
+                self.listeners.discard(entry)
+
+    async def _subscribe(self, symbols):
+        """Qualify and open streaming subscriptions for new symbols"""
+        contracts = await self.contract_registry.qualify(symbols)
+
+        now = time.time()
+        for symbol in symbols:
+            contract = contracts.get(symbol)
+            if contract is None:
+                continue
+
+            # Watchlist quotes hold the lowest-priority lines and are evicted first
+            ticker = self.market_data.acquire(
+                symbol, contract, WATCHLIST_OWNER,
+                priority=PRIORITY_WATCHLIST,
+                on_evict=self._on_evicted
+            )
+            if ticker is None:
+                continue
+
+            self.version += 1
+            self.quotes[symbol] = {
+                "contract": contract,
+                "ticker": ticker,
+                "price": self._ticker_price(ticker),
+                "updated": None,
+                "version": self.version,
+                "last_access": now
+            }
+            self.logger.info(f"Subscribed to streaming quotes for {symbol}")
+
+        # Give brand-new subscriptions a short, shared window to receive a first tick
+        deadline = time.time() + self.first_tick_timeout
+        while time.time() < deadline:
+            if all(self.quotes[s]["price"] is not None for s in symbols if s in self.quotes):
+                break
+            await asyncio.sleep(0.05)
+
+    def expire_idle(self, now=None):
+        """Cancel subscriptions for symbols nobody has asked for within the idle timeout"""
+        now = now or time.time()
+        self.last_sweep = now
+        for symbol, entry in list(self.quotes.items()):
+            if now - entry["last_access"] > self.idle_timeout:
+                self.market_data.release(symbol, WATCHLIST_OWNER)
+                del self.quotes[symbol]
+                self.logger.info(f"Dropped idle quote subscription for {symbol}")
+
+    def clear(self):
+        """Release every line held by the cache"""
+        for symbol in list(self.quotes):
+            self.market_data.release(symbol, WATCHLIST_OWNER)
+        self.quotes.clear()
+
+    def _on_evicted(self, symbol):
+        """Forget a quote whose line was taken by a higher-priority consumer"""
+        self.quotes.pop(symbol, None)
+
+    @staticmethod
+    def _ticker_price(ticker):
+        """Extract the best available price from a ticker"""
+        price = ticker.marketPrice()
+        if price > 0:
+            return round(price, 2)
+
+        # Fallback to last price if market price is not available
+        price = ticker.last
+        if price > 0:
+            return round(price, 2)
+        return None
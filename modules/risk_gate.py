@@ -0,0 +1,127 @@
+import logging
+import time
+
+from modules.latency import LatencyStats
+
+DEFAULT_LIMITS = {
+    "max_order_quantity": 10000,
+    "max_order_notional": 100000.0,
+    "max_position_notional": 250000.0,
+    "price_band_percentage": 5.0,
+    "max_quote_age_seconds": 30.0
+}
+
+
+class RiskGate:
+    """Pre-trade checks against precomputed limits, the cached quote and current exposure
+
+    Limits are merged per symbol once and reused, and exposure is kept as running
+    totals by the position ledger, so a check is a handful of dict lookups and
+    comparisons. Must be used from the IB loop thread, immediately before the
+    order is placed, so no other order can slip in between check and submit.
+    """
+
+    def __init__(self, quote_cache, ledger, config=None):
+        self.quote_cache = quote_cache
+        self.ledger = ledger
+        config = config or {}
+
+        self.enabled = config.get("enabled", True)
+        self.require_quote = config.get("require_quote", False)
+        self.max_account_notional = config.get("max_account_notional", 1000000.0)
+        self.defaults = {key: config.get(key, value) for key, value in DEFAULT_LIMITS.items()}
+        self.overrides = config.get("symbols") or {}
+        self.limits = {}  # symbol -> merged limits
+
+        self.check_latency = LatencyStats()
+        self.checks = 0
+        self.rejections = {}  # code -> count
+        self.logger = logging.getLogger(__name__)
+
+    def limits_for(self, symbol):
+        """Merged default and per-symbol limits, computed once per symbol"""
+        limits = self.limits.get(symbol)
+        if limits is None:
+            limits = dict(self.defaults)
+            limits.update(self.overrides.get(symbol) or {})
+            self.limits[symbol] = limits
+        return limits
+
+    def check(self, order_details):
+        """Return None if the order may be sent, else a structured rejection"""
+        if not self.enabled:
+            return None
+
+        started = time.perf_counter()
+        rejection = self._evaluate(order_details)
+        self.check_latency.record((time.perf_counter() - started) * 1000)
+        self.checks += 1
+
+        if rejection:
+            self.rejections[rejection["code"]] = self.rejections.get(rejection["code"], 0) + 1
+            self.logger.warning(f"Risk rejected {order_details['symbol']}: {rejection['message']}")
+        return rejection
+
+    def _evaluate(self, order_details):
+        """Run every check in order of cost and return the first breach"""
+        symbol = order_details["symbol"]
+        limits = self.limits_for(symbol)
+        quantity = order_details["quantity"]
+        limit_price = order_details["limit_price"]
+        notional = quantity * limit_price
+
+        if quantity > limits["max_order_quantity"]:
+            return self._reject("max_order_quantity", symbol, quantity, limits["max_order_quantity"],
+                                f"Quantity {quantity} exceeds the {limits['max_order_quantity']} share limit")
+
+        if notional > limits["max_order_notional"]:
+            return self._reject("max_order_notional", symbol, notional, limits["max_order_notional"],
+                                f"Order notional ${notional:,.2f} exceeds ${limits['max_order_notional']:,.2f}")
+
+        # Fat-finger band around the live quote
+        entry = self.quote_cache.quotes.get(symbol) if self.quote_cache else None
+        price = entry["price"] if entry else None
+        if price and entry["updated"] and time.time() - entry["updated"] <= limits["max_quote_age_seconds"]:
+            deviation = abs(limit_price - price) / price * 100
+            if deviation > limits["price_band_percentage"]:
+                return self._reject("price_band", symbol, round(deviation, 4), limits["price_band_percentage"],
+                                    f"Limit ${limit_price} is {deviation:.2f}% from the ${price} quote")
+        elif self.require_quote:
+            return self._reject("no_quote", symbol, None, limits["max_quote_age_seconds"],
+                                f"No quote for {symbol} within {limits['max_quote_age_seconds']}s")
+
+        # Sells reduce exposure, so position and account limits only apply to buys
+        if order_details["action"] == "buy":
+            position_notional = self.ledger.exposure.get(symbol, 0.0) + notional
+            if position_notional > limits["max_position_notional"]:
+                return self._reject("max_position_notional", symbol, round(position_notional, 2),
+                                    limits["max_position_notional"],
+                                    f"{symbol} exposure would reach ${position_notional:,.2f}, "
+                                    f"limit ${limits['max_position_notional']:,.2f}")
+
+            account_notional = self.ledger.total_exposure + notional
+            if account_notional > self.max_account_notional:
+                return self._reject("max_account_notional", symbol, round(account_notional, 2),
+                                    self.max_account_notional,
+                                    f"Account exposure would reach ${account_notional:,.2f}, "
+                                    f"limit ${self.max_account_notional:,.2f}")
+        return None
+
+    @staticmethod
+    def _reject(code, symbol, value, limit, message):
+        """Build a structured rejection"""
+        return {"code": code, "symbol": symbol, "value": value, "limit": limit, "message": message}
+
+    def status(self):
+        """Report limits, current exposure, rejection counts and check latency"""
+        return {
+            "enabled": self.enabled,
+            "defaults": self.defaults,
+            "overrides": self.overrides,
+            "max_account_notional": self.max_account_notional,
+            "exposure": {symbol: round(value, 2) for symbol, value in self.ledger.exposure.items() if value},
+            "total_exposure": round(self.ledger.total_exposure, 2),
+            "checks": self.checks,
+            "rejections": dict(self.rejections),
+            "check_latency": self.check_latency.summary()
+        }
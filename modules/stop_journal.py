@@ -0,0 +1,185 @@
+from ib_insync import Contract, util
+from pathlib import Path
+import json
+import logging
+import os
+import threading
+import time
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_JOURNAL_FILE = PROJECT_ROOT / "data" / "stop_journal.jsonl"
+
+
+class StopJournal:
+    """Append-only journal of trailing-stop arms, high-water updates and triggers
+
+    Records are buffered in memory and written by a background thread at most
+    once per flush interval with a single fsync per batch. High-water updates
+    are coalesced per symbol, so a busy tick stream costs one small write per
+    symbol per interval. The file is compacted to a snapshot of the live stops
+    once it grows past compact_after records.
+    """
+
+    def __init__(self, path=None, flush_interval=0.5, compact_after=10000):
+        self.path = PROJECT_ROOT / path if path else DEFAULT_JOURNAL_FILE
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self.logger = logging.getLogger(__name__)
+
+        self.lock = threading.Lock()
+        # Serializes file writes between the journal thread and explicit flushes, so
+        # batches land in the order they were taken and compaction never races an append
+        self.write_lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.buffer = []
+        self.pending_highs = {}  # symbol -> latest high-water mark not yet written
+        self.records = 0
+        self.writes = 0
+
+        # symbol -> live arm record including the latest high
+        self.state = self._replay()
+        self.thread = threading.Thread(target=self._run, name="stop-journal", daemon=True)
+        self.thread.start()
+
+    def record_arm(self, symbol, contract, stop_percentage, quantity, highest_price=0.0):
+        """Journal a newly armed stop"""
+        record = {
+            "type": "arm",
+            "symbol": symbol,
+            "contract": util.dataclassNonDefaults(contract),
+            "stop_percentage": stop_percentage,
+            "quantity": quantity,
+            "highest_price": highest_price,
+            "time": time.time()
+        }
+        with self.lock:
+            self.pending_highs.pop(symbol, None)
+            self.state[symbol] = dict(record)
+            self.buffer.append(record)
+        self.wakeup.set()
+
+    def record_high(self, symbol, highest_price):
+        """Queue a high-water update; only the latest value per flush is written"""
+        with self.lock:
+            if symbol in self.state:
+                self.state[symbol]["highest_price"] = highest_price
+                self.pending_highs[symbol] = highest_price
+
+    def record_trigger(self, symbol, price):
+        """Journal a triggered stop"""
+        self._record_close("trigger", symbol, price=price)
+
+    def record_disarm(self, symbol):
+        """Journal a stop removed without triggering"""
+        self._record_close("disarm", symbol)
+
+    def _record_close(self, record_type, symbol, **fields):
+        """Journal the end of a stop and drop it from the live state"""
+        record = {"type": record_type, "symbol": symbol, "time": time.time(), **fields}
+        with self.lock:
+            self.pending_highs.pop(symbol, None)
+            self.state.pop(symbol, None)
+            self.buffer.append(record)
+        self.wakeup.set()
+
+    def live_stops(self):
+        """Return the stops that were armed and not yet closed, with contracts rebuilt"""
+        with self.lock:
+            stops = [dict(record) for record in self.state.values()]
+        for stop in stops:
+            stop["contract"] = Contract.create(**stop["contract"])
+        return stops
+
+    def _replay(self):
+        """Rebuild live stop state from the journal file"""
+        state = {}
+        if not os.path.exists(self.path):
+            return state
+
+        started = time.perf_counter()
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave a torn final line; everything before it is intact
+                    self.logger.warning(f"Skipping unreadable journal line in {self.path}")
+                    continue
+
+                self.records += 1
+                symbol = record["symbol"]
+                if record["type"] == "arm":
+                    state[symbol] = record
+                elif record["type"] == "high" and symbol in state:
+                    state[symbol]["highest_price"] = record["highest_price"]
+                elif record["type"] in ("trigger", "disarm"):
+                    state.pop(symbol, None)
+
+        self.logger.info(
+            f"Replayed {self.records} journal records into {len(state)} live stops "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return state
+
+    def _run(self):
+        """Flush buffered records at most once per flush interval"""
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Error writing stop journal: {str(e)}")
+            time.sleep(self.flush_interval)
+
+    def flush(self):
+        """Write all buffered records with one fsync, compacting when the file is large"""
+        with self.write_lock:
+            with self.lock:
+                records = self.buffer
+                self.buffer = []
+                now = time.time()
+                records.extend(
+                    {"type": "high", "symbol": symbol, "highest_price": price, "time": now}
+                    for symbol, price in self.pending_highs.items()
+                )
+                self.pending_highs = {}
+
+            if not records:
+                return
+
+            os.makedirs(self.path.parent, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.records += len(records)
+            self.writes += 1
+
+            if self.records > self.compact_after:
+                self.compact()
+
+    def compact(self):
+        """Rewrite the journal as one arm record per live stop"""
+        with self.write_lock:
+            with self.lock:
+                snapshot = [dict(record) for record in self.state.values()]
+
+            tmp_file = f"{self.path}.tmp"
+            with open(tmp_file, 'w') as f:
+                f.write("".join(json.dumps(record) + "\n" for record in snapshot))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.path)
+
+            self.records = len(snapshot)
+        self.logger.info(f"Compacted stop journal to {len(snapshot)} live stops")
+
+    def stats(self):
+        """Report journal size and write counts"""
+        return {
+            "live_stops": len(self.state),
+            "records": self.records,
+            "writes": self.writes
+        }
@@ -0,0 +1,252 @@
+from ib_insync import LimitOrder, OrderStatus
+import logging
+import time
+
+import numpy as np
+
+from modules.latency import LatencyStats
+from modules.market_data_manager import PRIORITY_TRAILING_STOP
+from modules.message_pacer import PRIORITY_EXIT
+from modules.position_book import PositionBook
+
+
+class TrailingStopEngine:
+    """Evaluate every trailing stop on each streaming tick from the IB loop
+
+    A single pendingTickersEvent handler replaces the old thread-per-symbol
+    polling: high-water marks are updated and the exit is sent on the same
+    tick that crosses the stop level. Numeric state lives in a PositionBook so
+    each tick batch is checked in one vectorized pass. Must be used from the
+    IB loop thread.
+    """
+
+    def __init__(self, ib, pacer, market_data, journal=None):
+        self.ib = ib
+        self.pacer = pacer
+        self.market_data = market_data
+        self.journal = journal
+        self.book = PositionBook()
+        self.stops = {}  # symbol -> contract, ticker and line owner
+        self.native_stops = {}  # orderId -> broker-side TRAIL order being tracked
+        self.trigger_latency = LatencyStats()
+        self.logger = logging.getLogger(__name__)
+
+        # Ticks arrive on the market-data connection, orders go out on this one
+        self.market_data.ib.pendingTickersEvent += self.on_pending_tickers
+        self.ib.orderStatusEvent += self.on_order_status
+
+    def arm(self, symbol, contract, stop_percentage, quantity, highest_price=0.0):
+        """Start trailing a position, replacing any existing stop on the symbol"""
+        if symbol in self.stops:
+            self.disarm(symbol)
+
+        owner = f"trailing_stop:{symbol}"
+        ticker = self.market_data.acquire(symbol, contract, owner, PRIORITY_TRAILING_STOP)
+        if ticker is None:
+            self.logger.error(f"No market data line available for trailing stop on {symbol}")
+            return False
+
+        self.stops[symbol] = {
+            "contract": contract,
+            "ticker": ticker,
+            "owner": owner,
+            "slot": self.book.add(symbol, stop_percentage, quantity, highest_price)
+        }
+        if self.journal:
+            self.journal.record_arm(symbol, contract, stop_percentage, quantity, highest_price)
+        self.logger.info(f"Started trailing stop for {symbol} with {stop_percentage}% stop")
+
+        # Evaluate immediately in case the ticker already holds a price
+        self.on_pending_tickers([ticker])
+        return True
+
+    def resize(self, symbol, delta):
+        """Grow or shrink the quantity a stop protects, disarming it at zero"""
+        stop = self.stops.get(symbol)
+        if stop is None:
+            return False
+
+        slot = stop["slot"]
+        quantity = float(self.book.quantity[slot]) + delta
+        if quantity <= 0:
+            return self.disarm(symbol)
+
+        self.book.quantity[slot] = quantity
+        if self.journal:
+            # A fresh arm record carries the new size and the current high-water mark
+            self.journal.record_arm(symbol, stop["contract"], float(self.book.stop_percentage[slot]),
+                                    quantity, float(self.book.highest_price[slot]))
+        return True
+
+    def disarm(self, symbol, journal=True):
+        """Stop trailing a symbol and release its market-data line"""
+        stop = self.stops.pop(symbol, None)
+        if stop is None:
+            return False
+
+        if self.journal and journal:
+            self.journal.record_disarm(symbol)
+        self.book.remove(symbol)
+        self.market_data.release(symbol, stop["owner"])
+        self.logger.info(f"Stopped trailing stop for {symbol}")
+        return True
+
+    def on_pending_tickers(self, tickers):
+        """Update and check the stops behind every ticker in one tick batch"""
+        received = time.perf_counter()
+        slots = []
+        prices = []
+        for ticker in tickers:
+            stop = self.stops.get(ticker.contract.symbol)
+            if stop is not None and stop["ticker"] is ticker:
+                slots.append(stop["slot"])
+                prices.append(ticker.marketPrice())
+
+        if not slots:
+            return
+
+        slots = np.asarray(slots, dtype=np.intp)
+        prices = np.asarray(prices, dtype=float)
+        previous_high = self.book.highest_price[slots]  # Fancy indexing copies
+        triggered = self.book.update(slots, prices)
+
+        # Journal only the positions whose high-water mark moved on this batch
+        if self.journal:
+            raised = (prices > previous_high) & (self.book.highest_price[slots] == prices)
+            for slot, price in zip(slots[raised], prices[raised]):
+                self.journal.record_high(self.book.symbols[slot], float(price))
+
+        for slot in triggered:
+            self._trigger(self.book.symbols[slot], slot, received)
+
+    def _trigger(self, symbol, slot, received):
+        """Send the exit order for a stop that was crossed
+
+        The stop stays armed until the order is actually sent. Ticks keep arriving on
+        the market-data connection while the orders connection is down, so a crossed
+        stop is parked then and its exit sent by send_parked once orders reconnect.
+        """
+        stop = self.stops[symbol]
+        if stop.get("exiting") or stop.get("parked"):
+            return
+        current_price = float(self.book.last_price[slot])
+
+        if not self.ib.isConnected():
+            self.logger.warning(f"Trailing stop triggered for {symbol} at {current_price} with the orders "
+                                f"connection down, exit parked until it reconnects")
+            stop["parked"] = True
+            return
+        self.logger.info(f"Trailing stop triggered for {symbol} at {current_price}")
+
+        # Place sell order
+        sell_order = LimitOrder(
+            action="SELL",
+            totalQuantity=float(self.book.quantity[slot]),
+            lmtPrice=current_price,
+            outsideRth=True
+        )
+        # Exits outrank every other message, so this only waits if the bucket is empty
+        stop["exiting"] = True
+        sent = self.pacer.send(PRIORITY_EXIT, self.ib.placeOrder, stop["contract"], sell_order)
+        sent.add_done_callback(lambda future: self._on_exit_sent(symbol, stop, current_price, received, future))
+
+    def _on_exit_sent(self, symbol, stop, price, received, future):
+        """Disarm a triggered stop once its exit was sent, or park it again if sending failed"""
+        stop["exiting"] = False
+        if future.cancelled() or future.exception() is not None:
+            error = "cancelled" if future.cancelled() else str(future.exception())
+            self.logger.error(f"Error sending trailing stop exit for {symbol}: {error}, "
+                              f"stop stays armed and is retried when orders reconnect")
+            stop["parked"] = True
+            return
+
+        self.trigger_latency.record((time.perf_counter() - received) * 1000)
+        self.logger.info(f"Placed sell order for {symbol} at {price}")
+
+        # Stop monitoring, unless the stop was replaced while the exit was queued
+        if self.stops.get(symbol) is stop:
+            if self.journal:
+                self.journal.record_trigger(symbol, price)
+            self.disarm(symbol, journal=False)
+
+    def send_parked(self):
+        """Send the exits of stops that triggered while the orders connection was down"""
+        parked = [symbol for symbol, stop in self.stops.items() if stop.get("parked")]
+        for symbol in parked:
+            stop = self.stops[symbol]
+            stop["parked"] = False
+            self._trigger(symbol, stop["slot"], time.perf_counter())
+
+        if parked:
+            self.logger.info(f"Sent {len(parked)} parked trailing stop exits")
+        return len(parked)
+
+    def track_native(self, symbol, trade):
+        """Follow a broker-side TRAIL order through orderStatusEvent"""
+        self.native_stops[trade.order.orderId] = {"symbol": symbol, "trade": trade}
+        self.logger.info(f"Tracking native {trade.order.orderType} order {trade.order.orderId} for {symbol}")
+
+    def relink_native(self, trades):
+        """Follow tracked native stops through the Trade objects rebuilt after a reconnect"""
+        by_order_id = {trade.order.orderId: trade for trade in trades}
+        for order_id, native in list(self.native_stops.items()):
+            trade = by_order_id.get(order_id)
+            if trade is not None and trade is not native["trade"]:
+                native["trade"] = trade
+                # Picks up fills and cancels that happened while disconnected
+                self.on_order_status(trade)
+
+    def on_order_status(self, trade):
+        """Log native stop fills and forget orders that are done"""
+        native = self.native_stops.get(trade.order.orderId)
+        if native is None or native["trade"] is not trade:
+            return
+
+        status = trade.orderStatus.status
+        if status == 'Filled':
+            self.logger.info(f"Native trailing stop for {native['symbol']} filled at {trade.orderStatus.avgFillPrice}")
+        if status in OrderStatus.DoneStates or status == 'Inactive':
+            del self.native_stops[trade.order.orderId]
+
+    def restore(self):
+        """Re-arm every stop left open in the journal, keeping its high-water mark"""
+        if not self.journal:
+            return 0
+
+        restored = 0
+        for stop in self.journal.live_stops():
+            if stop["symbol"] in self.stops:
+                continue
+            if self.arm(stop["symbol"], stop["contract"], stop["stop_percentage"],
+                        stop["quantity"], stop["highest_price"]):
+                restored += 1
+
+        self.logger.info(f"Restored {restored} trailing stops from the journal")
+        return restored
+
+    def status(self):
+        """Report active stops and tick-to-exit latency"""
+        return {
+            "stops": {
+                symbol: {
+                    "stop_percentage": float(self.book.stop_percentage[stop["slot"]]),
+                    "quantity": float(self.book.quantity[stop["slot"]]),
+                    "last_price": float(self.book.last_price[stop["slot"]]),
+                    "highest_price": float(self.book.highest_price[stop["slot"]]),
+                    "stop_price": round(float(self.book.stop_price(stop["slot"])), 4),
+                    "parked": bool(stop.get("parked"))
+                }
+                for symbol, stop in self.stops.items()
+            },
+            "native_stops": {
+                order_id: {
+                    "symbol": native["symbol"],
+                    "order_type": native["trade"].order.orderType,
+                    "trailing_percent": native["trade"].order.trailingPercent,
+                    "status": native["trade"].orderStatus.status
+                }
+                for order_id, native in self.native_stops.items()
+            },
+            "trigger_latency": self.trigger_latency.summary(),
+            "journal": self.journal.stats() if self.journal else None
+        }
@@ -1,21 +1,19 @@
 import asyncio
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
-import nest_asyncio
 import logging
+import json
 from ib_insync import Stock
 
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
-
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("ibkr_backend")
 
 from modules.config import load_config
+from modules.lookup_cache import LookupCache
 
 # Create FastAPI app
 app = FastAPI(title="IBKR Backend API")
@@ -23,6 +21,10 @@ app = FastAPI(title="IBKR Backend API")
 # Global connection and order manager
 ibkr_connection = None
 order_manager = None
+streaming_config = {}
+
+# Company name lookups are cached so repeat adds never reach the gateway
+company_name_cache = LookupCache()
 
 # Models
 class OrderDetails(BaseModel):
@@ -32,136 +34,211 @@ class OrderDetails(BaseModel):
     limit_price: float
     trailing_stop_enabled: bool
     trailing_stop_percentage: float
+    trailing_stop_mode: str = "local"  # "local" monitor or "native" broker-side TRAIL order
+    trailing_limit_offset: Optional[float] = None  # Native mode only: use TRAIL LIMIT with this offset
+    wait_for_status: Optional[str] = None  # e.g. "Filled"; by default return on acknowledgement
+    wait_timeout: Optional[float] = None
 
 class OrderResponse(BaseModel):
     success: bool
     message: str
-    order_id: Optional[str] = None
+    order_id: Optional[int] = None
+    perm_id: Optional[int] = None
+    status: Optional[str] = None
+    ack_latency_ms: Optional[float] = None
+    stop_order_id: Optional[int] = None
+    rejection: Optional[Dict[str, Any]] = None  # Structured pre-trade risk breach
+
+class BasketRequest(BaseModel):
+    orders: List[OrderDetails]
+
+class BasketResponse(BaseModel):
+    success: bool
+    message: str
+    results: List[OrderResponse]
 
 # New model for price requests
 class PriceRequest(BaseModel):
     symbols: List[str]
+    since_version: Optional[int] = None  # Only return quotes that changed after this version
 
 @app.on_event("startup")
 async def startup_event():
     """Connect to IBKR automatically on server startup"""
+    global company_name_cache, streaming_config
+
     # Load configuration on startup
     config = load_config()
+    streaming_config = config.get("streaming", {})
+
+    reference_config = config.get("reference_data", {})
+    company_name_cache = LookupCache(
+        max_entries=reference_config.get("company_name_cache_size", 1024),
+        ttl=reference_config.get("company_name_ttl_seconds", 86400),
+        negative_ttl=reference_config.get("unknown_symbol_ttl_seconds", 300)
+    )
     
-    # Initialize connection with default parameters
+    # Start supervising the connection; startup does not wait for the gateway
     await initialize_connection(
         host=config["ibkr"]["host"],
         port=config["ibkr"]["port"],
-        client_id=config["ibkr"]["client_id"]
+        client_id=config["ibkr"]["client_id"],
+        config=config
     )
 
-async def initialize_connection(host, port, client_id):
-    """Initialize connection to IBKR"""
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Disconnect from IBKR when the server stops"""
+    if ibkr_connection:
+        await ibkr_connection.disconnect()
+
+async def initialize_connection(host, port, client_id, config=None):
+    """Create the IBKR connection and start its supervisor"""
     global ibkr_connection
     
     try:
         # Import here to avoid circular imports
         from modules.ibkr_connection import IBKRConnection
         
-        ibkr_connection = IBKRConnection(host=host, port=port, client_id=client_id)
-        connected = ibkr_connection.connect()
-        
-        if connected:
-            logger.info(f"Connected to IBKR at {host}:{port} with client ID {client_id}")
-            return True
-        else:
-            logger.error("Failed to connect to IBKR")
-            return False
+        ibkr_connection = IBKRConnection(host=host, port=port, client_id=client_id, config=config)
+
+        # The supervisor connects in the background and reconnects with backoff
+        await ibkr_connection.start()
+        logger.info(f"Supervising IBKR connection to {host}:{port} with client ID {client_id}")
+        return True
     except Exception as e:
-        logger.error(f"Error connecting to IBKR: {str(e)}")
+        logger.error(f"Error starting IBKR connection: {str(e)}")
         return False
 
 @app.get("/status")
 async def get_status():
-    """Get connection status"""
-    if ibkr_connection and ibkr_connection.is_connected():
-        return {"connected": True}
-    return {"connected": False}
+    """Get connection status from cached supervisor state; never waits on the gateway"""
+    if not ibkr_connection:
+        return {"connected": False, "state": "not_initialized", "roles": {}}
+    return {"connected": ibkr_connection.is_connected(), **ibkr_connection.status()}
+
+@app.get("/status/stream")
+async def stream_status():
+    """Push connection state changes as Server-Sent Events"""
+    if not ibkr_connection:
+        return JSONResponse(status_code=400, content={"error": "Connection not initialized"})
+
+    keepalive = streaming_config.get("keepalive_seconds", 15)
+
+    async def event_stream():
+        listener = ibkr_connection.add_status_listener()
+        try:
+            while True:
+                listener.clear()
+                state = ibkr_connection.status()
+                message = json.dumps({"connected": ibkr_connection.is_connected(), **state})
+                yield f"id: {state['version']}\ndata: {message}\n\n"
+
+                try:
+                    await asyncio.wait_for(listener.wait(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            ibkr_connection.remove_status_listener(listener)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/order", response_model=OrderResponse)
 async def place_order(order: OrderDetails):
     """Place an order"""
-    if not ibkr_connection or not ibkr_connection.is_connected():
-        # Try to reconnect if not connected
-        config = load_config()
-        await initialize_connection(
-            host=config["ibkr"]["host"],
-            port=config["ibkr"]["port"],
-            client_id=config["ibkr"]["client_id"]
-        )
-        
-        if not ibkr_connection or not ibkr_connection.is_connected():
-            raise HTTPException(status_code=400, detail="Not connected to IBKR and reconnection failed")
-    
+    # Reconnection belongs to the supervisor; fail fast instead of waiting on it
+    if not ibkr_connection or not ibkr_connection.is_connected("orders"):
+        state = ibkr_connection.status()["roles"]["orders"]["state"] if ibkr_connection else "not_initialized"
+        raise HTTPException(status_code=400, detail=f"Not connected to IBKR (connection {state})")
+
     if not ibkr_connection.order_manager:
         raise HTTPException(status_code=500, detail="Order manager not initialized")
+
+    error = validate_order(order)
+    if error:
+        return {"success": False, "message": error}
     
     try:
-        result = ibkr_connection.order_manager.place_order(order.dict())
+        result = await ibkr_connection.place_order(order.dict())
         return result
     except Exception as e:
         logger.error(f"Error placing order: {str(e)}")
         return {"success": False, "message": f"Error placing order: {str(e)}"}
 
+def validate_order(order: OrderDetails):
+    """Return a validation error message for an order, or None if it is valid"""
+    if not order.symbol.strip():
+        return "Symbol is required"
+    if order.action not in ("buy", "sell"):
+        return f"Invalid action '{order.action}'"
+    if order.quantity <= 0:
+        return "Quantity must be positive"
+    if order.limit_price <= 0:
+        return "Limit price must be positive"
+    if order.trailing_stop_mode not in ("local", "native"):
+        return f"Invalid trailing stop mode '{order.trailing_stop_mode}'"
+    return None
+
+@app.post("/orders", response_model=BasketResponse)
+async def place_orders(basket: BasketRequest):
+    """Validate a basket of orders together and submit them concurrently"""
+    if not basket.orders:
+        return {"success": False, "message": "Basket is empty", "results": []}
+
+    # Reject the whole basket before anything is sent if any leg is invalid
+    errors = [validate_order(order) for order in basket.orders]
+    if any(errors):
+        return {
+            "success": False,
+            "message": "Basket rejected: invalid legs, nothing was submitted",
+            "results": [
+                {"success": error is None, "message": error or "Not submitted"}
+                for error in errors
+            ]
+        }
+
+    if not ibkr_connection or not ibkr_connection.is_connected("orders"):
+        raise HTTPException(status_code=400, detail="Not connected to IBKR")
+
+    if not ibkr_connection.order_manager:
+        raise HTTPException(status_code=500, detail="Order manager not initialized")
+
+    try:
+        results = await ibkr_connection.place_basket([order.dict() for order in basket.orders])
+        placed = sum(1 for result in results if result.get("success"))
+        return {
+            "success": placed == len(results),
+            "message": f"Placed {placed} of {len(results)} orders",
+            "results": results
+        }
+    except Exception as e:
+        logger.error(f"Error placing basket: {str(e)}")
+        return {"success": False, "message": f"Error placing basket: {str(e)}", "results": []}
+
 @app.post("/prices")
 async def get_prices(price_request: PriceRequest):
     """Get real-time prices for a list of symbols"""
-    if not ibkr_connection or not ibkr_connection.is_connected():
+    if not ibkr_connection or not ibkr_connection.is_connected("market_data"):
         return JSONResponse(
             status_code=400,
             content={"error": "Not connected to Interactive Brokers"}
         )
     
     try:
-        prices = {}
-        ib = ibkr_connection.get_ib()
-        
-        for symbol in price_request.symbols:
-            try:
-                # Create contract
-                contract = Stock(symbol, "SMART", "USD")
-                
-                # Qualify the contract
-                qualified_contracts = ib.qualifyContracts(contract)
-                if not qualified_contracts:
-                    logger.warning(f"Could not qualify contract for {symbol}")
-                    continue
-                
-                contract = qualified_contracts[0]
-                
-                # Request market data
-                ib.reqMarketDataType(1)  # 1 = Live data
-                ticker = ib.reqMktData(contract)
-                
-                # Wait briefly for data to arrive
-                await asyncio.sleep(0.5)
-                
-                # Get the price
-                price = ticker.marketPrice()
-                if price > 0:
-                    prices[symbol] = round(price, 2)
-                else:
-                    # Fallback to last price if market price is not available
-                    price = ticker.last
-                    if price > 0:
-                        prices[symbol] = round(price, 2)
-                    else:
-                        # If no price is available, use the current price from the request
-                        prices[symbol] = None
-                
-                # Cancel the market data subscription to avoid hitting limits
-                ib.cancelMktData(contract)
-                
-            except Exception as e:
-                logger.error(f"Error fetching price for {symbol}: {str(e)}")
-                prices[symbol] = None
-        
-        return {"prices": prices}
+        # Quotes are served from the streaming cache; only unseen symbols hit the gateway
+        quotes, version = await ibkr_connection.get_quotes(
+            price_request.symbols,
+            since_version=price_request.since_version
+        )
+
+        prices = {symbol: quote["price"] for symbol, quote in quotes.items()}
+        ages = {symbol: quote["age"] for symbol, quote in quotes.items()}
+
+        return {"prices": prices, "ages": ages, "version": version}
     except Exception as e:
         logger.error(f"Error fetching prices: {str(e)}")
         return JSONResponse(
@@ -169,26 +246,72 @@ async def get_prices(price_request: PriceRequest):
             content={"error": f"Failed to fetch prices: {str(e)}"}
         )
 
+@app.get("/prices/stream")
+async def stream_prices(symbols: str, throttle_ms: Optional[int] = None, since_version: Optional[int] = None,
+                        last_event_id: Optional[str] = Header(None)):
+    """Push coalesced price updates for a comma-separated list of symbols as Server-Sent Events"""
+    if not ibkr_connection or not ibkr_connection.is_connected("market_data"):
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Not connected to Interactive Brokers"}
+        )
+
+    symbol_list = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+
+    # Each client picks its own throttle, bounded below so one client cannot flood the server
+    if throttle_ms is None:
+        throttle_ms = streaming_config.get("default_throttle_ms", 250)
+    throttle = max(throttle_ms, streaming_config.get("min_throttle_ms", 100)) / 1000
+    keepalive = streaming_config.get("keepalive_seconds", 15)
+
+    # Reconnecting EventSource clients resume from the last version they saw
+    if since_version is None and last_event_id and last_event_id.isdigit():
+        since_version = int(last_event_id)
+
+    async def event_stream():
+        listener = ibkr_connection.quote_cache.add_listener()
+        version = since_version
+        try:
+            while True:
+                listener.clear()
+
+                # Only send symbols whose quote moved since the last push to this client
+                quotes, new_version = await ibkr_connection.get_quotes(symbol_list, since_version=version)
+                changed = {symbol: quote["price"] for symbol, quote in quotes.items() if quote["price"] is not None}
+                version = new_version
+                if changed:
+                    message = json.dumps({"prices": changed, "version": version})
+                    yield f"id: {version}\ndata: {message}\n\n"
+
+                # Coalesce everything that arrives during the throttle window into the next push
+                await asyncio.sleep(throttle)
+                try:
+                    await asyncio.wait_for(listener.wait(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            ibkr_connection.quote_cache.remove_listener(listener)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/company_name/{ticker}")
 async def get_company_name(ticker: str):
     """Get company name for a given ticker symbol"""
     try:
-        if not ibkr_connection or not ibkr_connection.is_connected():
+        if not ibkr_connection or not ibkr_connection.is_connected("reference"):
             # If not connected to IBKR, use a fallback method
             # This could be a simple dictionary for common stocks or another API
             logger.warning("Not connected to IBKR, using fallback method for company name")
             return {"company_name": ""}
         
-        # Use IB API to get contract details which include company name
-        ib = ibkr_connection.get_ib()
-        contract = Stock(ticker, 'SMART', 'USD')
-        
-        # Request contract details
-        details = ib.reqContractDetails(contract)
-        
-        if details and len(details) > 0:
-            # The longName field contains the full company name
-            company_name = details[0].longName
+        # Cached by ticker; unknown symbols are cached as None for a shorter time
+        company_name = await company_name_cache.get_or_load(ticker, load_company_name)
+
+        if company_name is not None:
             return {"company_name": company_name}
         else:
             raise Exception(f"No contract details found for {ticker}")
@@ -199,5 +322,82 @@ async def get_company_name(ticker: str):
             content={"error": f"Failed to fetch company name: {str(e)}"}
         )
 
+async def load_company_name(ticker):
+    """Fetch the company name for a ticker from IB contract details"""
+    contract = ibkr_connection.contract_registry.get(ticker) or Stock(ticker, 'SMART', 'USD')
+
+    # Request contract details on the IB loop
+    details = await ibkr_connection.get_contract_details(contract)
+
+    if details and len(details) > 0:
+        # The longName field contains the full company name
+        return details[0].longName
+    return None
+
+@app.get("/positions")
+async def get_positions():
+    """Get positions built from actual fills, with average cost and realized P&L"""
+    if not ibkr_connection:
+        return {"positions": {}}
+    return {"positions": await ibkr_connection.get_positions()}
+
+@app.get("/orders/{order_id}")
+async def get_order(order_id: int, by_perm_id: bool = False):
+    """Look up an order and its fills by orderId (or permId)"""
+    if not ibkr_connection:
+        raise HTTPException(status_code=400, detail="Not connected to IBKR")
+
+    if by_perm_id:
+        order = await ibkr_connection.get_order(perm_id=order_id)
+    else:
+        order = await ibkr_connection.get_order(order_id=order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
+    return order
+
+@app.get("/market_data/lines")
+async def get_market_data_lines():
+    """Get market-data line usage against the configured budget"""
+    if not ibkr_connection:
+        return {"used": 0}
+    return await ibkr_connection.get_market_data_usage()
+
+@app.get("/trailing_stops")
+async def get_trailing_stops():
+    """Get active trailing stops and tick-to-exit latency"""
+    if not ibkr_connection:
+        return {"stops": {}}
+    return await ibkr_connection.get_trailing_stops()
+
+@app.get("/order_stats")
+async def get_order_stats():
+    """Get submit-to-acknowledgement and risk-check latency percentiles"""
+    if not ibkr_connection or not ibkr_connection.order_manager:
+        return {"ack_latency": {}, "risk_check_latency": {}}
+    risk_gate = ibkr_connection.order_manager.risk_gate
+    return {
+        "ack_latency": ibkr_connection.order_manager.ack_latency.summary(),
+        "risk_check_latency": risk_gate.check_latency.summary() if risk_gate else {}
+    }
+
+@app.get("/pacing")
+async def get_pacing():
+    """Get outbound message queue depth and wait-time percentiles per priority class"""
+    if not ibkr_connection:
+        return {"queue_depth": {}}
+    return await ibkr_connection.get_pacing_stats()
+
+@app.get("/risk")
+async def get_risk():
+    """Get risk limits, current exposure, rejection counts and check latency"""
+    if not ibkr_connection:
+        return {"enabled": False}
+    return await ibkr_connection.get_risk_status()
+
+@app.get("/cache_stats")
+async def get_cache_stats():
+    """Get hit, miss and eviction counters for backend caches"""
+    return {"company_names": company_name_cache.stats()}
+
 if __name__ == "__main__":
     uvicorn.run("server:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+
+from modules.config import load_config
+from modules.ibkr_connection import IBKRConnection
+
+
+@pytest.fixture
+def gateway_config(tmp_path):
+    """Config for a connection to the simulated gateway with a flat market and files under tmp_path"""
+    config = load_config()
+    config["fake_gateway"] = dict(
+        config.get("fake_gateway", {}), enabled=True, tick_interval_ms=10, volatility_bps=0, seed=1,
+        prices={"AAA": 100.0}
+    )
+    config["trading"] = dict(
+        config.get("trading", {}), stop_journal_file=str(tmp_path / "stop_journal.jsonl"), stop_journal_flush_ms=10
+    )
+    config["contracts"] = dict(config.get("contracts", {}), cache_file=str(tmp_path / "contracts.json"))
+    config["connection"] = dict(config.get("connection", {}), reconnect_initial_delay_seconds=0.1, reconnect_jitter=0)
+    return config
+
+
+async def _wait_until(predicate, timeout=3.0):
+    """Poll an async predicate until it returns something truthy, failing after timeout"""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = await predicate()
+        if result:
+            return result
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the simulated gateway")
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def wait_until():
+    """Async helper that polls a predicate until it holds"""
+    return _wait_until
+
+
+@pytest.fixture
+def run_connected(gateway_config):
+    """Run a scenario coroutine against a started connection and disconnect afterwards"""
+    def run(scenario, config=None):
+        async def main():
+            connection = IBKRConnection(config=config or gateway_config)
+            await connection.start()
+
+            async def connected():
+                return connection.is_connected()
+
+            await _wait_until(connected)
+            try:
+                return await scenario(connection)
+            finally:
+                await connection.disconnect()
+
+        return asyncio.run(main())
+
+    return run
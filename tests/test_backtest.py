@@ -0,0 +1,90 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from ib_insync import BarData, Stock
+
+from modules.backtest import best_percentages, fetch_bars, load_bars, simulate, sweep_symbol
+from modules.position_book import PositionBook
+
+
+def live_exits(prices, sessions, percentage):
+    """Replay each session tick by tick through the live engine's PositionBook"""
+    exits = []
+    starts = np.flatnonzero(np.r_[True, sessions[1:] != sessions[:-1]])
+    ends = np.r_[starts[1:], len(prices)]
+    for start, end in zip(starts, ends):
+        book = PositionBook()
+        slot = book.add("AAA", percentage, 1)
+        exit_index = end - 1
+        for index in range(start, end):
+            if book.update([slot], [prices[index]]).size:
+                exit_index = index
+                break
+        exits.append(exit_index)
+    return np.array(exits), starts
+
+
+def test_simulate_matches_the_live_trigger_rule():
+    rng = np.random.default_rng(7)
+    prices = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.004, 3000))), 2)
+    sessions = np.repeat(np.arange(10), 300)
+
+    for percentage in (0.5, 1.0, 2.5):
+        results = simulate(prices, sessions, [percentage])
+        exits, starts = live_exits(prices, sessions, percentage)
+
+        returns = (prices[exits] / prices[starts] - 1) * 100
+        assert results["trades"] == [10]
+        assert results["mean_return_pct"][0] == np.float64(returns.mean())
+        assert results["mean_bars_held"][0] == float((exits - starts + 1).mean())
+
+
+def test_untriggered_session_exits_at_its_last_bar():
+    prices = [100.0, 101.0, 102.0, 90.0, 91.0, 92.0]
+    sessions = [0, 0, 0, 1, 1, 1]
+
+    results = simulate(prices, sessions, [1.0])
+    assert results["triggered"] == [0]
+    assert results["mean_bars_held"] == [3.0]
+
+
+def test_sweep_symbol_reads_cached_bars(tmp_path):
+    dates = pd.date_range("2024-01-02 09:30", periods=4, freq="min").append(
+        pd.date_range("2024-01-03 09:30", periods=4, freq="min")
+    )
+    closes = [100.0, 102.0, 100.9, 101.0, 50.0, 49.0, 0.0, 48.0]
+    pd.DataFrame({"date": dates, "close": closes}).to_csv(tmp_path / "AAA.csv", index=False)
+
+    prices, sessions = load_bars("AAA", tmp_path)
+    assert len(prices) == 7  # Non-positive closes are dropped
+    assert list(sessions) == [0, 0, 0, 0, 1, 1, 1]
+
+    results = sweep_symbol("AAA", [1.0, 5.0], tmp_path)
+    assert list(results["stop_percentage"]) == [1.0, 5.0]
+    assert list(results["triggered"]) == [2, 0]
+    assert best_percentages(results).loc["AAA", "stop_percentage"] == 1.0
+
+
+def test_fetch_bars_walks_back_in_chunks_and_caches_one_file(tmp_path):
+    start = datetime.datetime(2024, 1, 1, 9, 30)
+    history = [BarData(date=start + datetime.timedelta(days=day, minutes=minute), close=100.0 + day)
+               for day in range(14) for minute in range(3)]
+    requests = []
+
+    async def req_historical_data(contract, endDateTime, durationStr, **kwargs):
+        # One week per request, ending at endDateTime (exclusive) or the latest bar
+        requests.append(endDateTime)
+        end = endDateTime or history[-1].date + datetime.timedelta(minutes=1)
+        return [bar for bar in history if end - datetime.timedelta(days=7) <= bar.date < end]
+
+    ib = SimpleNamespace(reqHistoricalDataAsync=req_historical_data)
+    asyncio.run(fetch_bars(ib, Stock("AAA", "SMART", "USD"), tmp_path, duration="2 W", chunk="1 W"))
+
+    assert len(requests) == 2
+    prices, sessions = load_bars("AAA", tmp_path)
+    assert len(prices) == len(history)
+    assert prices[0] == 100.0 and prices[-1] == 113.0
+    assert sessions.max() == 13
@@ -0,0 +1,106 @@
+import pytest
+import requests
+
+from dash_app.utils import api
+from dash_app.utils.api import BackendUnavailable, CircuitBreaker
+
+
+def test_opens_at_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_in() > 59
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    # A failed probe reopens the breaker; a successful one closes it
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+@pytest.fixture
+def fresh_breaker(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    monkeypatch.setattr(api, "breaker", breaker)
+    monkeypatch.setattr(api, "retry_budget", api.RetryBudget(ratio=0, reserve=0))
+    return breaker
+
+
+def test_request_resolves_probe_on_unexpected_errors(monkeypatch, fresh_breaker):
+    def torn_body(*args, **kwargs):
+        raise ValueError("torn response")
+
+    monkeypatch.setattr(api.session, "request", torn_body)
+    with pytest.raises(ValueError):
+        api._request("status", "GET", "/status")
+    assert fresh_breaker.state == "open"
+
+    # The probe failed too, so the breaker is not stuck half open
+    with pytest.raises(ValueError):
+        api._request("status", "GET", "/status")
+    assert fresh_breaker.state == "open"
+
+
+def test_request_fails_fast_while_open(monkeypatch, fresh_breaker):
+    def refused(*args, **kwargs):
+        raise requests.ConnectionError("refused")
+
+    monkeypatch.setattr(api.session, "request", refused)
+    fresh_breaker.reset_seconds = 60
+    with pytest.raises(requests.ConnectionError):
+        api._request("status", "GET", "/status")
+    assert fresh_breaker.state == "open"
+
+    calls = []
+    monkeypatch.setattr(api.session, "request", lambda *args, **kwargs: calls.append(args))
+    with pytest.raises(BackendUnavailable):
+        api._request("status", "GET", "/status")
+    assert calls == []
+
+
+def test_stalled_price_stream_ends_and_counts_as_a_failure(monkeypatch, fresh_breaker):
+    class StalledStream:
+        status_code = 200
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def iter_lines(self, decode_unicode=False):
+            yield "data: {}"
+            raise requests.ConnectionError("Read timed out")
+
+    timeouts = []
+    monkeypatch.setattr(api.session, "request", lambda *args, **kwargs: timeouts.append(kwargs["timeout"]) or StalledStream())
+
+    assert list(api.stream_prices(["AAA"])) == ["data: {}\n"]
+    assert timeouts == [api.TIMEOUTS["prices_stream"]]
+    assert timeouts[0][1] is not None
+    assert fresh_breaker.state == "open"
@@ -0,0 +1,76 @@
+import asyncio
+
+from ib_insync import IB
+
+from modules.connection_supervisor import ConnectionSupervisor
+
+
+def test_backoff_doubles_up_to_the_cap_within_jitter():
+    supervisor = ConnectionSupervisor(IB(), None, initial_delay=1, max_delay=10, jitter=0.2)
+    for attempt, base in ((1, 1), (2, 2), (3, 4), (4, 8), (5, 10), (9, 10)):
+        delay = supervisor._backoff(attempt)
+        assert base * 0.8 <= delay <= base * 1.2
+
+
+def test_retries_until_connected_and_reconnects_after_a_drop():
+    async def scenario():
+        ib = IB()
+        attempts = []
+        connected = asyncio.Event()
+
+        async def connect():
+            attempts.append(len(attempts) + 1)
+            if len(attempts) in (1, 2):
+                raise ConnectionError("refused")
+            connected.set()
+
+        supervisor = ConnectionSupervisor(ib, connect, initial_delay=0.01, max_delay=0.05, jitter=0)
+        listener = supervisor.add_listener()
+        supervisor.start()
+
+        await asyncio.wait_for(connected.wait(), 1)
+        await asyncio.sleep(0)
+        assert supervisor.is_connected()
+        assert attempts == [1, 2, 3]
+        assert supervisor.state["last_error"] == "refused"
+        assert listener.is_set()
+
+        # A dropped socket is noticed through disconnectedEvent and reconnected at once
+        connected.clear()
+        ib.disconnectedEvent.emit()
+        await asyncio.wait_for(connected.wait(), 1)
+        await asyncio.sleep(0)
+        assert supervisor.is_connected()
+        assert attempts == [1, 2, 3, 4]
+
+        await supervisor.stop()
+        assert supervisor.state["state"] == "stopped"
+        assert not supervisor.is_connected()
+
+    asyncio.run(scenario())
+
+
+def test_dropped_market_data_client_reconnects_and_resubscribes(run_connected, wait_until):
+    async def scenario(connection):
+        gateway = connection.fake_gateway
+        await connection.get_quotes(["AAA"])
+        market_data_id = connection.client_ids["market_data"]
+        await connection.client.call(lambda: gateway.clients[market_data_id].drop())
+
+        async def resubscribed():
+            stats = await connection.client.call(gateway.stats)
+            return connection.is_connected() and stats["subscriptions"] == 1
+
+        await wait_until(resubscribed)
+        assert connection.status()["roles"]["market_data"]["state"] == "connected"
+
+        # The existing ticker keeps streaming on the new connection
+        await connection.client.call(gateway.prices.__setitem__, "AAA", 102.0)
+
+        async def streaming():
+            quotes, _ = await connection.get_quotes(["AAA"])
+            return quotes["AAA"]["price"] == 102.0
+
+        await wait_until(streaming)
+
+    run_connected(scenario)
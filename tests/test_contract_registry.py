@@ -0,0 +1,93 @@
+"""Contract qualification through the reference client of the simulated gateway"""
+import asyncio
+import json
+import os
+
+from modules.contract_registry import ContractRegistry
+from modules.message_pacer import PRIORITY_REFERENCE
+
+
+def reference_sent(connection):
+    return connection.clients["reference"].pacer.sent[PRIORITY_REFERENCE]
+
+
+def test_batch_is_qualified_once_and_cached_on_disk(run_connected, gateway_config, wait_until):
+    cache_file = gateway_config["contracts"]["cache_file"]
+
+    async def scenario(connection):
+        registry = connection.contract_registry
+        contracts = await connection.client.submit(registry.qualify(["AAA", "BBB", "AAA", "CCC"]))
+        assert sorted(contracts) == ["AAA", "BBB", "CCC"]
+        assert all(contract.conId for contract in contracts.values())
+        assert reference_sent(connection) == 3
+
+        # Cached symbols cost no further requests
+        await connection.client.submit(registry.qualify(["BBB", "CCC"]))
+        assert await connection.client.submit(registry.get_contract("AAA")) is contracts["AAA"]
+        assert reference_sent(connection) == 3
+
+        # The cache file is written off the IB loop
+        async def saved():
+            if os.path.exists(cache_file):
+                with open(cache_file) as f:
+                    return len(json.load(f)) == 3
+
+        await wait_until(saved)
+        return {symbol: contract.conId for symbol, contract in contracts.items()}
+
+    con_ids = run_connected(scenario)
+
+    # A new registry starts from the contracts saved by the last one
+    restored = ContractRegistry(None, None, cache_file=cache_file)
+    assert {symbol: restored.get(symbol).conId for symbol in con_ids} == con_ids
+
+
+def test_unknown_symbols_are_not_retried_until_their_ttl_expires(run_connected, gateway_config):
+    gateway_config["fake_gateway"]["unknown_symbols"] = ["GONE"]
+    gateway_config["contracts"]["unknown_symbol_ttl_seconds"] = 60
+
+    async def scenario(connection):
+        registry = connection.contract_registry
+        for _ in range(3):
+            contracts = await connection.client.submit(registry.qualify(["GONE", "AAA"]))
+            assert contracts["GONE"] is None
+        assert reference_sent(connection) == 2
+
+        # Once the entry expires the symbol is tried again
+        await connection.client.call(registry.unknown.__setitem__, "GONE", 0)
+        await connection.client.submit(registry.qualify(["GONE"]))
+        assert reference_sent(connection) == 3
+
+    run_connected(scenario)
+
+
+def test_concurrent_lookups_share_one_request(run_connected):
+    async def scenario(connection):
+        registry = connection.contract_registry
+
+        async def lookups():
+            return await asyncio.gather(
+                registry.qualify(["AAA", "BBB"]), registry.qualify(["BBB"]), registry.get_contract("AAA")
+            )
+
+        first, second, contract = await connection.client.submit(lookups())
+        assert second["BBB"] is first["BBB"]
+        assert contract is first["AAA"]
+        assert reference_sent(connection) == 2
+        assert registry.inflight == {}
+
+    run_connected(scenario)
+
+
+def test_orders_for_unknown_symbols_are_rejected(run_connected, gateway_config):
+    gateway_config["fake_gateway"]["unknown_symbols"] = ["GONE"]
+
+    async def scenario(connection):
+        response = await connection.place_order(
+            {"symbol": "GONE", "action": "buy", "quantity": 1, "limit_price": 10.0}
+        )
+        assert not response["success"]
+        assert response["status"] == "UnknownSymbol"
+        assert (await connection.client.call(connection.fake_gateway.stats))["orders"] == 0
+
+    run_connected(scenario)
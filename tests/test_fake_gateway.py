@@ -0,0 +1,66 @@
+"""The simulated gateway behind a full connection, as the load benchmark uses it"""
+
+
+def order(limit_price, **fields):
+    return dict({"symbol": "AAA", "action": "buy", "quantity": 10, "limit_price": limit_price}, **fields)
+
+
+def test_quotes_stream_from_the_simulated_market(run_connected, wait_until):
+    async def scenario(connection):
+        quotes, _ = await connection.get_quotes(["AAA"])
+        assert quotes["AAA"]["price"] == 100.0
+
+        await connection.client.call(connection.fake_gateway.prices.__setitem__, "AAA", 101.25)
+
+        async def moved():
+            quotes, _ = await connection.get_quotes(["AAA"])
+            return quotes["AAA"]["price"] == 101.25
+
+        await wait_until(moved)
+
+    run_connected(scenario)
+
+
+def test_resting_limit_fills_when_the_market_reaches_it(run_connected, gateway_config, wait_until):
+    gateway_config["fake_gateway"]["partial_fills"] = 2
+
+    async def scenario(connection):
+        await connection.get_quotes(["AAA"])
+        response = await connection.place_order(order(99.0))
+        assert response["status"] == "Submitted"
+        assert response["perm_id"]
+
+        await connection.client.call(connection.fake_gateway.prices.__setitem__, "AAA", 98.5)
+
+        async def filled():
+            return (await connection.get_order(response["order_id"]))["status"] == "Filled"
+
+        await wait_until(filled)
+        ledger_order = await connection.get_order(perm_id=response["perm_id"])
+        assert ledger_order["filled"] == 10
+        assert ledger_order["avg_fill_price"] == 98.5
+        return await connection.client.call(connection.fake_gateway.stats)
+
+    stats = run_connected(scenario)
+    assert stats["fills"] == 2
+
+
+def test_requests_on_a_dropped_client_raise(run_connected):
+    async def scenario(connection):
+        gateway = connection.fake_gateway
+
+        # Hold the orders client down so its supervisor cannot reconnect it
+        def refuse(client):
+            raise ConnectionError("gateway restarting")
+
+        gateway.connect = refuse
+        client = gateway.clients[connection.client_ids["orders"]]
+        await connection.client.call(client.drop)
+
+        try:
+            await connection.client.call(client.cancelOrder, 1)
+        except ConnectionError:
+            return True
+        return False
+
+    assert run_connected(scenario)
@@ -0,0 +1,83 @@
+import asyncio
+
+from modules.lookup_cache import LookupCache
+
+
+def test_entries_expire_after_their_ttl():
+    cache = LookupCache(ttl=0.2, negative_ttl=0.05)
+    loads = []
+
+    async def loader(key):
+        loads.append(key)
+        return None if key == "missing" else key.upper()
+
+    async def scenario():
+        assert await cache.get_or_load("aapl", loader) == "AAPL"
+        assert await cache.get_or_load("missing", loader) is None
+
+        await asyncio.sleep(0.1)
+        assert await cache.get_or_load("aapl", loader) == "AAPL"
+        assert await cache.get_or_load("missing", loader) is None
+
+        await asyncio.sleep(0.15)
+        assert await cache.get_or_load("aapl", loader) == "AAPL"
+
+    asyncio.run(scenario())
+
+    # Misses are cached for the shorter negative TTL
+    assert loads == ["aapl", "missing", "missing", "aapl"]
+    assert cache.stats()["expirations"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LookupCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    async def touch():
+        async def loader(key):
+            raise AssertionError("cached keys are not reloaded")
+        return await cache.get_or_load("a", loader)
+
+    assert asyncio.run(touch()) == 1
+    cache.put("c", 3)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_misses_share_one_load():
+    cache = LookupCache()
+    loads = []
+
+    async def loader(key):
+        loads.append(key)
+        await asyncio.sleep(0.01)
+        return f"{key} Inc."
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load("ACME", loader) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["ACME Inc."] * 5
+    assert loads == ["ACME"]
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_failed_load_is_not_cached():
+    cache = LookupCache()
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        if len(calls) == 1:
+            raise ConnectionError("backend down")
+        return "ok"
+
+    async def scenario():
+        try:
+            await cache.get_or_load("k", loader)
+        except ConnectionError:
+            pass
+        return await cache.get_or_load("k", loader)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert calls == ["k", "k"]
@@ -0,0 +1,65 @@
+"""Shared market-data lines within a budget, against the simulated gateway"""
+from modules.market_data_manager import PRIORITY_TRAILING_STOP, PRIORITY_WATCHLIST
+
+
+async def subscriptions(connection):
+    return (await connection.client.call(connection.fake_gateway.stats))["subscriptions"]
+
+
+async def qualified(connection, *symbols):
+    return await connection.client.submit(connection.contract_registry.qualify(list(symbols)))
+
+
+def test_owners_share_one_line_until_the_last_release(run_connected, wait_until):
+    async def scenario(connection):
+        market_data = connection.market_data
+        contract = (await qualified(connection, "AAA"))["AAA"]
+
+        first = await connection.client.call(market_data.acquire, "AAA", contract, "watchlist")
+        second = await connection.client.call(market_data.acquire, "AAA", contract, "stop", PRIORITY_TRAILING_STOP)
+        assert first is second
+        assert await subscriptions(connection) == 1
+
+        await connection.client.call(market_data.release, "AAA", "watchlist")
+        assert (await connection.get_market_data_usage())["symbols"] == {"AAA": ["stop"]}
+        assert await subscriptions(connection) == 1
+
+        await connection.client.call(market_data.release, "AAA", "stop")
+
+        async def cancelled():
+            return await subscriptions(connection) == 0
+
+        await wait_until(cancelled)
+        assert (await connection.get_market_data_usage())["used"] == 0
+
+    run_connected(scenario)
+
+
+def test_full_budget_evicts_the_lowest_priority_line(run_connected, gateway_config):
+    gateway_config["market_data"] = dict(gateway_config.get("market_data", {}), max_lines=2)
+
+    async def scenario(connection):
+        market_data = connection.market_data
+        contracts = await qualified(connection, "AAA", "BBB", "CCC", "DDD")
+        evicted = []
+
+        await connection.client.call(
+            market_data.acquire, "AAA", contracts["AAA"], "watchlist", PRIORITY_WATCHLIST, evicted.append
+        )
+        await connection.client.call(market_data.acquire, "BBB", contracts["BBB"], "stop", PRIORITY_TRAILING_STOP)
+
+        # A stop outranks the watchlist line, which is evicted to make room
+        ticker = await connection.client.call(
+            market_data.acquire, "CCC", contracts["CCC"], "stop", PRIORITY_TRAILING_STOP
+        )
+        assert ticker is not None
+        assert evicted == ["AAA"]
+
+        # Nothing ranks below a new watchlist request now, so it is refused
+        assert await connection.client.call(market_data.acquire, "DDD", contracts["DDD"], "watchlist") is None
+
+        usage = await connection.get_market_data_usage()
+        assert sorted(usage["symbols"]) == ["BBB", "CCC"]
+        assert (usage["evictions"], usage["refused"]) == (1, 1)
+
+    run_connected(scenario)
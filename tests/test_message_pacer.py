@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from modules.message_pacer import PRIORITY_EXIT, PRIORITY_MARKET_DATA, PRIORITY_REFERENCE, MessagePacer
+
+
+def test_sends_inline_while_tokens_last():
+    async def scenario():
+        pacer = MessagePacer(messages_per_second=100, burst=3)
+        sent = []
+        futures = [pacer.send(PRIORITY_REFERENCE, sent.append, i) for i in range(3)]
+        assert sent == [0, 1, 2]
+        assert all(future.done() for future in futures)
+        assert pacer.drain_handle is None
+
+    asyncio.run(scenario())
+
+
+def test_exits_jump_the_queue_with_one_wakeup_timer():
+    async def scenario():
+        pacer = MessagePacer(messages_per_second=200, burst=1)
+        sent = []
+        pacer.send(PRIORITY_REFERENCE, sent.append, "first")
+        futures = [pacer.send(PRIORITY_REFERENCE, sent.append, f"lookup {i}") for i in range(20)]
+        futures += [pacer.send(PRIORITY_MARKET_DATA, sent.append, "subscribe")]
+        futures += [pacer.send(PRIORITY_EXIT, sent.append, "exit")]
+
+        # Every enqueue replaced the pending wakeup instead of adding another
+        scheduled = [handle for handle in asyncio.get_running_loop()._scheduled if not handle.cancelled()]
+        assert len(scheduled) == 1
+
+        await asyncio.gather(*futures)
+        assert sent[:3] == ["first", "exit", "subscribe"]
+        assert pacer.stats()["sent"] == {"exit": 1, "order": 0, "market_data": 1, "reference": 21}
+
+    asyncio.run(scenario())
+
+
+def test_send_errors_reach_the_future():
+    async def scenario():
+        pacer = MessagePacer()
+
+        def fail():
+            raise ConnectionError("Not connected")
+
+        with pytest.raises(ConnectionError):
+            await pacer.send(PRIORITY_EXIT, fail)
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+"""Native TRAIL exits placed as broker-side children of a buy, against the simulated gateway"""
+
+
+def native_buy(limit_price):
+    return {
+        "symbol": "AAA",
+        "action": "buy",
+        "quantity": 10,
+        "limit_price": limit_price,
+        "trailing_stop_enabled": True,
+        "trailing_stop_percentage": 1.0,
+        "trailing_stop_mode": "native"
+    }
+
+
+def test_native_stop_fills_after_parent(run_connected, wait_until):
+    async def scenario(connection):
+        await connection.get_quotes(["AAA"])
+        response = await connection.place_order(dict(native_buy(101.0), wait_for_status="Filled", wait_timeout=2))
+        assert response["success"]
+        assert response["status"] == "Filled"
+        assert response["stop_order_id"] == response["order_id"] + 1
+
+        # The child is working at the broker and no local stop is armed
+        stops = await connection.get_trailing_stops()
+        assert stops["stops"] == {}
+        native = stops["native_stops"][response["stop_order_id"]]
+        assert native["order_type"] == "TRAIL"
+        assert native["status"] == "Submitted"
+
+        # A drop past the trail fills the child, which closes the position
+        gateway = connection.fake_gateway
+        await connection.client.call(gateway.prices.__setitem__, "AAA", 98.0)
+
+        async def stop_filled():
+            return not (await connection.get_trailing_stops())["native_stops"]
+
+        await wait_until(stop_filled)
+        position = (await connection.get_positions())["AAA"]
+        assert position["quantity"] == 0
+        assert position["realized_pnl"] == -20.0
+        return await connection.client.call(gateway.stats)
+
+    stats = run_connected(scenario)
+    assert stats["orders"] == 2
+    assert stats["fills"] == 2
+
+
+def test_cancelling_parent_cancels_native_stop(run_connected, wait_until):
+    async def scenario(connection):
+        await connection.get_quotes(["AAA"])
+        response = await connection.place_order(native_buy(97.0))
+        assert response["success"]
+        assert response["status"] == "Submitted"
+
+        # The child waits for the parent to fill
+        stop_order_id = response["stop_order_id"]
+        native = (await connection.get_trailing_stops())["native_stops"][stop_order_id]
+        assert native["status"] == "PreSubmitted"
+
+        await connection.client.call(connection.ib.cancelOrder, response["trade"].order)
+
+        async def stop_forgotten():
+            return not (await connection.get_trailing_stops())["native_stops"]
+
+        await wait_until(stop_forgotten)
+        stop_trade = next(trade for trade in connection.ib.trades() if trade.order.orderId == stop_order_id)
+        assert stop_trade.orderStatus.status == "Cancelled"
+
+        # The unfilled buy no longer counts toward exposure
+        assert connection.ledger.exposure["AAA"] == 0
+        assert "AAA" not in await connection.get_positions()
+
+    run_connected(scenario)
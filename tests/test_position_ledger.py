@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+
+from ib_insync import IB, CommissionReport, Execution, Fill, LimitOrder, OrderStatus, Stock, Trade
+
+from modules.position_ledger import PositionLedger
+
+
+def make_trade(order_id, action, quantity, limit_price, status="Submitted"):
+    order = LimitOrder(action, quantity, limit_price, orderId=order_id)
+    return Trade(contract=Stock("AAA", "SMART", "USD"), order=order, orderStatus=OrderStatus(status=status))
+
+
+def fill(ledger, trade, exec_id, shares, price):
+    execution = Execution(
+        execId=exec_id, side="BOT" if trade.order.action == "BUY" else "SLD", shares=shares, price=price,
+        orderId=trade.order.orderId
+    )
+    ledger.on_exec_details(trade, Fill(trade.contract, execution, CommissionReport(), datetime.now(timezone.utc)))
+
+
+def test_sells_close_lots_first_in_first_out():
+    ledger = PositionLedger(IB())
+    first = make_trade(1, "BUY", 10, 100.0)
+    second = make_trade(2, "BUY", 10, 110.0)
+    sell = make_trade(3, "SELL", 15, 120.0)
+    for trade in (first, second, sell):
+        ledger.register_order(trade, {})
+
+    fill(ledger, first, "e1", 10, 100.0)
+    fill(ledger, second, "e2", 10, 110.0)
+    assert ledger.position("AAA")["avg_cost"] == 105.0
+
+    fill(ledger, sell, "e3", 15, 120.0)
+    position = ledger.position("AAA")
+    assert position["quantity"] == 5
+    assert position["avg_cost"] == 110.0
+    assert position["realized_pnl"] == 10 * 20.0 + 5 * 10.0
+    assert position["lots"] == [{"order_id": 2, "quantity": 5, "price": 110.0}]
+
+
+def test_resent_executions_are_applied_once():
+    ledger = PositionLedger(IB())
+    trade = make_trade(1, "BUY", 10, 100.0)
+    ledger.register_order(trade, {})
+
+    fill(ledger, trade, "e1", 4, 100.0)
+    fill(ledger, trade, "e1", 4, 100.0)
+    assert ledger.position("AAA")["quantity"] == 4
+    assert ledger.get(1)["filled"] == 4
+
+
+def test_exposure_tracks_working_buys_and_open_lots():
+    ledger = PositionLedger(IB())
+    trade = make_trade(1, "BUY", 10, 100.0)
+    ledger.register_order(trade, {})
+    assert ledger.exposure["AAA"] == 1000.0
+
+    # A partial fill moves notional from working to open lot cost
+    fill(ledger, trade, "e1", 4, 99.0)
+    assert ledger.working["AAA"] == 600.0
+    assert ledger.exposure["AAA"] == 600.0 + 396.0
+
+    # Cancelling the rest leaves only the lot
+    trade.orderStatus.status = "Cancelled"
+    ledger.on_order_status(trade)
+    assert ledger.exposure["AAA"] == 396.0
+
+    sell = make_trade(2, "SELL", 4, 101.0)
+    ledger.register_order(sell, {})
+    fill(ledger, sell, "e2", 4, 101.0)
+    assert ledger.exposure["AAA"] == 0.0
+    assert ledger.total_exposure == 0.0
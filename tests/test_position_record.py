@@ -0,0 +1,63 @@
+from dash_app.utils.position_record import PositionRecord, decode_table
+
+ROW = {
+    "Name": "Apple", "Ticker": "AAPL", "Price": 190.5, "Opening_Price": "185", "Closing_Price": "",
+    "PnL": "", "Shadow_PnL": "", "Number": "10", "Original_Number": "", "Total": ""
+}
+
+
+def test_row_round_trip_keeps_numbers_and_blank_cells():
+    record = PositionRecord.from_row(ROW)
+    assert record.opening_price == 185.0
+    assert record.number == 10
+    assert record.original_number == 10  # Falls back to Number
+    assert record.closing_price is None
+    assert record.total_pnl == 0.0
+
+    row = record.to_row()
+    assert row["Closing_Price"] == ""
+    assert row["Opening_Price"] == 185.0
+    assert PositionRecord.from_row(row).to_storage() == record.to_storage()
+
+
+def test_storage_written_as_strings_is_converted_on_load():
+    legacy = {"ticker": "AAPL", "price": "190.5", "opening_price": "", "number": "7", "total_pnl": "12.5",
+              "pnl": "junk"}
+    record = PositionRecord.from_storage("Apple", legacy)
+    assert record.to_storage() == {
+        "ticker": "AAPL", "price": 190.5, "opening_price": None, "closing_price": None, "pnl": None,
+        "shadow_pnl": None, "number": 7, "original_number": 7, "total_pnl": 12.5, "filled": None, "avg_cost": None
+    }
+
+
+def test_decode_table_keeps_saved_order():
+    data = {"B": {"ticker": "BBB"}, "A": {"ticker": "AAA", "number": 3}}
+    rows = decode_table(data)
+    assert [row["Name"] for row in rows] == ["B", "A"]
+    assert rows[1]["Number"] == 3
+    assert rows[0]["Price"] == ""
+
+
+def test_buy_then_sell_realizes_pnl_against_the_opening_price():
+    record = PositionRecord.from_row(dict(ROW, Number="0", Opening_Price="", PnL="4"))
+    record.buy(100.0, 10)
+    assert (record.opening_price, record.number, record.original_number, record.pnl) == (100.0, 10, 10, None)
+
+    record.sell(103.0, 4)
+    assert record.pnl == 12.0
+    assert record.total_pnl == 12.0
+    assert record.number == 6
+
+    record.sell(99.0, 6)
+    assert record.total_pnl == 6.0
+    assert record.number == 0
+
+
+def test_orders_leave_the_ledger_columns_alone():
+    record = PositionRecord.from_row(dict(ROW, Filled=10, Avg_Cost=184.25))
+    record.buy(190.0, 5)
+    record.sell(191.0, 3)
+
+    # Qty and Open follow the user's orders; Filled and Avg_Cost only change when fills arrive
+    row = record.to_row()
+    assert (row["Number"], row["Filled"], row["Avg_Cost"]) == (12, 10, 184.25)
@@ -0,0 +1,44 @@
+"""Versioned quotes served as deltas, against the simulated gateway"""
+
+
+def test_quotes_are_served_as_deltas_since_a_version(run_connected, gateway_config, wait_until):
+    gateway_config["fake_gateway"]["prices"]["BBB"] = 100.0
+
+    async def scenario(connection):
+        quotes, version = await connection.get_quotes(["AAA", "BBB"])
+        assert {symbol: quote["price"] for symbol, quote in quotes.items()} == {"AAA": 100.0, "BBB": 100.0}
+
+        # Nothing moved, so a delta is empty and keeps the same high-water mark
+        quotes, unchanged = await connection.get_quotes(["AAA", "BBB"], since_version=version)
+        assert quotes == {}
+        assert unchanged == version
+
+        await connection.client.call(connection.fake_gateway.prices.__setitem__, "BBB", 100.5)
+
+        async def bbb_moved():
+            quotes, latest = await connection.get_quotes(["AAA", "BBB"], since_version=version)
+            return quotes and (quotes, latest)
+
+        quotes, latest = await wait_until(bbb_moved)
+        assert list(quotes) == ["BBB"]
+        assert quotes["BBB"]["price"] == 100.5
+        assert version < quotes["BBB"]["version"] <= latest
+
+        # A version the cache never issued (e.g. from before a restart) gets a full snapshot
+        quotes, _ = await connection.get_quotes(["AAA", "BBB"], since_version=latest + 1000)
+        assert sorted(quotes) == ["AAA", "BBB"]
+
+    run_connected(scenario)
+
+
+def test_unknown_symbols_report_no_price(run_connected, gateway_config):
+    gateway_config["fake_gateway"]["unknown_symbols"] = ["GONE"]
+
+    async def scenario(connection):
+        quotes, version = await connection.get_quotes(["GONE", "AAA"])
+        assert quotes["GONE"] == {"price": None, "age": None, "version": 0}
+
+        quotes, _ = await connection.get_quotes(["GONE", "AAA"], since_version=version)
+        assert quotes == {}
+
+    run_connected(scenario)
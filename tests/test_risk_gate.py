@@ -0,0 +1,113 @@
+import time
+from types import SimpleNamespace
+
+from ib_insync import IB, LimitOrder, OrderStatus, Stock, Trade
+
+from modules.message_pacer import PRIORITY_ORDER
+from modules.position_ledger import PositionLedger
+from modules.risk_gate import RiskGate
+
+LIMITS = {
+    "max_order_quantity": 1000,
+    "max_order_notional": 50000.0,
+    "max_position_notional": 80000.0,
+    "max_account_notional": 120000.0,
+    "price_band_percentage": 5.0,
+    "max_quote_age_seconds": 30,
+    "symbols": {"BBB": {"max_order_quantity": 10}}
+}
+
+
+def make_gate(quotes=None, **config):
+    quote_cache = SimpleNamespace(quotes=quotes or {})
+    ledger = PositionLedger(IB())
+    return RiskGate(quote_cache, ledger, dict(LIMITS, **config)), ledger
+
+
+def quote(price, age=0.0):
+    return {"price": price, "updated": time.time() - age}
+
+
+def buy(symbol="AAA", quantity=100, limit_price=100.0):
+    return {"symbol": symbol, "action": "buy", "quantity": quantity, "limit_price": limit_price}
+
+
+def working_buy(ledger, order_id, symbol, quantity, limit_price):
+    order = LimitOrder("BUY", quantity, limit_price, orderId=order_id)
+    trade = Trade(contract=Stock(symbol, "SMART", "USD"), order=order, orderStatus=OrderStatus(status="Submitted"))
+    ledger.register_order(trade, {})
+
+
+def test_order_within_limits_passes():
+    gate, _ = make_gate({"AAA": quote(100.0)})
+    assert gate.check(buy()) is None
+    assert gate.checks == 1
+
+
+def test_quantity_and_notional_limits_with_symbol_overrides():
+    gate, _ = make_gate()
+    assert gate.check(buy(quantity=1001))["code"] == "max_order_quantity"
+    assert gate.check(buy(quantity=600, limit_price=100.0))["code"] == "max_order_notional"
+    assert gate.check(buy("BBB", quantity=11))["code"] == "max_order_quantity"
+    assert gate.rejections == {"max_order_quantity": 2, "max_order_notional": 1}
+
+
+def test_price_band_uses_only_fresh_quotes():
+    gate, _ = make_gate({"AAA": quote(100.0), "OLD": quote(100.0, age=60)})
+    rejection = gate.check(buy(limit_price=106.0))
+    assert rejection["code"] == "price_band"
+    assert rejection["value"] == 6.0
+    assert gate.check(buy(limit_price=95.0)) is None
+
+    # A stale quote is ignored unless quotes are required
+    assert gate.check(buy("OLD", limit_price=150.0)) is None
+    strict, _ = make_gate({"OLD": quote(100.0, age=60)}, require_quote=True)
+    assert strict.check(buy("OLD", limit_price=150.0))["code"] == "no_quote"
+
+
+def test_exposure_limits_count_working_buys():
+    gate, ledger = make_gate()
+    working_buy(ledger, 1, "AAA", 400, 100.0)
+    working_buy(ledger, 2, "AAA", 350, 100.0)
+    assert gate.check(buy(quantity=100))["code"] == "max_position_notional"
+
+    working_buy(ledger, 3, "CCC", 400, 100.0)
+    assert gate.check(buy("DDD", quantity=100))["code"] == "max_account_notional"
+
+    # Sells never add exposure
+    assert gate.check(dict(buy(quantity=100), action="sell")) is None
+
+
+def test_disabled_gate_allows_everything():
+    gate, _ = make_gate(enabled=False)
+    assert gate.check(buy(quantity=10 ** 6)) is None
+    assert gate.checks == 0
+
+
+def test_rejected_order_takes_no_pacing_token(run_connected):
+    async def scenario(connection):
+        pacer = connection.client.pacer
+        sent = pacer.sent[PRIORITY_ORDER]
+        response = await connection.place_order(buy(quantity=10 ** 6))
+        assert response["status"] == "RiskRejected"
+        assert response["rejection"]["code"] == "max_order_quantity"
+        assert await connection.client.call(lambda: pacer.sent[PRIORITY_ORDER]) == sent
+
+    run_connected(scenario)
+
+
+def test_order_that_waited_for_pacing_is_checked_again(run_connected, gateway_config):
+    gateway_config["pacing"] = {"messages_per_second": 20, "burst": 1}
+    gateway_config["risk"] = dict(gateway_config["risk"], max_account_notional=2500.0)
+
+    async def scenario(connection):
+        # Both queued legs pass the first check against the one order already sent;
+        # the third is rejected once the second goes out, and gives its token back
+        results = await connection.place_basket([buy(quantity=10) for _ in range(3)])
+        assert [result["status"] for result in results][2] == "RiskRejected"
+        assert all(result.get("order_id") is not None for result in results[:2])
+        pacer = connection.client.pacer
+        assert await connection.client.call(lambda: pacer.sent[PRIORITY_ORDER]) == 2
+        assert connection.risk_gate.checks == 5  # Three checks before pacing, two after waiting
+
+    run_connected(scenario, gateway_config)
@@ -0,0 +1,77 @@
+import json
+
+from ib_insync import Stock
+
+from modules.stop_journal import StopJournal
+
+
+def open_journal(path, **kwargs):
+    # A long interval keeps the background thread out of the way; tests flush explicitly
+    return StopJournal(path=path, flush_interval=60, **kwargs)
+
+
+def test_replay_restores_live_stops_with_latest_high(tmp_path):
+    path = tmp_path / "stop_journal.jsonl"
+    journal = open_journal(path)
+    journal.record_arm("AAA", Stock("AAA", "SMART", "USD"), 2.0, 10, highest_price=100.0)
+    journal.record_high("AAA", 104.5)
+    journal.record_arm("BBB", Stock("BBB", "SMART", "USD"), 1.0, 5, highest_price=50.0)
+    journal.record_trigger("BBB", 49.4)
+    journal.record_arm("CCC", Stock("CCC", "SMART", "USD"), 1.0, 5)
+    journal.record_disarm("CCC")
+    journal.flush()
+
+    stops = open_journal(path).live_stops()
+    assert [stop["symbol"] for stop in stops] == ["AAA"]
+    assert stops[0]["highest_price"] == 104.5
+    assert stops[0]["quantity"] == 10
+    assert stops[0]["contract"].symbol == "AAA"
+
+
+def test_high_updates_are_coalesced_per_flush(tmp_path):
+    path = tmp_path / "stop_journal.jsonl"
+    journal = open_journal(path)
+    journal.record_arm("AAA", Stock("AAA", "SMART", "USD"), 2.0, 10, highest_price=100.0)
+    journal.flush()
+    for price in (101.0, 102.0, 103.0):
+        journal.record_high("AAA", price)
+    journal.flush()
+
+    highs = [record for record in map(json.loads, path.read_text().splitlines()) if record["type"] == "high"]
+    assert [record["highest_price"] for record in highs] == [103.0]
+
+
+def test_replay_skips_torn_final_line(tmp_path):
+    path = tmp_path / "stop_journal.jsonl"
+    journal = open_journal(path)
+    journal.record_arm("AAA", Stock("AAA", "SMART", "USD"), 2.0, 10, highest_price=100.0)
+    journal.flush()
+    with open(path, 'a') as f:
+        f.write('{"type": "trigger", "symbol": "AA')
+
+    assert [stop["symbol"] for stop in open_journal(path).live_stops()] == ["AAA"]
+
+
+def test_compaction_keeps_only_live_stops(tmp_path):
+    path = tmp_path / "stop_journal.jsonl"
+    journal = open_journal(path, compact_after=20)
+    for i in range(10):
+        symbol = f"S{i}"
+        journal.record_arm(symbol, Stock(symbol, "SMART", "USD"), 1.0, 1, highest_price=10.0)
+        journal.record_high(symbol, 11.0)
+        if i % 2:
+            journal.record_trigger(symbol, 10.5)
+        journal.flush()
+
+    # 25 records were written; the file was compacted once it passed 20
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) < 25
+    assert journal.records == len(records)
+
+    journal.compact()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["type"] for record in records] == ["arm"] * 5
+
+    live = {stop["symbol"]: stop for stop in open_journal(path).live_stops()}
+    assert sorted(live) == ["S0", "S2", "S4", "S6", "S8"]
+    assert all(stop["highest_price"] == 11.0 for stop in live.values())
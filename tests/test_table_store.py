@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from dash_app.utils.table_store import JsonBackend, SqliteBackend, WriteBehindStore
+
+ROWS = {
+    "Alpha": {"ticker": "AAA", "price": 10.0, "number": 5},
+    "Beta": {"ticker": "BBB", "price": 20.0, "number": 0}
+}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend_factory(request, tmp_path):
+    def make():
+        if request.param == "sqlite":
+            return SqliteBackend(str(tmp_path / "stock_data.db"))
+        return JsonBackend(str(tmp_path / "stock_data.json"))
+    return make
+
+
+def make_store(backend_factory):
+    # A long interval so tests decide when to flush
+    return WriteBehindStore(backend_factory(), flush_ms=60000)
+
+
+def test_changes_are_coalesced_into_one_write(backend_factory):
+    store = make_store(backend_factory)
+    store.update(ROWS, order=list(ROWS))
+    store.update({"Alpha": dict(ROWS["Alpha"], price=11.0)})
+    store.update({"Alpha": dict(ROWS["Alpha"], price=12.0)})
+    store.flush()
+    assert store.writes == 1
+    store.close()
+
+    reopened = make_store(backend_factory)
+    assert reopened.load()["Alpha"]["price"] == 12.0
+    assert list(reopened.load()) == ["Alpha", "Beta"]
+    reopened.close()
+
+
+def test_unchanged_rows_never_touch_the_disk(backend_factory):
+    store = make_store(backend_factory)
+    store.update(ROWS, order=list(ROWS))
+    store.flush()
+
+    store.update({"Alpha": dict(ROWS["Alpha"])}, order=list(ROWS))
+    store.flush()
+    assert store.writes == 1
+    assert store.skipped == 1
+    store.close()
+
+
+def test_removal_and_reorder_survive_a_reload(backend_factory):
+    store = make_store(backend_factory)
+    store.update(dict(ROWS, Gamma={"ticker": "CCC"}), order=["Alpha", "Beta", "Gamma"])
+    store.flush()
+    store.update({}, removed=["Beta"], order=["Gamma", "Alpha"])
+    store.close()
+
+    reopened = make_store(backend_factory)
+    assert list(reopened.load()) == ["Gamma", "Alpha"]
+    reopened.close()
+
+
+def test_sqlite_imports_the_json_table_once(tmp_path):
+    json_file = tmp_path / "stock_data.json"
+    json_file.write_text(json.dumps(ROWS))
+
+    backend = SqliteBackend(str(tmp_path / "stock_data.db"), import_from=str(json_file))
+    assert backend.load() == ROWS
+    backend.close()
+
+    json_file.write_text(json.dumps({"Other": {"ticker": "OOO"}}))
+    backend = SqliteBackend(str(tmp_path / "stock_data.db"), import_from=str(json_file))
+    assert backend.load() == ROWS
+    backend.close()
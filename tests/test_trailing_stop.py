@@ -0,0 +1,78 @@
+"""Local trailing stops monitored from streaming quotes"""
+from types import SimpleNamespace
+
+from ib_insync import IB, Stock, Ticker
+
+from modules.message_pacer import MessagePacer
+from modules.trailing_stop import TrailingStopEngine
+
+
+class RecordingJournal:
+    def __init__(self):
+        self.highs = []
+
+    def record_arm(self, *args):
+        pass
+
+    def record_high(self, symbol, price):
+        self.highs.append((symbol, price))
+
+
+def test_only_new_highs_are_journaled():
+    contract = Stock("AAA", "SMART", "USD")
+    ticker = Ticker(contract=contract)
+    market_data = SimpleNamespace(ib=IB(), acquire=lambda *args: ticker)
+    journal = RecordingJournal()
+    engine = TrailingStopEngine(IB(), MessagePacer(), market_data, journal=journal)
+    engine.arm("AAA", contract, 5.0, 10)
+
+    # Repeated and lower prices leave the high where it was
+    for price in (100.0, 100.0, 99.0, 100.0, 101.0, 101.0):
+        ticker.last = price
+        engine.on_pending_tickers([ticker])
+    assert journal.highs == [("AAA", 100.0), ("AAA", 101.0)]
+
+
+def test_stop_triggered_while_disconnected_exits_after_reconnect(run_connected, wait_until):
+    async def scenario(connection):
+        await connection.get_quotes(["AAA"])
+        response = await connection.place_order({
+            "symbol": "AAA", "action": "buy", "quantity": 10, "limit_price": 101.0,
+            "trailing_stop_enabled": True, "trailing_stop_percentage": 1.0, "trailing_stop_mode": "local",
+            "wait_for_status": "Filled", "wait_timeout": 2
+        })
+        assert response["status"] == "Filled"
+
+        async def armed():
+            return (await connection.get_trailing_stops())["stops"].get("AAA")
+
+        await wait_until(armed)
+
+        # Drop the order connection and hold it down while the price gaps through the stop
+        gateway = connection.fake_gateway
+        accept = gateway.connect
+
+        def refuse(client):
+            raise ConnectionError("gateway restarting")
+
+        gateway.connect = refuse
+        orders_client_id = connection.client_ids["orders"]
+        await connection.client.call(lambda: gateway.clients[orders_client_id].drop())
+        await connection.client.call(gateway.prices.__setitem__, "AAA", 95.0)
+
+        async def parked():
+            stop = (await connection.get_trailing_stops())["stops"].get("AAA")
+            return stop and stop["parked"]
+
+        await wait_until(parked)
+
+        # The exit goes out once the connection is back, and only then is the stop disarmed
+        gateway.connect = accept
+
+        async def closed():
+            return (await connection.get_positions())["AAA"]["quantity"] == 0
+
+        await wait_until(closed, timeout=10)
+        assert (await connection.get_trailing_stops())["stops"] == {}
+
+    run_connected(scenario)